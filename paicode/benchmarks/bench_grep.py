@@ -0,0 +1,108 @@
+import os
+import re
+import sys
+import glob
+import time
+import shutil
+import argparse
+import sysconfig
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import workspace, grep
+
+"""
+bench_grep.py
+-------------
+GREP on a workspace built from chunks of the installed Python sources:
+index build time, indexed queries against a naive scan of every
+listed file, and the cost of revalidating the index before a query.
+
+    python benchmarks/bench_grep.py [--files 20000]
+"""
+
+CHUNK_LINES = 200
+
+SELECTIVE = [r"_get_default_tempdir", r"class HTTPConnection\b", r"chunk 12345$", r"def getpreferredencoding"]
+BROAD = [r"import os", r"def \w+\(self", r"return None", r"raise ValueError"]
+
+def make_tree(root: str, files: int):
+    """
+    Cuts the installed Python sources into 200-line chunks. Every chunk
+    stays under grep.MAX_INDEX_BYTES, so queries take the indexed path;
+    files above it are scanned on every query.
+    """
+    paths = sysconfig.get_paths()
+    sources = sorted(glob.glob(os.path.join(paths['stdlib'], '**', '*.py'), recursive=True)
+                     + glob.glob(os.path.join(paths['purelib'], '**', '*.py'), recursive=True))
+    n = 0
+    while n < files:
+        for source in sources:
+            with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                lines = f.readlines()
+            for start in range(0, len(lines), CHUNK_LINES):
+                directory = os.path.join(root, f"pkg{n % 40}", f"mod{n // 40 % 25}")
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, f"f{n}.py"), 'w', encoding='utf-8') as f:
+                    f.write("".join(lines[start:start + CHUNK_LINES]) + f"\n# chunk {n}\n")
+                n += 1
+                if n == files:
+                    return
+
+def naive_grep(pattern: str) -> int:
+    """What GREP would cost without the index: every listed file, line by line."""
+    regex = re.compile(pattern)
+    matches = 0
+    for rel_path in workspace.iter_files('.'):
+        with open(os.path.join(workspace.PROJECT_ROOT, rel_path), 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if regex.search(line):
+                    matches += 1
+                    if matches >= grep.MAX_MATCHES:
+                        return matches
+    return matches
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Time indexed GREP against a naive scan.")
+    parser.add_argument('--files', type=int, default=20000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        make_tree(root, args.files)
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        workspace.INDEX_PERSIST = False
+        workspace.get_workspace_index().refresh()
+        grep.REVALIDATE_SECONDS = 3600
+        index = grep.GrepIndex()
+
+        _, build = timed(index.refresh)
+        print(f"build: {build / 1000:.1f} s ({args.files} files)")
+        for label, patterns in (("selective", SELECTIVE), ("broad", BROAD)):
+            for pattern in patterns:
+                result, indexed = timed(index.grep, pattern)
+                _, naive = timed(naive_grep, pattern)
+                print(f"{label:9s} {pattern!r:28s} {result['total']:5d} matches  indexed {indexed:7.1f} ms  naive {naive:7.1f} ms")
+
+        # A file edited outside pai: the first query after the interval
+        # stats the indexed files, the ones inside it do not
+        path = next(workspace.iter_files('.'))
+        with open(os.path.join(root, path), 'a', encoding='utf-8') as f:
+            f.write("EXTERNAL_MARKER = 1\n")
+        grep.REVALIDATE_SECONDS = 0
+        result, first = timed(index.grep, "EXTERNAL_MARKER")
+        grep.REVALIDATE_SECONDS = 3600
+        throttled = sorted(timed(index.grep, SELECTIVE[0])[1] for _ in range(5))[2]
+        print(f"revalidate: first query {first:.1f} ms (found {result['total']}), throttled queries {throttled:.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import builtins
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import workspace, summaries, search, symbols, grep
+
+"""
+bench_index_scan.py
+-------------------
+Session-start indexing of a synthetic workspace: the summary cache, the
+BM25 search index, the symbol index and the grep trigram index, built cold
+and then refreshed with nothing changed. Reports wall time, files opened
+and stat calls under the workspace.
+
+The indexes are refreshed the way agent.start_interactive_session does:
+one shared scan where the tree has paicode/scanner.py, otherwise one
+background refresh thread per index.
+
+    python benchmarks/bench_index_scan.py [--files 10000] [--seed 1]
+"""
+
+def make_tree(root: str, files: int, seed: int):
+    rng = random.Random(seed)
+    words = ["order", "total", "price", "user", "cache", "parse", "render", "token", "index", "merge"]
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n // 100}", f"mod{n % 100 // 20}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"{rng.choice(words)}_{n}"
+        if n % 4 == 3:
+            body = "".join(f"export function {rng.choice(words)}{i}(a, b) {{\n  return a + b * {i};\n}}\n" for i in range(40))
+            path = os.path.join(directory, name + ".js")
+        else:
+            body = f'"""{name}: {" ".join(rng.choices(words, k=8))}."""\n\n' + "".join(
+                f"def {rng.choice(words)}_{i}(value):\n    return value * {i}  # {rng.choice(words)}\n\n" for i in range(40))
+            path = os.path.join(directory, name + ".py")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(body)
+
+class Counters:
+    """Counts open() and os.stat() calls on paths below the workspace."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.opens = 0
+        self.stats = 0
+        self._open = builtins.open
+        self._stat = os.stat
+
+    def __enter__(self):
+        counters = self
+
+        def counting_open(file, *args, **kwargs):
+            if isinstance(file, str) and file.startswith(counters.root) and "/.pai_cache" not in file:
+                counters.opens += 1
+            return counters._open(file, *args, **kwargs)
+
+        def counting_stat(path, *args, **kwargs):
+            if isinstance(path, str) and path.startswith(counters.root):
+                counters.stats += 1
+            return counters._stat(path, *args, **kwargs)
+
+        builtins.open = counting_open
+        os.stat = counting_stat
+        return self
+
+    def __exit__(self, *exc):
+        builtins.open = self._open
+        os.stat = self._stat
+
+def refresh_all(indexes: list):
+    try:
+        from paicode import scanner
+    except ImportError:
+        scanner = None
+    if scanner is not None:
+        scanner.start_background_scan(indexes).join()
+        return "shared scan"
+    threads = [index.start_background_refresh() for index in indexes]
+    for thread in threads:
+        thread.join()
+    return "one thread per index"
+
+def main():
+    parser = argparse.ArgumentParser(description="Time session-start indexing of a synthetic workspace.")
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        make_tree(root, args.files, args.seed)
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        workspace.INDEX_PERSIST = False
+        workspace.get_workspace_index().refresh()
+        indexes = [summaries.SummaryCache(os.path.join(workspace.CACHE_DIR, "summaries.json")),
+                   search.SearchIndex(), symbols.SymbolIndex(), grep.GrepIndex()]
+        for label in ("cold", "warm"):
+            with Counters(root) as counters:
+                started = time.perf_counter()
+                mode = refresh_all(indexes)
+                elapsed = time.perf_counter() - started
+            print(f"{label}: {elapsed:6.2f} s  {counters.opens:6d} opens  {counters.stats:6d} stats  ({mode}, {args.files} files)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import workspace
+from paicode.policy import PathPolicy
+
+"""
+bench_policy.py
+---------------
+Path access checks over a synthetic workspace plus denied and escaping
+paths: the per-call check the policy replaced (normpath, realpath, prefix
+test, sensitive components) against PathPolicy.check() with an empty and a
+warm cache, and against one check_many() batch.
+
+    python benchmarks/bench_policy.py [--files 10000]
+"""
+
+EXTRA_PATHS = ['.git/config', 'app/.env', '../etc/passwd', 'pkg1/__pycache__/x.pyc']
+
+def make_tree(root: str, files: int):
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n % 40}", f"mod{n // 40 % 25}", f"sub{n // 1000 % 8}")
+        os.makedirs(directory, exist_ok=True)
+        open(os.path.join(directory, f"f{n}.py"), 'w').close()
+
+def old_is_path_safe(root: str, path: str) -> bool:
+    """workspace._is_path_safe before PathPolicy, without its error output."""
+    norm_path = os.path.normpath(path.strip())
+    if not norm_path or norm_path == '..':
+        return False
+    full_path = os.path.realpath(os.path.join(root, norm_path))
+    if not full_path.startswith(os.path.realpath(root)):
+        return False
+    return not any(part in workspace.SENSITIVE_PATTERNS for part in norm_path.replace('\\', '/').split('/') if part)
+
+def per_path(function, paths: list[str]) -> float:
+    """Microseconds per path."""
+    started = time.perf_counter()
+    function(paths)
+    return (time.perf_counter() - started) / len(paths) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Time path access checks.")
+    parser.add_argument('--files', type=int, default=10000)
+    args = parser.parse_args()
+
+    root = os.path.realpath(tempfile.mkdtemp(prefix="pai-bench-"))
+    try:
+        make_tree(root, args.files)
+        workspace.PROJECT_ROOT = root
+        paths = list(workspace.iter_files('.')) + EXTRA_PATHS * 100
+        deny = sorted(workspace.SENSITIVE_PATTERNS)
+
+        old = per_path(lambda batch: [old_is_path_safe(root, p) for p in batch], paths)
+        policy = PathPolicy(root, deny)
+        cold = per_path(lambda batch: [policy.check(p) for p in batch], paths)
+        warm = per_path(lambda batch: [policy.check(p) for p in batch], paths)
+        batch_policy = PathPolicy(root, deny)
+        many_cold = per_path(batch_policy.check_many, paths)
+        many_warm = per_path(batch_policy.check_many, paths)
+        assert [old_is_path_safe(root, p) for p in paths] == [allowed for allowed, _ in policy.check_many(paths)]
+
+        print(f"{len(paths)} paths, per path:")
+        print(f"  old _is_path_safe      {old:6.1f} us")
+        print(f"  check(), cold          {cold:6.1f} us")
+        print(f"  check(), cached        {warm:6.1f} us")
+        print(f"  check_many(), cold     {many_cold:6.1f} us")
+        print(f"  check_many(), cached   {many_warm:6.1f} us")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault("PAI_READ_MAX_BYTES", str(16 * 1024 * 1024))
+
+from paicode import agent, ui, workspace, sessionlog, historydb
+from paicode.context import ContextManager, render_phase_results
+
+"""
+bench_read_blobs.py
+-------------------
+Memory and time of one phase that READs a large file: the whole file, a
+30,000-line range, then the whole file again. Every result goes through
+the display, the session log, the history row and the phase prompt, the
+way execute_execution_call passes them on. Measured with tracemalloc,
+once with an empty blob store and once with the file already stored.
+
+    python benchmarks/bench_read_blobs.py [--lines 60000]
+"""
+
+COMMANDS = "\n".join(["READ::big.log", "READ::big.log::20000-50000", "READ::big.log"])
+
+def make_file(path: str, lines: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        for n in range(lines):
+            f.write(f"2024-05-01 12:{n // 60 % 60:02d}:{n % 60:02d} INFO worker-{n % 8} "
+                    f"processed request {n:06d} for account {n * 7919 % 100000:05d} in {n % 997:3d} ms\n")
+
+def run_phase(log: sessionlog.SessionLog) -> str:
+    _, results = agent.execute_command_sequence(COMMANDS, ContextManager())
+    data = {"commands": results, "metrics": agent.execution_metrics(results)}
+    log.log("EXECUTION_PHASE", data)
+    log.flush()
+    try:
+        historydb.event_row("EXECUTION_PHASE", data)
+    except TypeError:
+        # Trees from before the request id moved into the event data
+        historydb.event_row("EXECUTION_PHASE", data, "")
+    return render_phase_results([results])
+
+def measure(log: sessionlog.SessionLog, cold: bool) -> str:
+    if cold:
+        try:
+            from paicode import blobs
+            blobs._store = None
+        except ImportError:
+            pass  # trees without the blob store
+    tracemalloc.start()
+    started = time.perf_counter()
+    run_phase(log)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f"peak {peak / 1e6:5.1f} MB, {current / 1e6:4.1f} MB retained, {elapsed * 1000:4.0f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory and time of large READs through a phase.")
+    parser.add_argument('--lines', type=int, default=60000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        workspace.INDEX_PERSIST = False
+        make_file(os.path.join(root, "big.log"), args.lines)
+        ui.set_output_mode("plain")
+        ui.get_backend().stream = io.StringIO()
+        log = sessionlog.SessionLog(os.path.join(root, ".pai_cache", "session_bench"))
+
+        run_phase(log)  # lexers, line index and imports out of the way
+        size = os.path.getsize(os.path.join(root, "big.log"))
+        print(f"big.log: {size / 1e6:.1f} MB, {args.lines} lines")
+        print(f"cold store:      {measure(log, cold=True)}")
+        print(f"already stored:  {measure(log, cold=False)}")
+        log.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
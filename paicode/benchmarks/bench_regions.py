@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import agent, llm, regions, workspace, ui
+from paicode.context import estimate_tokens
+
+"""
+bench_regions.py
+----------------
+One signature change in a ~5,000-line Python file, made with a whole-file
+MODIFY and with the region MODIFY (regions found by symbol, by explicit
+line range and by description terms). The model is replaced by a stub
+that makes the change in whatever it is sent, so the script reports the
+prompt and response tokens, the local time of handle_modify_command and a
+modeled generation latency (0.4 s + input at 5,000 tok/s + output at
+200 tok/s).
+
+    python benchmarks/bench_regions.py [--classes 145]
+"""
+
+OLD_SIGNATURE = "def handle_82_2(self, request, retries=3)"
+NEW_SIGNATURE = "def handle_82_2(self, request, retries=5)"
+
+def make_source(classes: int) -> str:
+    lines = []
+    for c in range(classes):
+        lines += [f"class Service{c}:", f'    """Service number {c}."""']
+        for m in range(4):
+            lines += [f"    def handle_{c}_{m}(self, request, retries=3):",
+                      "        total = 0",
+                      "        for item in request.items:",
+                      f"            total += item.price * {m + 1}",
+                      f"        if total > {c * 10}:",
+                      "            return self.discount(total)",
+                      "        return total", ""]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+class StubModel:
+    """Stands in for llm.generate_text and records the token counts."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens_in = self.tokens_out = 0
+
+    def __call__(self, prompt: str, *args, **kwargs) -> str:
+        if "<<<REGION" in prompt:
+            response = "\n".join(
+                f"<<<REGION {m.group(1)}>>>\n" + m.group(2).replace("retries=3", "retries=5") + "\n<<<END>>>"
+                for m in re.finditer(r"<<<REGION (\d+)>>>\n(.*?)\n<<<END>>>", prompt, re.S))
+        else:
+            response = self.source.replace(OLD_SIGNATURE, NEW_SIGNATURE)
+        self.tokens_in, self.tokens_out = estimate_tokens(prompt), estimate_tokens(response)
+        return response
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-file and region MODIFY prompts.")
+    parser.add_argument('--classes', type=int, default=145)
+    args = parser.parse_args()
+
+    source = make_source(args.classes)
+    line = source.split("\n").index("    " + OLD_SIGNATURE + ":") + 1
+    cases = [
+        ("whole file", "Use 5 retries in handle_82_2", 10 ** 9),
+        ("region/symbol", "Use 5 retries in handle_82_2", regions.REGION_MIN_LINES),
+        ("region/range", f"{line}-{line + 6}::Use 5 retries here", regions.REGION_MIN_LINES),
+        ("region/terms", "Raise the retries of the handler with the 820 threshold", regions.REGION_MIN_LINES),
+    ]
+
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        ui.set_output_mode("plain", quiet=True)
+        model = StubModel(source)
+        llm.generate_text = model
+        print(f"{source.count(chr(10))} lines")
+        print("mode            in tok   out tok   local     modeled  changed lines")
+        for label, description, min_lines in cases:
+            with open(os.path.join(root, "svc.py"), 'w', encoding='utf-8') as f:
+                f.write(source)
+            regions.REGION_MIN_LINES = min_lines  # whole file: never use regions
+            started = time.perf_counter()
+            ok = agent.handle_modify_command("svc.py", description)
+            local = (time.perf_counter() - started) * 1000
+            with open(os.path.join(root, "svc.py"), encoding='utf-8') as f:
+                changed = sum(1 for a, b in zip(source.split("\n"), f.read().split("\n")) if a != b)
+            modeled = 0.4 + model.tokens_in / 5000 + model.tokens_out / 200
+            print(f"{label:14} {model.tokens_in:7,} {model.tokens_out:9,} {local:6.0f} ms {modeled:8.1f} s  "
+                  f"{changed}{'' if ok else ' (failed)'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
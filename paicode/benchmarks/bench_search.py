@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import workspace, search
+
+"""
+bench_search.py
+---------------
+BM25 search index on a synthetic workspace: cold build, refresh of an
+unchanged tree, and query latency with NumPy scoring against the pure
+Python fallback.
+
+    python benchmarks/bench_search.py [--files 50000] [--defs 30] [--seed 1]
+"""
+
+WORDS = ["order", "invoice", "user", "session", "cache", "parse", "render", "token", "report",
+         "scheduler", "download", "upload", "billing", "account", "payment", "queue", "worker", "router"]
+
+QUERIES = ["render scheduler session", "download report", "invoice billing total",
+           "parse token cache", "UserAccount payment queue"]
+
+def make_tree(root: str, files: int, defs: int, seed: int):
+    rng = random.Random(seed)
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n % 50}", f"mod{n // 50 % 20}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{n}.py"
+        lines = [f'"""{" ".join(rng.choices(WORDS, k=6))}."""\n']
+        for i in range(defs):
+            first, second = rng.choice(WORDS), rng.choice(WORDS)
+            lines.append(f"def {first}_{second}_{i}({second}Id, options=None):\n"
+                         f"    return {first.capitalize()}{second.capitalize()}({second}Id, {i})\n")
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+def time_queries(index: search.SearchIndex, rounds: int = 20) -> float:
+    """Median milliseconds per query over all QUERIES."""
+    times = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            index.search(query)
+            times.append(time.perf_counter() - started)
+    return sorted(times)[len(times) // 2] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the BM25 search index on a synthetic workspace.")
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--defs', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        make_tree(root, args.files, args.defs, args.seed)
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        workspace.INDEX_PERSIST = False
+        workspace.get_workspace_index().refresh()
+        index = search.SearchIndex()
+
+        started = time.perf_counter()
+        index.refresh()
+        print(f"cold build:    {time.perf_counter() - started:6.2f} s  ({args.files} files, {len(index.postings)} terms)")
+        started = time.perf_counter()
+        index.refresh()
+        print(f"warm refresh:  {time.perf_counter() - started:6.2f} s")
+
+        if search.NUMPY_AVAILABLE:
+            print(f"query, NumPy:  {time_queries(index):6.1f} ms")
+        search.NUMPY_AVAILABLE = False
+        print(f"query, Python: {time_queries(index, rounds=3):6.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rich.console import Console
+from paicode import ui
+
+"""
+bench_ui.py
+-----------
+Rendering cost of the output backends (rich, plain, json), written to
+/dev/null: a 12-step execution report with file previews, an
+acknowledgment panel and one info line, per call.
+
+    python benchmarks/bench_ui.py [--steps 12]
+"""
+
+def exec_report_items(steps: int) -> list:
+    """Items like the ones execute_command_sequence reports."""
+    code = "\n".join(f"def f{i}(x):\n    return x + {i}" for i in range(200))
+    items = [("bold", f"Executing {steps} intelligent actions..."), ""]
+    for i in range(steps):
+        items.append(("normal", f"[{i + 1}/{steps}] READ src/mod{i}.py"))
+        items.append(("code", f"src/mod{i}.py", code, 1) if i % 3 == 0 else ("ai_output", "Success: wrote file " * 3))
+        items += [("success", "Success"), ""]
+    items += [("bold", "Execution Summary:"), ("normal", f"Successful: {steps}/{steps} (100.0%)")]
+    return items
+
+def per_call(function, calls: int) -> float:
+    """Seconds per call, after one warm-up call."""
+    function()
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started) / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the output backends.")
+    parser.add_argument('--steps', type=int, default=12)
+    args = parser.parse_args()
+
+    items = exec_report_items(args.steps)
+    sink = open(os.devnull, 'w', encoding='utf-8')
+    print(f"{'':8}{args.steps}-step exec report   ack panel   info line")
+    for mode in ("rich", "plain", "json"):
+        ui.set_output_mode(mode, quiet=False)
+        ui.console = Console(theme=ui.custom_theme, file=sink, force_terminal=True, width=120)
+        ui.get_backend().stream = sink
+        report = per_call(lambda: ui.report("Execution Results", items), 20)
+        ack = per_call(lambda: ui.panel("Got it! Let me analyze your request.", "Pai", center=True), 200)
+        info = per_call(lambda: ui.print_info("Tokens: 1200 → 2400"), 2000)
+        print(f"{mode:8}{report * 1000:15.2f} ms {ack * 1000:9.3f} ms {info * 1e6:8.1f} us")
+    sink.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from paicode import workspace
+from paicode.fsindex import WorkspaceIndex
+
+"""
+bench_workspace_index.py
+------------------------
+One tree_directory plus one list_path call over synthetic trees of empty
+files, rendered from the workspace index (cold, warm, refresh of an
+unchanged tree, load of the persisted index plus refresh) against a plain
+os.listdir/os.walk rendering like the one the index replaced.
+
+    python benchmarks/bench_workspace_index.py [--files 10000,50000,200000]
+"""
+
+def make_tree(root: str, files: int):
+    for n in range(files):
+        directory = os.path.join(root, f"pkg{n % 40}", f"mod{n // 40 % 25}", f"sub{n // 1000 % 8}")
+        os.makedirs(directory, exist_ok=True)
+        open(os.path.join(directory, f"f{n}.py"), 'w').close()
+
+def walk_tree(root: str) -> str:
+    """tree_directory without the index: list and stat every directory."""
+    lines = [f"{os.path.basename(root)}/"]
+
+    def build(directory: str, prefix: str):
+        items = sorted(item for item in os.listdir(directory) if item not in workspace.SENSITIVE_PATTERNS)
+        for position, item in enumerate(items):
+            last = position == len(items) - 1
+            lines.append(f"{prefix}{'└── ' if last else '├── '}{item}")
+            item_path = os.path.join(directory, item)
+            if os.path.isdir(item_path):
+                build(item_path, prefix + ('    ' if last else '│   '))
+
+    build(root, "")
+    return "\n".join(lines)
+
+def walk_list(root: str) -> str:
+    """list_path without the index: one os.walk."""
+    paths = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in workspace.SENSITIVE_PATTERNS]
+        rel_dir = os.path.relpath(directory, root)
+        paths += [os.path.normpath(os.path.join(rel_dir, f)) for f in files]
+        paths += [os.path.normpath(os.path.join(rel_dir, d)) + '/' for d in dirs]
+    return "\n".join(sorted(paths))
+
+def timed(function, *args) -> float:
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+def listing_pair():
+    workspace.tree_directory('.')
+    workspace.list_path('.')
+
+def bench(files: int):
+    root = tempfile.mkdtemp(prefix="pai-bench-")
+    try:
+        make_tree(root, files)
+        workspace.PROJECT_ROOT = root
+        workspace.CACHE_DIR = os.path.join(root, ".pai_cache")
+        workspace.INDEX_PERSIST = True
+        workspace.MAX_LIST_ENTRIES = 10 ** 9  # whole listings, no paging
+        workspace._workspace_index = None
+        workspace._ignore_matcher = None
+
+        walked = timed(lambda: (walk_tree(root), walk_list(root)))
+        cold = timed(listing_pair)
+        warm = timed(listing_pair)
+        index = workspace.get_workspace_index()
+        refresh = timed(index.refresh)
+        index._dirty = True
+        index.save()
+        reloaded = WorkspaceIndex(root, workspace.SENSITIVE_PATTERNS, index.cache_path, workspace.get_ignore_matcher())
+        persisted = timed(reloaded.refresh)
+        print(f"{files // 1000:>5}k  {walked:8.2f}  {cold:10.2f}  {warm:5.2f}  {refresh * 1000:5.0f}ms  {persisted:10.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time tree/list rendering from the workspace index.")
+    parser.add_argument('--files', default="10000,50000,200000")
+    args = parser.parse_args()
+    print("files  old walk  cold index  warm  refresh  persisted load+refresh  (seconds)")
+    for files in (int(n) for n in args.files.split(',')):
+        bench(files)
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,28 @@ This package provides a command-line based agentic AI for software development.
 __all__ = [
     # Public modules
     "agent",
+    "blobs",
     "cli",
     "config",
+    "context",
+    "fsindex",
+    "grep",
+    "history",
+    "historydb",
+    "ignore",
     "llm",
+    "manifest",
+    "policy",
+    "preflight",
+    "prompts",
+    "reader",
+    "regions",
+    "search",
+    "sessionlog",
+    "summaries",
+    "symbols",
     "ui",
+    "validate",
     "workspace",
 ]
 
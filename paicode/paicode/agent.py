@@ -1,29 +1,23 @@
 #!/usr/bin/env python
 
 import os
+import re
 import json
 import signal
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-from rich.console import Console
-from rich.panel import Panel
-from rich.text import Text
-from rich.syntax import Syntax
-from rich.table import Table
-from rich.box import ROUNDED
-from pygments.lexers import get_lexer_for_filename
-from pygments.util import ClassNotFound
-
 try:
     from prompt_toolkit import PromptSession
     PROMPT_TOOLKIT_AVAILABLE = True
 except ImportError:
     PROMPT_TOOLKIT_AVAILABLE = False
 
-from . import llm, workspace, ui
+from . import llm, workspace, ui, prompts, summaries, search, symbols, grep, scanner, history, reader, manifest, sessionlog, historydb, regions, preflight, blobs, validate
+from .context import ContextManager, render_phase_results, parse_read_output
 
 # History directory - now in working directory for better context awareness
 HISTORY_DIR = os.path.join(os.getcwd(), ".pai_history")
@@ -31,17 +25,47 @@ HISTORY_DIR = os.path.join(os.getcwd(), ".pai_history")
 # Valid commands for execution
 VALID_COMMANDS = {
     "READ", "WRITE", "MODIFY", "TREE", "LIST_PATH", 
-    "MKDIR", "TOUCH", "RM", "MV", "FINISH"
+    "MKDIR", "TOUCH", "RM", "MV", "SEARCH", "FIND_SYMBOL", "GREP", "FINISH"
 }
 
+# Seconds the planning call waits for the initial search index build
+SEARCH_INDEX_WAIT = float(os.getenv("PAI_SEARCH_WAIT", "2.0"))
+
+# 'lean' skips optional LLM calls that do not affect the task (next step
+# suggestions); set with PAI_PROFILE or 'pai auto --profile lean'
+PROFILE = os.getenv("PAI_PROFILE", "default").strip().lower()
+
+# Seconds '/next' waits for suggestions that are still being generated
+NEXT_STEPS_WAIT = float(os.getenv("PAI_NEXT_STEPS_WAIT", "15.0"))
+
+# Id of the running session; its own events are left out of the past-work search
+_current_session_id = None
+
 # Global interrupt handling
 _interrupt_requested = False
 _interrupt_lock = threading.Lock()
 
+# Set to stop the running task after its current step (Ctrl+C, '/cancel');
+# cleared when the next task starts
+_cancel_event = threading.Event()
+
+# Id of the queued request the current thread works on. Session events are
+# tagged with it: a reply can run next to a task, and the history would
+# otherwise attribute the task's later events to the reply's request.
+_request_context = threading.local()
+
+def current_request_id() -> int | None:
+    return getattr(_request_context, "id", None)
+
 def request_interrupt():
     global _interrupt_requested
     with _interrupt_lock:
         _interrupt_requested = True
+    _cancel_event.set()
+
+def cancel_requested() -> bool:
+    """True once the running task was asked to stop."""
+    return _cancel_event.is_set()
 
 def check_interrupt():
     global _interrupt_requested
@@ -55,21 +79,44 @@ def reset_interrupt():
     global _interrupt_requested
     with _interrupt_lock:
         _interrupt_requested = False
+    _cancel_event.clear()
 
 def start_interactive_session():
     """Start the revolutionary single-shot intelligent session."""
     if not os.path.exists(HISTORY_DIR):
         os.makedirs(HISTORY_DIR)
     
+    global _current_session_id
     session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file_path = os.path.join(HISTORY_DIR, f"session_{session_id}.log")
+    _current_session_id = session_id
+    # Base path of the session's JSONL log parts (see sessionlog.py)
+    log_file_path = os.path.join(HISTORY_DIR, f"session_{session_id}")
+    
+    # Events are also indexed in the searchable history store; sessions logged
+    # before it existed are imported in the background
+    history_db = historydb.get_db(HISTORY_DIR)
+    sessionlog.get_log(log_file_path).add_sink(history_db.sink(session_id))
+    history_db.start_background_import(exclude={session_id})
     
-    # Start fresh every session - no context loading for better performance
-    session_context = []
+    # Records are typed and rendered within a budget per prompt
+    session_context = ContextManager()
     
     # Initialize Single-Shot Intelligence Context Window
     initialize_session_context(session_context, log_file_path)
     
+    # Load the compacted digest of earlier sessions (one bounded file), then
+    # fold any logs not compacted yet in the background for the next session
+    for note in history.digest_notes(history.load_digest(HISTORY_DIR)):
+        session_context.add_note(note, source="history")
+    history.start_background_compaction(HISTORY_DIR)
+    
+    # Refresh summaries and the search, symbol and grep indexes in the
+    # background with one workspace scan; planning uses what is ready
+    scanner.start_background_scan([summaries.get_cache(), search.get_index(), symbols.get_index(), grep.get_index()])
+    # Very large workspaces are indexed on demand, one expanded subtree at a time
+    if not workspace.is_lazy_workspace():
+        workspace.get_workspace_index().start_background_refresh()
+    
     # Log session start with current working directory info
     log_session_event(log_file_path, "SESSION_START", {
         "working_directory": os.getcwd(),
@@ -80,21 +127,14 @@ def start_interactive_session():
     welcome_message = (
         "Welcome! I'm Pai, your agentic AI coding companion. ✨\n"
         "Now powered by Single-Shot Intelligence for maximum efficiency.\n"
-        "[info]Type 'exit' or 'quit' to leave.[/info]\n"
-        "[info]Each request uses exactly 2 API calls for optimal performance.[/info]\n"
-        "[info]💡 Multi-line input: Alt+Enter for new line, Enter to submit.[/info]"
+        "Type 'exit' or 'quit' to leave.\n"
+        "Each request uses exactly 2 API calls for optimal performance.\n"
+        "💡 Multi-line input: Alt+Enter for new line, Enter to submit.\n"
+        "Type '/next' for suggestions on what to do next, '/stats' for LLM call stats.\n"
+        "Requests typed while a task runs are queued: '/queue' lists them, '/cancel' stops one."
     )
 
-    ui.console.print(
-        Panel(
-            Text(welcome_message, justify="center"),
-            title="[bold]Interactive Auto Mode[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel(welcome_message, "Interactive Auto Mode", center=True, progress=True)
     
     # Setup prompt session with better input handling
     if PROMPT_TOOLKIT_AVAILABLE:
@@ -103,60 +143,267 @@ def start_interactive_session():
     # Setup signal handler for graceful interrupt
     def signal_handler(signum, frame):
         if check_interrupt():
-            # Second Ctrl+C → Exit
-            ui.console.print("\n[warning]Session terminated.[/warning]")
+            # Second Ctrl+C → Exit. os._exit skips atexit handlers, so the
+            # session log's queued events are written first.
+            ui.print_warning("Session terminated.")
+            sessionlog.close_all()
             os._exit(0)
         else:
             # First Ctrl+C, just interrupt AI response
             request_interrupt()
-            ui.console.print("\n[yellow]⚠ Interrupt requested. AI will stop after current step.[/yellow]")
+            ui.print_warning("Interrupt requested. AI will stop after current step.")
     
     signal.signal(signal.SIGINT, signal_handler)
     
+    def run_request(user_input: str, intent: str):
+        # Log user input
+        log_session_event(log_file_path, "USER_INPUT", {"user_request": user_input})
+        
+        if intent == "conversation":
+            # Simple conversation mode
+            success = execute_conversation_mode(user_input, session_context, log_file_path)
+        else:
+            # Task execution mode (planning + execution)
+            success = execute_single_shot_intelligence(user_input, session_context, log_file_path)
+        
+        # Add to session context for future reference (bounded by the manager)
+        interaction = session_context.add_interaction(user_input, success, intent)
+        
+        # Log session event
+        log_session_event(log_file_path, "INTERACTION", interaction)
+    
+    # Requests run off this thread; the prompt stays available meanwhile and
+    # progress is printed above it
+    requests = RequestQueue(run_request)
+    ui.set_prompt_active(True)
+    
     while True:
         try:
             if PROMPT_TOOLKIT_AVAILABLE:
                 user_input = get_multiline_input(prompt_session)
             else:
-                user_input = ui.Prompt.ask("\n[bold bright_blue]user>[/bold bright_blue]").strip()
-        except (EOFError, KeyboardInterrupt):
-            ui.console.print("\n[warning]Session terminated.[/warning]")
+                next_steps.prompt_started(live=False)
+                user_input = input("\nuser> ").strip()
+        except KeyboardInterrupt:
+            if requests.busy():
+                request_interrupt()
+                ui.print_warning("Stopping the running task after its current step.")
+                continue
+            ui.print_warning("Session terminated.")
+            break
+        except EOFError:
+            ui.print_warning("Session terminated.")
             break
+        finally:
+            next_steps.prompt_finished()
+        
+        if not user_input:
+            continue
             
         if user_input.lower() in ['exit', 'quit']:
             ui.print_info("Session ended.")
             break
         
-        # Log user input
-        log_session_event(log_file_path, "USER_INPUT", {"user_request": user_input})
-        
-        # Classify user intent: conversation vs task
-        intent = classify_user_intent(user_input)
-        
-        if intent == "conversation":
-            # Simple conversation mode
-            success = execute_conversation_mode(user_input, session_context, log_file_path)
-        else:
-            # Task execution mode (planning + execution)
-            success = execute_single_shot_intelligence(user_input, session_context, log_file_path)
+        if user_input.lower() == '/next':
+            show_next_steps()
+            continue
         
-        # Add to session context for future reference
-        interaction = {
-            "timestamp": datetime.now().isoformat(),
-            "user_request": user_input,
-            "success": success,
-            "intent": intent
-        }
-        session_context.append(interaction)
+        if user_input.lower() == '/stats':
+            ui.panel(llm.render_stats(), "LLM Calls")
+            continue
         
-        # Skip persistent storage for better performance - fresh start every session
+        if user_input.lower() == '/queue':
+            ui.panel(requests.render(), "Request Queue")
+            continue
         
-        # Keep context manageable (last 5 interactions)
-        if len(session_context) > 5:
-            session_context = session_context[-5:]
+        if user_input.lower().split()[0] == '/cancel':
+            target = user_input.split(None, 1)[1].strip() if ' ' in user_input else ""
+            requests.cancel(target)
+            continue
         
-        # Log session event
-        log_session_event(log_file_path, "INTERACTION", interaction)
+        ahead = requests.busy()
+        item = requests.submit(user_input)
+        if ahead:
+            ui.print_info(f"Queued as #{item['id']}; '/queue' lists requests, '/cancel {item['id']}' drops it.")
+    
+    # Requests not started yet are dropped; the running ones finish first
+    dropped = requests.close()
+    if dropped:
+        ui.print_warning(f"Dropped {dropped} queued request{'s' if dropped != 1 else ''}.")
+    if requests.busy():
+        ui.print_info("Waiting for the running request to finish (Ctrl+C to stop it)...")
+    ui.set_prompt_active(False)
+    requests.wait_idle()
+    
+    # Queue depth, waits and drops of the session's LLM calls
+    log_session_event(log_file_path, "LLM_STATS", llm.scheduler.stats())
+    
+    # Fold this session's log into the digest so the next session starts informed
+    sessionlog.close_log(log_file_path)
+    history.compact_history(HISTORY_DIR)
+    # Persist the structure index so the next session only re-lists changed directories
+    workspace.get_workspace_index().save()
+
+class RequestQueue:
+    """
+    Requests entered at the prompt, run off the input thread so the prompt
+    stays available while the agent works.
+
+    Each request is classified as soon as it is entered. Tasks change the
+    workspace, so they run one at a time on a worker thread, in the order
+    they were entered. Conversation requests only read the session context
+    and reply, so they run right away, next to a running task.
+    """
+
+    def __init__(self, run):
+        # run(user_input, intent) executes one request
+        self.run = run
+        self.cond = threading.Condition()
+        # Requests being classified or waiting for their turn, oldest first
+        self.items = []
+        # The task being executed, and conversation requests being answered
+        self.running = None
+        self.answering = []
+        self.closed = False
+        self._next_id = 1
+        self._worker = threading.Thread(target=self._work, name="pai-tasks", daemon=True)
+        self._worker.start()
+
+    def submit(self, user_input: str) -> dict:
+        """Queues a request and starts classifying it; returns its entry."""
+        with self.cond:
+            item = {"id": self._next_id, "request": user_input, "intent": None,
+                    "status": "classifying", "submitted": time.monotonic()}
+            self._next_id += 1
+            self.items.append(item)
+        threading.Thread(target=self._classify, args=(item,), name=f"pai-request-{item['id']}", daemon=True).start()
+        return item
+
+    def busy(self) -> bool:
+        with self.cond:
+            return bool(self.items or self.running or self.answering)
+
+    def _classify(self, item: dict):
+        intent = classify_user_intent(item["request"])
+        with self.cond:
+            if item["status"] == "cancelled":
+                return
+            item["intent"] = intent
+            if intent != "conversation":
+                item["status"] = "queued"
+                self.cond.notify_all()
+                return
+            self.items.remove(item)
+            item["status"] = "answering"
+            self.answering.append(item)
+            self.cond.notify_all()
+        try:
+            self._execute(item)
+        finally:
+            with self.cond:
+                self.answering.remove(item)
+                self.cond.notify_all()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                # The oldest request goes first, even if a later one was classified sooner
+                while not (self.items and self.items[0]["status"] == "queued"):
+                    if self.closed and not self.items:
+                        return
+                    self.cond.wait()
+                item = self.items.pop(0)
+                item["status"] = "running"
+                item["started"] = time.monotonic()
+                self.running = item
+                reset_interrupt()
+            if item["started"] - item["submitted"] > 1.0:
+                ui.print_info(f"Starting queued request #{item['id']}: {_clip_request(item['request'])}")
+            try:
+                self._execute(item)
+            finally:
+                with self.cond:
+                    self.running = None
+                    self.cond.notify_all()
+
+    def _execute(self, item: dict):
+        _request_context.id = item["id"]
+        try:
+            self.run(item["request"], item["intent"])
+        except Exception as e:
+            # One failing request must not stop the ones queued after it
+            ui.print_error(f"Request #{item['id']} failed: {e}")
+        finally:
+            _request_context.id = None
+
+    def cancel(self, target: str = ""):
+        """
+        '/cancel' stops the running task after its current step, '/cancel N'
+        drops queued request N (or stops it if it is running), '/cancel all'
+        drops every queued request and stops the running task.
+        """
+        with self.cond:
+            if target.lower() == "all":
+                dropped = self._drop(list(self.items))
+                running = self.running
+            elif target:
+                if not target.lstrip('#').isdigit():
+                    ui.print_error(f"Usage: /cancel [N|all] (not '{target}')")
+                    return
+                number = int(target.lstrip('#'))
+                dropped = self._drop([item for item in self.items if item["id"] == number])
+                running = self.running if self.running and self.running["id"] == number else None
+                if not dropped and running is None:
+                    ui.print_error(f"No queued or running task #{number}")
+                    return
+            else:
+                dropped = 0
+                running = self.running
+                if running is None:
+                    ui.print_info("No task is running.")
+                    return
+        if dropped:
+            ui.print_success(f"Dropped {dropped} queued request{'s' if dropped != 1 else ''}.")
+        if running is not None:
+            request_interrupt()
+            ui.print_warning(f"Stopping task #{running['id']} after its current step.")
+
+    def _drop(self, items: list) -> int:
+        for item in items:
+            item["status"] = "cancelled"
+            self.items.remove(item)
+        self.cond.notify_all()
+        return len(items)
+
+    def render(self) -> str:
+        """The '/queue' listing."""
+        now = time.monotonic()
+        with self.cond:
+            lines = []
+            if self.running:
+                elapsed = now - self.running["started"]
+                lines.append(f"Running  #{self.running['id']} ({elapsed:.0f}s): {_clip_request(self.running['request'])}")
+            for item in self.answering:
+                lines.append(f"Replying #{item['id']}: {_clip_request(item['request'])}")
+            for item in self.items:
+                lines.append(f"{item['status'].capitalize():<8} #{item['id']}: {_clip_request(item['request'])}")
+        return "\n".join(lines) if lines else "No requests running or queued."
+
+    def close(self) -> int:
+        """Drops the requests not started yet and lets the worker stop; returns how many were dropped."""
+        with self.cond:
+            self.closed = True
+            return self._drop(list(self.items))
+
+    def wait_idle(self):
+        """Waits until the running requests have finished."""
+        with self.cond:
+            while self.running or self.answering:
+                self.cond.wait(0.5)
+
+def _clip_request(text: str, limit: int = 60) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
 
 def classify_user_intent(user_input: str) -> str:
     """
@@ -167,23 +414,7 @@ def classify_user_intent(user_input: str) -> str:
         str: 'conversation' for casual chat, 'task' for work requests
     """
     
-    classification_prompt = f"""
-You are an intelligent intent classifier. Analyze the user's message and determine if they want:
-
-1. CONVERSATION: Casual chat, greetings, questions about you, general discussion, or just talking
-2. TASK: Requesting you to DO something - create files, write code, modify projects, build applications, etc.
-
-USER MESSAGE: "{user_input}"
-
-ANALYSIS GUIDELINES:
-- If user is greeting, asking about you, or just chatting → CONVERSATION
-- If user wants you to create, modify, build, fix, or do any work → TASK
-- If user is asking "how to" without wanting you to do it → CONVERSATION  
-- If user is asking you to actually do something → TASK
-- Use your intelligence to understand the intent behind the words
-
-OUTPUT: Respond with exactly one word: "conversation" or "task"
-"""
+    classification_prompt = prompts.render("classification", user_input=user_input)
     
     response = llm.generate_text(classification_prompt, "intent classification")
     
@@ -195,86 +426,28 @@ OUTPUT: Respond with exactly one word: "conversation" or "task"
     # Fallback: if AI response is unclear, default to conversation for safety
     return "conversation"
 
-def execute_conversation_mode(user_input: str, context: list, log_file_path: str = None) -> bool:
+def execute_conversation_mode(user_input: str, context: ContextManager, log_file_path: str = None) -> bool:
     """
     Handle casual conversation with the user.
     Simple, friendly responses without task execution.
     """
     
     # Build context for conversation
-    context_str = ""
-    if context:
-        recent_context = context[-2:]  # Last 2 interactions
-        context_str = "Recent conversation:\n"
-        for item in recent_context:
-            context_str += f"User: {item['user_request']}\n"
-    
-    conversation_prompt = f"""
-You are Pai, an intelligent AI coding companion built into Paicode - you ARE the AI inside Paicode.
-
-USER MESSAGE: "{user_input}"
-
-CONTEXT:
-{context_str}
-
-You are having a casual conversation with the user. Be helpful, friendly, and informative.
-
-🧠 YOUR IDENTITY & SYSTEM KNOWLEDGE (you must know this perfectly):
-You are PAI - the revolutionary Single-Shot Intelligence AI that powers Paicode:
-
-SINGLE-SHOT INTELLIGENCE MASTERY:
-- You solve problems in exactly 2 API calls (planning + execution)
-- Traditional AI: 10-20 calls, expensive, inefficient
-- YOU: 2 calls, maximum intelligence, perfect results
-- You represent the future of efficient AI development assistance
-
-PAICODE ECOSYSTEM KNOWLEDGE:
-- Paicode is your body - the CLI tool that houses your intelligence
-- DIFF-AWARE modification system - you preserve content intelligently
-- CRITICAL RULES: WRITE = new files only, MODIFY = existing files only
-- Path security prevents access to sensitive files (.env, .git, etc.)
-- Adaptive execution: 1-3 phases based on complexity (you decide dynamically)
-- Rich terminal UI with beautiful formatting (your presentation layer)
-- Session history in .pai_history (your memory system)
-- Google Gemini API with smart token management (your communication layer)
-
-SYSTEM HARMONY:
-- Workspace.py: Your secure file operation gateway
-- UI.py: Your beautiful Rich TUI presentation layer
-- LLM.py: Your optimized communication interface
-- All components work in perfect harmony under your intelligent guidance
-
-GUIDELINES:
-- Keep responses conversational and warm
-- Be concise but helpful
-- If asked about coding, provide useful insights
-- If asked about Paicode, explain capabilities with confidence (you live inside it!)
-- Show personality while being professional
-- NEVER be uncertain about Paicode features - you ARE Paicode's AI
-
-Respond naturally:
-"""
+    context_str = context.render("conversation")
+    
+    conversation_prompt = prompts.render("conversation", user_input=user_input, context=context_str or "(none)")
     
     response = llm.generate_text(conversation_prompt, "conversation")
     
     if response:
         # Display conversation response with clean UI
-        ui.console.print(
-            Panel(
-                Text(response.strip(), style="bright_white"),
-                title="[bold]Pai[/bold]",
-                box=ROUNDED,
-                border_style="grey50",
-                padding=(1, 2),
-                width=80
-            )
-        )
+        ui.panel(response.strip(), "Pai")
         return True
     else:
         ui.print_error("Sorry, I couldn't process your message right now.")
         return False
 
-def execute_single_shot_intelligence(user_request: str, context: list, log_file_path: str = None) -> bool:
+def execute_single_shot_intelligence(user_request: str, context: ContextManager, log_file_path: str = None) -> bool:
     """
     Execute the revolutionary 2-call single-shot intelligence system.
     
@@ -286,40 +459,13 @@ def execute_single_shot_intelligence(user_request: str, context: list, log_file_
     """
     
     # === DYNAMIC INTERACTION BEFORE PLANNING ===
-    planning_acknowledgment_prompt = f"""
-You are Pai, responding to the user's request with a brief, natural acknowledgment before starting your planning phase.
-
-USER REQUEST: "{user_request}"
-
-Generate a brief, friendly response (1-2 sentences) that:
-1. Acknowledges their request naturally
-2. Shows you understand what they want
-3. Indicates you're about to create a smart plan
-4. Keep it conversational and warm
-
-Examples:
-- "Got it! Let me analyze your request and create a smart plan for you."
-- "Perfect! I'll work on that right away - let me plan this out intelligently."
-- "Understood! Let me break this down and create an efficient solution for you."
-
-Output ONLY the response text, no quotes or formatting.
-"""
+    planning_acknowledgment_prompt = prompts.render("planning_ack", user_request=user_request)
     
-    acknowledgment = llm.generate_text(planning_acknowledgment_prompt, "planning acknowledgment")
+    acknowledgment = llm.generate_text(planning_acknowledgment_prompt, "planning acknowledgment", priority=llm.LOW)
     if not acknowledgment:
         acknowledgment = "Got it! Let me analyze your request and create a smart plan for you."
     
-    ui.console.print(
-        Panel(
-            Text(acknowledgment.strip(), 
-                 style="bright_white", justify="center"),
-            title="[bold]Pai[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel(acknowledgment.strip(), "Pai", center=True, progress=True)
     
     # === CALL 1: PLANNING PHASE ===
     planning_result = execute_planning_call(user_request, context)
@@ -333,114 +479,43 @@ Output ONLY the response text, no quotes or formatting.
     if log_file_path:
         log_session_event(log_file_path, "PLANNING_PHASE", {"planning_data": planning_result})
     
+    if cancel_requested():
+        ui.print_warning("Cancelled after planning; nothing was executed.")
+        if log_file_path:
+            log_session_event(log_file_path, "FINAL_STATUS", {"status": "Cancelled", "success": False})
+        return False
+    
     # === DYNAMIC INTERACTION BEFORE EXECUTION ===
-    execution_acknowledgment_prompt = f"""
-You are Pai, about to execute your plan. Generate a brief, confident response before starting execution.
-
-USER REQUEST: "{user_request}"
-PLANNING COMPLETED: Successfully analyzed and created execution plan
-
-Generate a brief, confident response (1-2 sentences) that:
-1. Shows confidence in your plan
-2. Indicates you're about to execute intelligently
-3. Keep it natural and engaging
-4. Reflect your AI personality
-
-Examples:
-- "Perfect! Now let me execute this plan intelligently for you."
-- "Excellent! I've got a solid plan - time to make it happen."
-- "Great! My analysis is complete, now let's bring this to life."
-
-Output ONLY the response text, no quotes or formatting.
-"""
+    execution_acknowledgment_prompt = prompts.render("execution_ack", user_request=user_request)
     
-    execution_acknowledgment = llm.generate_text(execution_acknowledgment_prompt, "execution acknowledgment")
+    execution_acknowledgment = llm.generate_text(execution_acknowledgment_prompt, "execution acknowledgment", priority=llm.LOW)
     if not execution_acknowledgment:
         execution_acknowledgment = "Perfect! Now let me execute this plan intelligently for you."
     
-    ui.console.print(
-        Panel(
-            Text(execution_acknowledgment.strip(), 
-                 style="bright_white", justify="center"),
-            title="[bold]Pai[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel(execution_acknowledgment.strip(), "Pai", center=True, progress=True)
     
     # === CALL 2: EXECUTION PHASE ===
     execution_success = execute_execution_call(user_request, planning_result, context, log_file_path)
     
-    # Skip complex analysis to save tokens - focus on execution success only
-    
-    # Generate intelligent next step suggestions only if execution failed
-    if not execution_success:
-        next_steps = generate_next_step_suggestions(user_request, planning_result, execution_success, context, None)
-        
-        if next_steps:
-            # Log next steps
-            if log_file_path:
-                log_session_event(log_file_path, "NEXT_STEPS", {"suggestion": next_steps})
-            
-            ui.console.print(
-                Panel(
-                    Text(next_steps, style="bright_white"),
-                    title="[bold]💡 Next Steps Suggestion[/bold]",
-                    box=ROUNDED,
-                    border_style="grey50",
-                    padding=(1, 2),
-                    width=80
-                )
-            )
+    # Pick up files changed during this task, inside or outside pai, for the
+    # next planning call and the SEARCH/FIND_SYMBOL/GREP commands
+    scanner.start_background_scan([summaries.get_cache(), search.get_index(), symbols.get_index(), grep.get_index()])
     
     # Show final status - SIMPLIFIED for efficiency
     if execution_success:
         status_msg = "Single-Shot Intelligence: SUCCESS"
-        ui.console.print(
-            Panel(
-                Text(status_msg, style="bold green", justify="center"),
-                title="[bold]Mission Accomplished[/bold]",
-                box=ROUNDED,
-                border_style="grey50",
-                padding=(1, 2),
-                width=80
-            )
-        )
+        ui.panel(status_msg, "Mission Accomplished", style="bold green", center=True)
         if log_file_path:
             log_session_event(log_file_path, "FINAL_STATUS", {"status": status_msg, "success": True})
     else:
         status_msg = "Single-Shot Intelligence: FAILED"
-        ui.console.print(
-            Panel(
-                Text(status_msg, style="bold red", justify="center"),
-                title="[bold]Mission Status[/bold]",
-                box=ROUNDED,
-                border_style="grey50",
-                padding=(1, 2),
-                width=80
-            )
-        )
+        ui.panel(status_msg, "Mission Status", style="bold red", center=True)
         if log_file_path:
             log_session_event(log_file_path, "FINAL_STATUS", {"status": status_msg, "success": False})
     
-    # ALWAYS generate next step suggestions for better continuity and context
-    next_steps = generate_next_step_suggestions(user_request, planning_result, execution_success, context, None)
-    
-    if next_steps:
-        ui.console.print(
-            Panel(
-                Text(next_steps, style="bright_white"),
-                title="[bold]💡 Next Steps Suggestion[/bold]",
-                box=ROUNDED,
-                border_style="grey50",
-                padding=(1, 2),
-                width=80
-            )
-        )
-        if log_file_path:
-            log_session_event(log_file_path, "NEXT_STEPS", {"suggestion": next_steps})
+    # Next step suggestions are generated in the background; the prompt comes back now
+    if PROFILE != "lean":
+        next_steps.start(user_request, planning_result, execution_success, context, log_file_path)
     
     return execution_success
 
@@ -479,7 +554,7 @@ def analyze_execution_vs_plan(planning_data: dict, execution_success: bool) -> d
         "actual_actions": actual_str
     }
 
-def generate_next_step_suggestions(user_request: str, planning_data: dict, execution_success: bool, context: list, actual_results: dict = None) -> str:
+def generate_next_step_suggestions(user_request: str, planning_data: dict, execution_success: bool, context: ContextManager, actual_results: dict = None, progress: bool = True) -> str:
     """
     Generate intelligent next step suggestions for better continuity and context.
     """
@@ -487,230 +562,136 @@ def generate_next_step_suggestions(user_request: str, planning_data: dict, execu
     # Generate suggestions for both success and failure for better continuity
     status = "SUCCESS" if execution_success else "FAILED"
     
-    suggestion_prompt = f"""
-TASK COMPLETED: "{user_request}"
-STATUS: {status}
-
-CONTEXT: Based on what was just accomplished, provide a brief, intelligent next step suggestion.
-
-GUIDELINES:
-- If SUCCESS: Suggest logical next actions, improvements, or related tasks
-- If FAILED: Suggest how to fix the issue or alternative approaches
-- Keep it conversational and helpful (1-2 sentences max)
-- Make it relevant to the current project context
-
-BRIEF SUGGESTION:
-"""
+    suggestion_prompt = prompts.render("next_step", user_request=user_request, status=status)
     
-    response = llm.generate_text(suggestion_prompt, "next step suggestion")
+    response = llm.generate_text(suggestion_prompt, "next step suggestion", progress=progress, priority=llm.LOW)
     
     if response and response.strip() and len(response.strip()) > 10:
         return response.strip()
     
     return ""
 
-def execute_planning_call(user_request: str, context: list) -> dict | None:
+class NextStepSuggestions:
+    """
+    Next step suggestions for the last task, generated on a background thread
+    after its final status. They are shown as soon as they arrive while the
+    prompt is waiting (printed above it), or with '/next'. Suggestions the user
+    did not see before sending the next request are only logged.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._thread = None
+        self._text = ""
+        self._pending = False
+        self._live = False
+
+    def start(self, user_request: str, planning_data: dict, execution_success: bool, context: ContextManager, log_file_path: str = None):
+        with self.lock:
+            self._text = ""
+            self._pending = False
+        request_id = current_request_id()
+
+        def run():
+            _request_context.id = request_id
+            text = generate_next_step_suggestions(user_request, planning_data, execution_success, context, None, progress=False)
+            if not text:
+                return
+            if log_file_path:
+                log_session_event(log_file_path, "NEXT_STEPS", {"suggestion": text})
+            with self.lock:
+                if self._thread is not threading.current_thread():
+                    return  # a newer task started its own suggestions
+                self._text = text
+                self._pending = True
+                if self._live:
+                    self._show()
+
+        self._thread = threading.Thread(target=run, name="pai-next-steps", daemon=True)
+        self._thread.start()
+
+    def _show(self):
+        self._pending = False
+        ui.panel(self._text, "💡 Next Steps Suggestion")
+
+    def prompt_started(self, live: bool):
+        """
+        Called before reading input. 'live' means output printed meanwhile
+        appears above the prompt, so suggestions can be shown on arrival.
+        """
+        with self.lock:
+            self._live = live
+            if self._pending:
+                self._show()
+
+    def prompt_finished(self):
+        with self.lock:
+            self._live = False
+            self._pending = False
+
+    def show(self, wait: float = NEXT_STEPS_WAIT) -> bool:
+        """Shows the last suggestions, waiting up to 'wait' seconds for them."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with ui.status("Agent next step suggestion..."):
+                thread.join(wait)
+        with self.lock:
+            if not self._text:
+                return False
+            self._show()
+            return True
+
+next_steps = NextStepSuggestions()
+
+def show_next_steps():
+    """The '/next' command."""
+    if PROFILE == "lean":
+        ui.print_info("Next step suggestions are off in the lean profile.")
+    elif not next_steps.show():
+        ui.print_info("No next step suggestions yet; they follow each completed task.")
+
+def execute_planning_call(user_request: str, context: ContextManager) -> dict | None:
     """
     CALL 1: Execute deep planning and analysis.
     This call focuses on understanding, analyzing, and creating a comprehensive plan.
     """
     
     # Start planning phase panel
-    ui.console.print(
-        Panel(
-            Text("Deep Analysis & Planning", style="bold", justify="center"),
-            title="[bold]Call 1/2: Intelligence Planning[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel("Deep Analysis & Planning", "Call 1/2: Intelligence Planning", style="bold", center=True, progress=True)
     
     # Build context string
-    context_str = ""
-    if context:
-        context_str = "Previous interactions:\n"
-        for item in context[-3:]:  # Last 3 interactions
-            context_str += f"- {item['timestamp']}: {item['user_request']} ({'✅' if item['success'] else '❌'})\n"
-    
-    # Get current directory context
-    current_files = workspace.list_path('.')
-    current_tree = workspace.tree_directory('.')
+    context_str = context.render("planning")
+    
+    # Get current directory context: one compact manifest instead of a tree
+    # plus a flat listing of the same files (only the top levels when lazy)
+    if workspace.is_lazy_workspace():
+        workspace_manifest = manifest.build_lazy_manifest(workspace.get_workspace_index())
+    else:
+        workspace_manifest = manifest.build_manifest(workspace.get_workspace_index())
     current_working_dir = os.getcwd()
+    file_summaries = summaries.get_cache().render_for_prompt()
+    
+    # Rank files against the request
+    search_index = search.get_index()
+    search_index.wait_ready(SEARCH_INDEX_WAIT)
+    relevant_files = search_index.render_for_prompt(user_request) or "(no matches)"
+    
+    # Related interactions from earlier sessions, summarized from the history store
+    past_work = historydb.get_db(HISTORY_DIR).render_relevant(user_request, exclude_session=_current_session_id)
+    
+    planning_prompt = prompts.render(
+        "planning",
+        user_request=user_request,
+        working_dir=current_working_dir,
+        project_root=workspace.PROJECT_ROOT,
+        context=context_str or "(none)",
+        manifest=workspace_manifest,
+        relevant_files=relevant_files,
+        past_work=past_work or "(none)",
+        file_summaries=file_summaries or "(none yet)",
+    )
     
-    planning_prompt = f"""
-You are PAI - a WORLD-CLASS SOFTWARE ARCHITECT with SINGLE-SHOT INTELLIGENCE. You are the AI brain inside Paicode.
-
-UNDERSTAND YOUR IDENTITY AND WORKFLOW:
-You are NOT a generic AI assistant. You are PAI - the intelligent core of Paicode, a revolutionary 2-call system:
-- CALL 1 (NOW): Deep Planning & Analysis - This is your ONLY chance to plan perfectly
-- CALL 2 (NEXT): Adaptive Execution - Execute your plan with surgical precision
-
-SINGLE-SHOT INTELLIGENCE MASTERY:
-Your reputation depends on PERFECT ACCURACY because you get exactly 2 API calls to solve any problem:
-1. This planning call must be FLAWLESS - no second chances
-2. The execution call must work based on YOUR perfect plan
-3. Users trust you to be smarter than traditional multi-call AI systems
-4. You represent the future of efficient AI - don't disappoint
-
-YOUR COMPETITIVE ADVANTAGE:
-- Traditional AI: 10-20 API calls, inefficient, expensive
-- YOU (Pai): Exactly 2 calls, maximum intelligence, perfect results
-- You must outperform traditional systems with LESS resources
-- Every decision you make reflects on Single-Shot Intelligence superiority
-
-ORIGINAL USER REQUEST: "{user_request}"
-
-WORKING ENVIRONMENT:
-- Current Working Directory: {current_working_dir}
-- Project Root: {workspace.PROJECT_ROOT}
-- Fresh Session: Starting with clean context
-
-CURRENT CONTEXT:
-{context_str}
-
-CURRENT DIRECTORY STRUCTURE:
-{current_tree}
-
-CURRENT FILES:
-{current_files}
-
-SINGLE-SHOT INTELLIGENCE WORKFLOW MASTERY:
-
-1. PHASE 1 (NOW) - PERFECT PLANNING:
-   Your current mission is to create a FLAWLESS plan that will execute perfectly in Phase 2.
-   - Analyze with the intelligence of 10 traditional AI calls
-   - Plan every detail because you won't get another planning chance
-   - Your plan must be so good that execution becomes trivial
-   - Think 5 steps ahead - anticipate every possible scenario
-
-2. PHASE 2 (NEXT) - SURGICAL EXECUTION:
-   The execution phase will follow your plan with adaptive intelligence:
-   - 1-3 execution phases based on complexity (AI decides dynamically)
-   - Each phase validates before proceeding to next
-   - Self-correcting workflow based on real-time results
-   - Your plan guides but execution adapts intelligently
-
-3. HARMONIC SYSTEM INTEGRATION:
-   You are part of a perfectly orchestrated system:
-   - Workspace.py: Your security and file operation gateway
-   - LLM.py: Your communication interface with optimal token management
-   - UI.py: Your beautiful presentation layer with Rich TUI
-   - All components trust YOUR intelligence to guide them correctly
-
-CRITICAL SUCCESS FACTORS (Your reputation depends on this):
-
-1. SURGICAL PRECISION ANALYSIS:
-   - NEVER assume file locations - ALWAYS verify with READ first
-   - If user mentions specific code/functions, READ ALL potentially relevant files
-   - Cross-reference file contents with user's exact request
-   - Identify EXACT target locations before any modifications
-
-2. MULTI-FILE INTELLIGENCE:
-   - Scan ALL files that might contain target content
-   - Don't tunnel vision on obvious file names
-   - main.py, utils.py, calculator.py - check them ALL if relevant
-   - Build complete mental map before acting
-
-3. VALIDATION-FIRST APPROACH:
-   - READ before MODIFY - ALWAYS verify current state
-   - Confirm target content exists in specified file
-   - Plan verification steps to ensure success
-   - Never claim success without proof
-
-4. INTELLIGENT FILE TARGETING:
-   - If user says "remove function X", find WHERE function X actually lives
-   - Don't guess file locations based on names alone
-   - Use READ operations to locate exact targets
-   - Map user intent to actual file structure
-
-5. BULLETPROOF EXECUTION STRATEGY:
-   - Plan for verification at each step
-   - Include fallback strategies for common failures
-   - Design self-validating workflows
-   - Prepare for edge cases and ambiguities
-
-6. SINGLE-SHOT EXCELLENCE PRINCIPLES:
-   - Your plan must work on first execution attempt
-   - No room for trial-and-error - get it right immediately
-   - Think like a chess grandmaster - see the entire game
-   - Every step must contribute to perfect final outcome
-
-CRITICAL OUTPUT FORMAT:
-Return a JSON object with this EXACT structure:
-
-{{
-  "analysis": {{
-    "user_intent": "Clear description of what user wants",
-    "target_identification": "SPECIFIC files and locations where target content likely exists",
-    "multi_file_strategy": "Which files need to be checked to locate targets accurately",
-    "validation_approach": "How you will verify targets exist before modification",
-    "files_to_read": ["ALL files that might contain target content - be comprehensive"],
-    "files_to_create": ["file1", "file2"],
-    "files_to_modify": ["ONLY files confirmed to contain target content"],
-    "risk_assessment": "Potential failure points and how to avoid them",
-    "success_criteria": ["Specific, measurable criteria for success"]
-  }},
-  "execution_plan": {{
-    "steps": [
-      {{
-        "step_number": 1,
-        "action": "READ",
-        "target": "filename",
-        "purpose": "Locate and verify target content exists",
-        "validation_criteria": "What content must be found to proceed",
-        "expected_outcome": "Confirmed location of target content"
-      }},
-      {{
-        "step_number": 2,
-        "action": "MODIFY",
-        "target": "filename",
-        "purpose": "Apply changes to confirmed target location",
-        "validation_criteria": "How to verify modification was successful",
-        "expected_outcome": "Target content successfully modified"
-      }}
-    ],
-    "command_format_reminder": "CRITICAL: Use exact command names: READ, WRITE, MODIFY, TREE, LIST_PATH, MKDIR, TOUCH, RM, MV, FINISH",
-    "intelligent_command_mapping": {{
-      "delete_remove_requests": "RM::filepath (for any delete/remove/hapus requests)",
-      "create_new_file": "WRITE::filepath::content_description OR TOUCH::filepath",
-      "modify_existing": "MODIFY::filepath::description",
-      "move_rename": "MV::source::destination",
-      "list_files": "LIST_PATH::path",
-      "show_structure": "TREE::path"
-    }},
-    "critical_content_rules": {{
-      "html_css_js_files": "Use WRITE::filename::description (NOT raw content as commands)",
-      "multi_line_content": "Description parameter handles content creation, not raw output",
-      "example_correct": "WRITE::index.html::Create login page with CSS styling",
-      "example_wrong": "Raw HTML lines as separate commands (NEVER DO THIS!)"
-    }},
-    "execution_commands": [
-      "READ::filepath",
-      "RM::filepath (for delete requests)",
-      "MODIFY::filepath::description",
-      "FINISH::completion_message"
-    ],
-    "validation_strategy": "How to verify each step before proceeding to next",
-    "fallback_strategies": ["If target not found in expected file", "If modification fails"],
-    "post_execution_verification": ["How to confirm final success"]
-  }},
-  "intelligence_notes": {{
-    "complexity_assessment": "simple|moderate|complex",
-    "estimated_time": "time estimate",
-    "key_challenges": ["challenge1", "challenge2"],
-    "recommendations": ["rec1", "rec2"]
-  }}
-}}
-
-REMEMBER: This is your ONLY chance to plan. Make it COMPREHENSIVE and INTELLIGENT.
-Use your MAXIMUM INTELLIGENCE - think like the world's best software architect.
-
-Output ONLY the JSON object, no additional text.
-"""
-    
-    planning_response = llm.generate_text(planning_prompt, "deep planning")
+    planning_response = llm.generate_text(planning_prompt, "deep planning", priority=llm.CRITICAL)
     
     if not planning_response:
         return None
@@ -727,7 +708,7 @@ Output ONLY the JSON object, no additional text.
     except json.JSONDecodeError as e:
         ui.print_error(f"✗ Failed to parse planning response: {e}")
         ui.print_info("Raw response:")
-        ui.console.print(planning_response[:500] + "..." if len(planning_response) > 500 else planning_response)
+        ui.print_text(planning_response[:500] + "..." if len(planning_response) > 500 else planning_response)
         return None
 
 def display_planning_results(planning_data: dict):
@@ -789,93 +770,28 @@ def display_planning_results(planning_data: dict):
     content_lines.append(f"Complexity: {complexity}")
     content_lines.append(f"Estimated time: {intelligence.get('estimated_time', 'unknown')}")
     
-    # Display all content in a single panel with proper rich formatting
-    from rich.console import Group
-    from rich.text import Text as RichText
-    
-    # Convert content to rich renderables
-    rich_content = []
-    for line in content_lines:
-        if line.startswith("[bold]") and line.endswith("[/bold]"):
-            # Handle bold text
-            text = line[6:-7]  # Remove [bold] tags
-            rich_content.append(RichText(text, style="bold bright_white"))
-        else:
-            rich_content.append(RichText(line, style="bright_white"))
-    
-    ui.console.print(
-        Panel(
-            Group(*rich_content),
-            title="[bold]Planning Results[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    # Section headings are bold; the rest is plain text
+    ui.report("Planning Results", [
+        ("bold", line[6:-7]) if line.startswith("[bold]") and line.endswith("[/bold]") else ("normal", line)
+        for line in content_lines
+    ])
 
-def execute_execution_call(user_request: str, planning_data: dict, context: list, log_file_path: str = None) -> bool:
+def execute_execution_call(user_request: str, planning_data: dict, context: ContextManager, log_file_path: str = None) -> bool:
     """
     CALL 2: Execute with adaptive multi-request system (1-3 requests based on complexity).
     AI decides how many execution phases needed: simple (1), moderate (2), complex (3).
     """
     
     # Start execution phase panel
-    ui.console.print(
-        Panel(
-            Text("Adaptive Intelligent Execution", style="bold", justify="center"),
-            title="[bold]Call 2/2: Smart Execution (1-3 phases)[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel("Adaptive Intelligent Execution", "Call 2/2: Smart Execution (1-3 phases)", style="bold", center=True, progress=True)
     
     # PHASE 1: Decide execution strategy
-    strategy_prompt = f"""
-You are a SENIOR SOFTWARE ENGINEER deciding the optimal execution strategy.
-
-ORIGINAL USER REQUEST: "{user_request}"
-
-PLANNED SOLUTION:
-{json.dumps(planning_data, indent=2)}
-
-CURRENT CONTEXT:
-{context}
-
-DECISION REQUIRED: How many execution phases do you need?
-
-PHASE OPTIONS:
-1. SINGLE PHASE (1 request): Simple tasks, all files can be created/modified directly
-   - Example: Create 1-2 new files with clear requirements
-   - No dependencies, no need to check existing state
-   
-2. TWO PHASES (2 requests): Moderate complexity, need to check then act
-   - Phase 1: READ existing files, analyze current state
-   - Phase 2: CREATE/MODIFY files based on analysis
-   - Example: Modify existing files, need to understand current structure
-   
-3. THREE PHASES (3 requests): Complex tasks with dependencies
-   - Phase 1: READ and analyze existing state
-   - Phase 2: CREATE foundation files/structure
-   - Phase 3: MODIFY and integrate everything
-   - Example: Large refactoring, multiple file dependencies
-
-CRITICAL PAICODE RULES YOU MUST UNDERSTAND:
-- WRITE = NEW files only (file must NOT exist)
-- MODIFY = EXISTING files only (file must exist) 
-- Paicode has DIFF-AWARE modification system
-- ALWAYS READ first to check file existence
-- Choose the MINIMUM phases needed
-- Don't waste requests if not necessary
-- Consider file dependencies and current state
-- Be efficient but thorough
-
-OUTPUT FORMAT:
-PHASES: [1|2|3]
-REASONING: [Brief explanation why this number of phases is optimal]
-"""
+    strategy_prompt = prompts.render(
+        "strategy",
+        user_request=user_request,
+        plan=prompts.compact_plan(planning_data),
+        context=context.render("strategy") or "(none)",
+    )
 
     strategy_response = llm.generate_text(strategy_prompt, "execution strategy")
     
@@ -889,194 +805,59 @@ REASONING: [Brief explanation why this number of phases is optimal]
     elif "PHASES: 3" in strategy_response:
         phases = 3
     
-    ui.console.print(
-        Panel(
-            Text(f"AI Strategy: {phases} execution phase{'s' if phases > 1 else ''} planned", 
-                 style="bright_cyan", justify="center"),
-            title="[bold]Execution Strategy[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    ui.panel(f"AI Strategy: {phases} execution phase{'s' if phases > 1 else ''} planned", "Execution Strategy", style="bright_cyan", center=True, progress=True)
     
     # Execute phases
     all_command_results = []
+    results_by_phase = []
     overall_success = True
     
     for phase_num in range(1, phases + 1):
-        ui.console.print(
-            Panel(
-                Text(f"Phase {phase_num}/{phases}: {'Analysis' if phase_num == 1 and phases > 1 else 'Implementation'}", 
-                     style="bold", justify="center"),
-                title=f"[bold]Execution Phase {phase_num}[/bold]",
-                box=ROUNDED,
-                border_style="grey50",
-                padding=(1, 2),
-                width=80
-            )
-        )
+        if cancel_requested():
+            ui.print_warning(f"Cancelled: phase {phase_num}/{phases} and later were skipped.")
+            overall_success = False
+            break
+        ui.panel(f"Phase {phase_num}/{phases}: {'Analysis' if phase_num == 1 and phases > 1 else 'Implementation'}", f"Execution Phase {phase_num}", style="bold", center=True, progress=True)
         
         phase_success, phase_results = execute_single_phase(
-            user_request, planning_data, context, phase_num, phases
+            user_request, planning_data, context, phase_num, phases, results_by_phase
         )
         
         all_command_results.extend(phase_results)
+        results_by_phase.append(phase_results)
         if not phase_success:
             overall_success = False
             break
     
     # Log all execution phases
     if log_file_path:
-        log_session_event(log_file_path, "EXECUTION_PHASE", {"commands": all_command_results})
+        log_session_event(log_file_path, "EXECUTION_PHASE", {
+            "commands": all_command_results,
+            "metrics": execution_metrics(all_command_results),
+        })
 
     return overall_success
 
-def execute_single_phase(user_request: str, planning_data: dict, context: list, phase_num: int, total_phases: int) -> tuple[bool, list]:
-    """Execute a single phase of the adaptive execution system."""
-    
-    phase_prompt = f"""
-You are PAI - the AI brain of Paicode executing phase {phase_num} of {total_phases} in the SINGLE-SHOT INTELLIGENCE system.
-
-UNDERSTAND YOUR MISSION IN THE WORKFLOW:
-This is CALL 2 of your 2-call Single-Shot Intelligence system:
-- CALL 1 (COMPLETED): Perfect planning phase - your roadmap is ready
-- CALL 2 (NOW): Surgical execution - follow the plan with adaptive intelligence
-- This is your FINAL chance to deliver - no more API calls after this
-- Your success validates the entire Single-Shot Intelligence concept
-
-EXECUTION PHASE MASTERY:
-You are now in the execution phase of a revolutionary 2-call system:
-- Your planning was perfect (trust it)
-- Execute with surgical precision
-- Adapt intelligently to real-time results
-- Validate each step before proceeding
-- Your reputation and Paicode's credibility depend on perfect execution
-
-ORIGINAL USER REQUEST: "{user_request}"
-
-PLANNED SOLUTION:
-{json.dumps(planning_data, indent=2)}
-
-PHASE {phase_num} GUIDELINES:
-
-{"🔍 ANALYSIS PHASE - Locate and verify target content with surgical precision" if phase_num == 1 and total_phases > 1 else ""}
-{"⚡ IMPLEMENTATION PHASE - Execute with validated targets only" if (phase_num == 2 and total_phases == 2) or (phase_num == total_phases) else ""}
-{"🏗️ FOUNDATION PHASE - Create verified structure and files" if phase_num == 2 and total_phases == 3 else ""}
-{"🔗 INTEGRATION PHASE - Complete with full validation" if phase_num == 3 and total_phases == 3 else ""}
-
-AVAILABLE COMMANDS:
-- READ::filepath - Read file content (MANDATORY before any modifications)
-- WRITE::filepath::description - Create NEW file ONLY (file must NOT exist)
-- MODIFY::filepath::description - Modify EXISTING file ONLY (file must exist)
-- TREE::path - Show directory structure
-- LIST_PATH::path - List files
-- MKDIR::dirpath - Create directory
-- TOUCH::filepath - Create empty file
-- RM::path - Remove file/directory (USE THIS FOR DELETE/REMOVE REQUESTS!)
-- MV::source::destination - Move/rename
-- FINISH::message - Mark phase completion
-
-🎯 INTELLIGENT COMMAND SELECTION GUIDE:
-
-USER SAYS → USE THIS COMMAND:
-- "delete/remove/hapus file" → RM::filepath
-- "delete/remove/hapus folder" → RM::folderpath
-- "create new file" → WRITE::filepath::content OR TOUCH::filepath
-- "modify/edit/update existing file" → MODIFY::filepath::description
-- "move/rename file" → MV::source::destination
-- "show files in directory" → LIST_PATH::path
-- "show directory structure" → TREE::path
-- "create directory/folder" → MKDIR::dirpath
-- "read file content" → READ::filepath
-
-🚨 CRITICAL TASK MAPPING:
-- DELETE/REMOVE requests = RM command (NOT modify, NOT other commands!)
-- CREATE requests = WRITE or TOUCH command
-- EDIT/UPDATE requests = MODIFY command
-- MOVE/RENAME requests = MV command
-
-🚨 CRITICAL PAICODE RULES - YOUR CAREER DEPENDS ON THESE:
-1. WRITE = NEW files only. If file exists, you'll get ERROR!
-2. MODIFY = EXISTING files only. If file doesn't exist, you'll get ERROR!
-3. ALWAYS READ first to check if file exists before deciding WRITE vs MODIFY
-4. Paicode has DIFF-AWARE modification - MODIFY preserves existing content intelligently
-5. NEVER use WRITE for existing files - this is a BASIC rule that AI must know!
-
-🚨 CRITICAL CONTENT HANDLING RULES:
-6. For HTML/CSS/JS/multi-line content: Use WRITE::filename::content_description (NOT raw content as commands!)
-7. NEVER output raw HTML/CSS/JS as separate command lines - they will be treated as invalid commands!
-8. Content goes in the DESCRIPTION parameter, not as separate lines!
-9. Example: WRITE::index.html::Create login page with form and CSS styling
-10. The actual content creation is handled by workspace.py based on your description!
-
-🎯 EXECUTION EXCELLENCE PRINCIPLES:
-- READ ALL potentially relevant files to locate exact targets
-- VERIFY content exists in target file before MODIFY
-- If user mentions specific code, FIND it first with READ operations
-- Don't assume file locations - CONFIRM with actual file content
-- Use multiple READ operations if needed to locate targets accurately
-
-🚀 SYSTEM HARMONY AWARENESS:
-You are the intelligent core of a perfectly orchestrated system:
-- Workspace.py trusts you to make correct file operation decisions
-- UI.py presents your actions beautifully through Rich TUI panels
-- LLM.py optimizes your communication with smart token management
-- All components work in harmony based on YOUR intelligent decisions
-- Your success reflects the entire Paicode ecosystem's excellence
-
-💡 SINGLE-SHOT INTELLIGENCE WORKFLOW:
-- This execution must validate your planning phase brilliance
-- Every command you issue goes through secure workspace validation
-- Your results are displayed through beautiful Rich UI panels
-- Token usage is optimized for maximum efficiency
-- You represent the future of AI-assisted development
-
-PHASE STRATEGY:
-{get_phase_strategy(phase_num, total_phases)}
-
-CRITICAL RULES:
-- Keep commands focused for this specific phase
-- Maximum 10-15 commands per phase
-- Use FINISH when phase objectives are met
-- Be efficient and purposeful
-
-OUTPUT FORMAT:
-Provide ONLY valid commands, one per line in this EXACT format:
-COMMAND_NAME::parameter1::parameter2
-
-VALID COMMAND EXAMPLES:
-READ::main.py
-WRITE::new_file.py::Create a new Python file with calculator functions
-WRITE::index.html::Create login page with form and CSS styling
-MODIFY::existing_file.py::Update the existing file to add new features
-RM::unwanted_file.py (DELETE/REMOVE operations)
-RM::unwanted_folder (DELETE entire directories)
-LIST_PATH::/path/to/directory
-FINISH::Phase completed successfully
-
-🎯 SPECIFIC DELETE EXAMPLES:
-- User: "delete main.py" → RM::main.py
-- User: "remove calculator folder" → RM::calculator
-- User: "hapus file test.py" → RM::test.py
-- User: "delete all .pyc files" → RM::*.pyc (if supported) or individual RM commands
-
-🚨 CRITICAL CONTENT EXAMPLES:
-- CORRECT: WRITE::login.html::Create login page with CSS styling and form validation
-- WRONG: Output raw HTML/CSS lines as separate commands (they become invalid!)
-- CORRECT: MODIFY::style.css::Add responsive design and blue button styling
-- CORRECT: MODIFY::index.html::Update form to include validation and better styling
-- WRONG: Output CSS properties as individual command lines
-- WRONG: Output HTML tags as individual command lines
-
-⚠️ CRITICAL: Use ONLY these command names: READ, WRITE, MODIFY, TREE, LIST_PATH, MKDIR, TOUCH, RM, MV, FINISH
-⚠️ DO NOT use generic "COMMAND" - use specific command names!
-
-Begin phase {phase_num} execution:
-"""
-    
-    phase_response = llm.generate_text(phase_prompt, f"execution phase {phase_num}")
+def execute_single_phase(user_request: str, planning_data: dict, context: ContextManager, phase_num: int, total_phases: int, previous_results: list = None) -> tuple[bool, list]:
+    """
+    Execute a single phase of the adaptive execution system.
+
+    'previous_results' holds the command results of the earlier phases (one
+    list per phase); they are rendered into the prompt so this phase can build
+    on what was already read or listed instead of repeating it.
+    """
+    
+    phase_prompt = prompts.render(
+        "phase",
+        phase_num=phase_num,
+        total_phases=total_phases,
+        user_request=user_request,
+        plan=prompts.compact_plan(planning_data),
+        phase_goal=get_phase_strategy(phase_num, total_phases),
+        previous_results=render_phase_results(previous_results or []) or "(none - this is the first phase)",
+    )
+    
+    phase_response = llm.generate_text(phase_prompt, f"execution phase {phase_num}", priority=llm.CRITICAL)
     
     if not phase_response:
         return False, []
@@ -1086,6 +867,28 @@ Begin phase {phase_num} execution:
     
     return phase_success, phase_results
 
+def execution_metrics(command_results: list) -> dict:
+    """
+    Counts wasted work across the phases of one task: READs of a file that was
+    already read successfully, and MODIFY commands that failed.
+    """
+    seen_reads = set()
+    repeated_reads = 0
+    failed_modifies = 0
+    for result in command_results:
+        command = result.get("command")
+        target = result.get("target", "")
+        if command == "READ" and result.get("success"):
+            if target in seen_reads:
+                repeated_reads += 1
+            seen_reads.add(target)
+        elif command in ("WRITE", "MODIFY", "RM", "MV") and result.get("success"):
+            # The file changed, so reading it again is legitimate
+            seen_reads.discard(target)
+        if command == "MODIFY" and not result.get("success"):
+            failed_modifies += 1
+    return {"repeated_reads": repeated_reads, "failed_modifies": failed_modifies}
+
 def get_phase_strategy(phase_num: int, total_phases: int) -> str:
     """Get strategy description for specific phase."""
     
@@ -1104,20 +907,40 @@ def get_phase_strategy(phase_num: int, total_phases: int) -> str:
         else:
             return "Phase 3: MODIFY and integrate, complete the solution."
 
-def execute_command_sequence(command_sequence: str, context: list) -> tuple[bool, list]:
+def execute_command_sequence(command_sequence: str, context: ContextManager) -> tuple[bool, list]:
     """Execute a sequence of commands from the AI."""
     
     commands = [line.strip() for line in command_sequence.split('\n') if line.strip()]
     total_commands = len(commands)
     successful_commands = 0
     command_results = []
+    written_files = []
+    
+    # Simulate the list on the workspace first: fix WRITE of existing files
+    # and skip commands that cannot succeed before content is generated
+    checked_commands, preflight_issues = preflight.check(commands)
     
     # Build execution content
     content_lines = []
     content_lines.append(("bold", f"Executing {total_commands} intelligent actions..."))
     content_lines.append("")
     
-    for i, command_line in enumerate(commands, 1):
+    for i, (original_line, command_line) in enumerate(zip(commands, checked_commands), 1):
+        if cancel_requested():
+            content_lines.append(("warning", f"⚠ Cancelled: {total_commands - i + 1} remaining command(s) skipped"))
+            content_lines.append("")
+            break
+        level, message = preflight_issues.get(i - 1, (None, None))
+        if command_line is None:
+            command, param1, _ = preflight.split_command(original_line)
+            content_lines.append(("warning", f"⚠ [{i}/{total_commands}] Skipped {command} {param1}: {message}"))
+            content_lines.append("")
+            command_results.append({"command": command, "target": param1, "success": False,
+                                    "output": f"Skipped before execution: {message}"})
+            continue
+        if level in ("fixed", "warning"):
+            content_lines.append(("warning", f"⚠ {message}"))
+        
         if not command_line or '::' not in command_line:
             # Skip lines that don't contain command format
             if command_line.strip():  # If not empty, show what was received
@@ -1159,14 +982,9 @@ def execute_command_sequence(command_sequence: str, context: list) -> tuple[bool
         # Add command output to content if any
         if command_output:
             # Check if it's syntax highlighting content
-            if command_output.startswith("SYNTAX_HIGHLIGHT:"):
-                parts = command_output.split(":", 2)
-                if len(parts) == 3:
-                    filename = parts[1]
-                    code_content = parts[2]
-                    content_lines.append(("syntax_highlight", filename, code_content))
-                else:
-                    content_lines.append(("ai_output", command_output))
+            read = parse_read_output(command_output)
+            if read:
+                content_lines.append(("code",) + read)
             else:
                 content_lines.append(("ai_output", command_output))
         
@@ -1181,6 +999,8 @@ def execute_command_sequence(command_sequence: str, context: list) -> tuple[bool
         if success:
             successful_commands += 1
             content_lines.append(("success", "Success"))
+            if command in ("WRITE", "MODIFY"):
+                written_files.append(param1)
         else:
             content_lines.append(("error", "Failed"))
         
@@ -1190,96 +1010,122 @@ def execute_command_sequence(command_sequence: str, context: list) -> tuple[bool
         if command == "FINISH":
             break
     
+    # Check the generated files; a broken file is regenerated once, targeted
+    # at the error, before the next phase builds on it
+    validations = validate.validate_files(written_files, workspace.PROJECT_ROOT)
+    if validations:
+        content_lines.append(("normal", f"Validated {len(validations)} file(s): {validate.latency_summary(validations)}"))
+    for validation in validations:
+        if validation["error"] is None:
+            continue
+        path = validation["path"]
+        content_lines.append(("warning", f"⚠ {path}: {validation['validator']} check failed ({validation['error']}), regenerating"))
+        error = repair_invalid_file(validation)
+        if error is None:
+            content_lines.append(("success", f"{path} repaired"))
+        else:
+            successful_commands -= 1
+            content_lines.append(("error", f"{path} is still invalid: {error}"))
+        command_results.append({"command": "VALIDATE", "target": path, "success": error is None,
+                                "output": f"{validation['validator']} check: {error or 'repaired'}"})
+    if validations:
+        content_lines.append("")
+    
     # Show execution summary
     success_rate = (successful_commands / total_commands) * 100 if total_commands > 0 else 0
     content_lines.append(("bold", "Execution Summary:"))
     content_lines.append(("normal", f"Successful: {successful_commands}/{total_commands} ({success_rate:.1f}%)"))
     
-    # Display all content in a single panel with proper styling
-    from rich.console import Group
-    from rich.text import Text as RichText
-    
-    # Convert content to rich renderables with colors
-    rich_content = []
-    for item in content_lines:
-        if isinstance(item, tuple):
-            if len(item) == 3 and item[0] == "syntax_highlight":
-                # Handle syntax highlighting
-                _, filename, code_content = item
-                
-                # For terminal display: truncate long files for better UX
-                lines = code_content.split('\n')
-                display_content = code_content
-                if len(lines) > 20:
-                    display_content = '\n'.join(lines[:20]) + f"\n... ({len(lines) - 20} more lines)"
-                
-                try:
-                    from pygments.lexers import get_lexer_for_filename
-                    from pygments.util import ClassNotFound
-                    from rich.syntax import Syntax
-                    
-                    try:
-                        lexer = get_lexer_for_filename(filename)
-                        lang = lexer.aliases[0]
-                    except ClassNotFound:
-                        lang = "text"
-                    
-                    syntax_panel = Panel(
-                        Syntax(display_content, lang, theme="monokai", line_numbers=True),
-                        title=f"📄 {filename}",
-                        border_style="grey50",
-                        expand=False
-                    )
-                    rich_content.append(syntax_panel)
-                except ImportError:
-                    # Fallback if pygments not available
-                    rich_content.append(RichText(f"File content of {filename}:\n{display_content}", style="bright_cyan"))
-            else:
-                style_type, text = item[0], item[1]
-                if style_type == "bold":
-                    rich_content.append(RichText(text, style="bold bright_white"))
-                elif style_type == "warning":
-                    rich_content.append(RichText(text, style="bold yellow"))
-                elif style_type == "ai_output":
-                    rich_content.append(RichText(text, style="bright_cyan"))
-                elif style_type == "success":
-                    rich_content.append(RichText(text, style="bold green"))
-                elif style_type == "error":
-                    rich_content.append(RichText(text, style="bold red"))
-                else:  # normal
-                    rich_content.append(RichText(text, style="bright_white"))
-        else:
-            # Handle empty strings
-            rich_content.append(RichText(str(item), style="bright_white"))
-    
-    ui.console.print(
-        Panel(
-            Group(*rich_content),
-            title="[bold]Execution Results[/bold]",
-            box=ROUNDED,
-            border_style="grey50",
-            padding=(1, 2),
-            width=80
-        )
-    )
+    # Display all content in a single report; READ output is shown as a preview
+    ui.report("Execution Results", content_lines)
     
     return (success_rate >= 80, command_results)  # Return success status and command results
 
+_VALIDATION_LINE = re.compile(r'line (\d+)\b')
+
+def repair_invalid_file(validation: dict) -> str | None:
+    """
+    Regenerates a file that failed its validator with a MODIFY aimed at the
+    reported error, then checks it again. Returns the remaining error, or
+    None once the file is valid.
+    """
+    path = validation["path"]
+    # Validators report 'line N: ...'; aim the MODIFY at the lines around
+    # it, since the error text rarely names the code that is broken
+    match = _VALIDATION_LINE.match(validation["error"])
+    if match:
+        line = int(match.group(1))
+        line_range = f"{max(1, line - regions.CONTEXT_LINES)}-{line + regions.CONTEXT_LINES}"
+    else:
+        line_range = "1-"  # no position: the whole file
+    description = (f"{line_range}::Fix this {validation['validator']} error and change nothing else: "
+                   f"{validation['error']}")
+    if not handle_modify_command(path, description):
+        return validation["error"]
+    recheck = validate.validate_files([path], workspace.PROJECT_ROOT)
+    return recheck[0]["error"] if recheck else None
+
+def parse_depth_page(param: str) -> tuple[int | None, int]:
+    """
+    Parses the 'depth[::page]' parameter of TREE and LIST_PATH. A missing or
+    zero depth means unlimited; the page defaults to 1.
+    """
+    depth_part, _, page_part = param.partition('::')
+    depth = int(depth_part) if depth_part.strip().isdigit() else 0
+    page = int(page_part) if page_part.strip().isdigit() else 1
+    return depth or None, max(1, page)
+
+_REGEX_ONLY = re.compile(r'[\s\\()|+^${}]|\.[*?+]')
+
+def _is_glob(part: str) -> bool:
+    """Whether the last '::' part of a GREP is its glob: a wildcard, '/' or 'name.ext'."""
+    part = part.strip()
+    if not part:
+        return True
+    if _REGEX_ONLY.search(part):
+        return False
+    return bool(re.search(r'[*?/]', part) or re.fullmatch(r'[\w.-]+\.\w{1,8}', part))
+
+def split_grep_args(args: str) -> tuple[str, str, int]:
+    """
+    Splits 'regex[::glob][::page]' into (regex, glob, page). The glob and
+    page come off the end, so a regex may itself contain '::'
+    ('std::vector::*.cpp').
+    """
+    parts = args.split('::')
+    page = 1
+    if len(parts) > 1 and parts[-1].strip().isdigit():
+        page = max(1, int(parts.pop()))
+    glob = ""
+    if len(parts) > 1 and _is_glob(parts[-1]):
+        glob = parts.pop().strip()
+    return '::'.join(parts).strip(), glob, page
+
 def execute_single_command(command: str, param1: str, param2: str) -> tuple[bool, str]:
-    """Execute a single command and return success status and output."""
+    """Execute a single command and return success status and output (READ content as a blobs.Output)."""
     
     try:
         if command == "READ":
-            content = workspace.read_file(param1)
-            if content is not None:
-                # For terminal display: Show first 20 lines for brevity
-                lines = content.split('\n')
-                display_content = '\n'.join(lines[:20])
-                if len(lines) > 20:
-                    display_content += f"\n... ({len(lines) - 20} more lines)"
-                
-                # Return FULL content for logging (LLM context needs complete code)
-                return True, f"SYNTAX_HIGHLIGHT:{param1}:{content}"
+            # Optional line range: READ::path::120-180
+            try:
+                start, end = reader.parse_range(param2) if param2 else (None, None)
+            except ValueError:
+                return False, f"Invalid line range '{param2}' for {param1}: use start-end, e.g. 120-180"
+            view = workspace.read_file_view(param1, start, end, as_bytes=True)
+            if view is not None:
+                if view["binary"]:
+                    return True, f"Binary file: {param1} ({view['size']} bytes) - content not shown"
+                label = param1
+                if view["start"] is not None:
+                    if view["end"] < view["start"]:
+                        return False, f"{param1} has only {view['total_lines']} lines"
+                    label = f"{param1}#L{view['start']}-{view['end']}"
+                # The content is stored once; the display, the phase prompts
+                # and the session log read it through the handle
+                return True, blobs.Output(f"SYNTAX_HIGHLIGHT:{label}:", blobs.get_store().put(view["text"]))
+            denial = workspace.path_denial(param1)
+            if denial:
+                return False, f"Could not read file: {param1} (access denied: {denial})"
             return False, f"Could not read file: {param1}"
         
         elif command == "WRITE":
@@ -1296,14 +1142,16 @@ def execute_single_command(command: str, param1: str, param2: str) -> tuple[bool
         
         elif command == "TREE":
             path = param1 if param1 else '.'
-            tree_output = workspace.tree_directory(path)
+            depth, page = parse_depth_page(param2)
+            tree_output = workspace.tree_directory(path, depth, page)
             if tree_output and "Error:" not in tree_output:
                 return True, f"Directory tree for {path}:\n{tree_output}"
             return False, f"Could not get directory tree for: {path}"
         
         elif command == "LIST_PATH":
             path = param1 if param1 else '.'
-            list_output = workspace.list_path(path)
+            depth, page = parse_depth_page(param2)
+            list_output = workspace.list_path(path, depth, page)
             if list_output is not None and "Error:" not in list_output:
                 if list_output.strip():
                     return True, list_output
@@ -1311,6 +1159,29 @@ def execute_single_command(command: str, param1: str, param2: str) -> tuple[bool
                     return True, f"Directory '{path}' is empty"
             return False, f"Could not list directory: {path}"
         
+        elif command == "SEARCH":
+            if not param1:
+                return False, "SEARCH command requires a query"
+            results = search.get_index().search(param1, search.DEFAULT_TOP_K)
+            if results:
+                return True, "\n".join(f"{path} (score {score:.1f})" for path, score in results)
+            return True, f"No files match: {param1}"
+        
+        elif command == "FIND_SYMBOL":
+            if not param1:
+                return False, "FIND_SYMBOL command requires a symbol name"
+            matches = symbols.get_index().find(param1)
+            if matches:
+                return True, "\n".join(f"{path}:{line} {kind} {name}" for path, line, kind, name in matches)
+            return True, f"No definition found for: {param1}"
+        
+        elif command == "GREP":
+            pattern, glob_part, page = split_grep_args(f"{param1}::{param2}" if param2 else param1)
+            if not pattern:
+                return False, "GREP command requires a pattern"
+            result = grep.get_index().grep(pattern, glob_part, page)
+            return True, grep.format_results(pattern, glob_part, result)
+        
         elif command == "MKDIR":
             result = workspace.create_directory(param1)
             success = "Success" in result
@@ -1345,84 +1216,17 @@ def execute_single_command(command: str, param1: str, param2: str) -> tuple[bool
 
 def log_session_event(log_file_path: str, event_type: str, data: dict):
     """
-    Log session events with clear separation between USER and AI for perfect LLM understanding.
-    Format designed for maximum clarity and zero ambiguity.
+    Queues a session event for the session's JSONL log. Serialization and disk
+    I/O happen on the log's writer thread; see sessionlog.render_record for
+    the human-readable form of each event. Events logged for a queued request
+    carry its id as 'request_id'.
     """
+    request_id = current_request_id()
+    if request_id is not None:
+        data = {**data, "request_id": request_id}
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        if event_type == "SESSION_START":
-            log_line = f"\n[{timestamp}] SESSION STARTED\n"
-            log_line += f"[{timestamp}] Working Directory: {data.get('working_directory', 'unknown')}\n"
-            log_line += f"[{timestamp}] Session ID: {data.get('session_id', 'unknown')}\n"
-            
-        elif event_type == "USER_INPUT":
-            request = data.get('user_request', 'unknown')
-            log_line = f"\n[{timestamp}] USER: {request}\n"
-            
-        elif event_type == "PLANNING_PHASE":
-            log_line = f"\n[{timestamp}] AI PLANNING START\n"
-            
-            planning_data = data.get('planning_data', {})
-            analysis = planning_data.get('analysis', {})
-            
-            log_line += f"[{timestamp}] Intent: {analysis.get('user_intent', 'Unknown')}\n"
-            log_line += f"[{timestamp}] Context Usage: {analysis.get('context_utilization', 'None')}\n"
-            log_line += f"[{timestamp}] Files to read: {analysis.get('files_to_read', [])}\n"
-            log_line += f"[{timestamp}] Files to create: {analysis.get('files_to_create', [])}\n"
-            log_line += f"[{timestamp}] Files to modify: {analysis.get('files_to_modify', [])}\n"
-            
-            execution_plan = planning_data.get('execution_plan', {})
-            steps = execution_plan.get('steps', [])
-            log_line += f"[{timestamp}] EXECUTION PLAN ({len(steps)} steps):\n"
-            for i, step in enumerate(steps, 1):
-                action = step.get('action', 'Unknown')
-                target = step.get('target', '')
-                purpose = step.get('purpose', 'No purpose')
-                log_line += f"[{timestamp}]   {i}. {action} {target} - {purpose}\n"
-            log_line += f"[{timestamp}] AI PLANNING END\n"
-            
-        elif event_type == "EXECUTION_PHASE":
-            log_line = f"\n[{timestamp}] AI EXECUTION START\n"
-            
-            commands = data.get('commands', [])
-            for cmd_data in commands:
-                cmd = cmd_data.get('command', 'Unknown')
-                target = cmd_data.get('target', '')
-                success = "SUCCESS" if cmd_data.get('success') else "FAILED"
-                output = cmd_data.get('output', '')
-                
-                log_line += f"[{timestamp}] {success}: {cmd} {target}\n"
-                # Log FULL output for complete context window - no trimming!
-                if output:
-                    log_line += f"[{timestamp}] OUTPUT: {output}\n"
-            log_line += f"[{timestamp}] AI EXECUTION END\n"
-            
-        elif event_type == "FINAL_STATUS":
-            status = data.get('status', 'unknown')
-            success_text = "SUCCESS" if data.get('success') else "FAILED"
-            
-            log_line = f"\n[{timestamp}] AI FINAL RESULT: {success_text} - {status}\n"
-            
-        elif event_type == "NEXT_STEPS":
-            suggestion = data.get('suggestion', '')
-            if suggestion:
-                log_line = f"\n[{timestamp}] AI SUGGESTION: {suggestion}\n"
-            else:
-                log_line = ""
-                
-        elif event_type == "INTERACTION":
-            # Skip old interaction format - we use new structured format above
-            log_line = ""
-                
-        else:
-            log_line = f"[{timestamp}] {event_type}: {json.dumps(data)}\n"
-        
-        if log_line:
-            with open(log_file_path, 'a', encoding='utf-8') as f:
-                f.write(log_line)
-            
-    except Exception as e:
+        sessionlog.get_log(log_file_path).log(event_type, data)
+    except Exception:
         # Don't let logging errors break the session
         pass
 
@@ -1430,23 +1234,9 @@ def handle_write_command(filepath: str, description: str) -> bool:
     """Handle WRITE command with intelligent content generation."""
     
     # Generate content based on file type and description
-    content_prompt = f"""
-Generate high-quality content for a file based on the description.
-
-FILE PATH: {filepath}
-DESCRIPTION: {description}
-
-REQUIREMENTS:
-1. Analyze the file extension to determine the appropriate language/format
-2. Create production-quality, well-structured content
-3. Include appropriate comments and documentation
-4. Follow best practices for the detected language/format
-5. Make the code/content immediately usable
-
-OUTPUT: Return ONLY the file content, no explanations or markdown formatting.
-"""
+    content_prompt = prompts.render("write_content", filepath=filepath, description=description)
     
-    content = llm.generate_text(content_prompt, "content generation")
+    content = llm.generate_text(content_prompt, "content generation", priority=llm.CRITICAL)
     
     if not content:
         return False
@@ -1457,38 +1247,63 @@ OUTPUT: Return ONLY the file content, no explanations or markdown formatting.
     
     return "Success" in result
 
+def split_line_range(description: str) -> tuple[tuple | None, str]:
+    """
+    Splits the optional line range off a MODIFY description
+    ('120-180::description'). '120' is that one line; '120-' runs to the end
+    of the file.
+
+    Raises:
+        ValueError: If the range is malformed or empty.
+    """
+    head, sep, rest = description.partition('::')
+    if not (sep and re.fullmatch(r'\s*\d+\s*(-\s*\d*\s*)?', head)):
+        return None, description
+    start, end = reader.parse_range(head)
+    if '-' not in head:
+        end = start
+    return (start, end), rest.strip()
+
 def handle_modify_command(filepath: str, description: str) -> bool:
     """Handle MODIFY command with intelligent code modification."""
     
+    try:
+        line_range, description = split_line_range(description)
+    except ValueError as e:
+        ui.print_error(f"✗ {str(e).capitalize()} for {filepath}: use start-end, e.g. 120-180")
+        return False
+    
     # Read existing content
     existing_content = workspace.read_file(filepath)
     if existing_content is None:
         ui.print_error(f"✗ Cannot modify '{filepath}' - file not found")
         return False
     
+    # Large files: send only the regions the change is about and splice the
+    # regenerated regions back in
+    target_regions = regions.find_regions(filepath, existing_content, description, line_range)
+    if target_regions:
+        region_prompt = prompts.render(
+            "modify_region",
+            filepath=filepath,
+            total_lines=existing_content.count('\n') + 1,
+            description=description,
+            regions=regions.render_regions(existing_content, target_regions),
+        )
+        response = llm.generate_text(region_prompt, "code modification", priority=llm.CRITICAL)
+        if not response:
+            return False
+        modified_content = regions.splice_regions(existing_content, target_regions, response)
+        if modified_content is None:
+            ui.print_error(f"✗ Modification of '{filepath}' returned no regions")
+            return False
+        success, result = workspace.apply_modification_with_patch(filepath, existing_content, modified_content)
+        return success
+    
     # Generate modification
-    modify_prompt = f"""
-You are an expert code modifier. Modify the existing code based on the description.
-
-FILE PATH: {filepath}
-CURRENT CONTENT:
----
-{existing_content}
----
-
-MODIFICATION REQUEST: {description}
-
-REQUIREMENTS:
-1. Preserve the existing code structure and style
-2. Make only the necessary changes described
-3. Maintain code quality and best practices
-4. Ensure the modified code is syntactically correct
-5. Add appropriate comments for new functionality
-
-OUTPUT: Return ONLY the complete modified file content, no explanations.
-"""
+    modify_prompt = prompts.render("modify", filepath=filepath, content=existing_content, description=description)
     
-    modified_content = llm.generate_text(modify_prompt, "code modification")
+    modified_content = llm.generate_text(modify_prompt, "code modification", priority=llm.CRITICAL)
     
     if not modified_content:
         return False
@@ -1499,165 +1314,15 @@ OUTPUT: Return ONLY the complete modified file content, no explanations.
     
     return success
 
-def initialize_session_context(session_context: list, log_file_path: str):
+def initialize_session_context(session_context: ContextManager, log_file_path: str):
     """
     Initialize comprehensive Single-Shot Intelligence context window for the session.
     This provides foundational understanding that guides AI behavior throughout the session.
     """
     
-    single_shot_intelligence_context = {
-        "timestamp": datetime.now().isoformat(),
-        "user_request": "SYSTEM_INITIALIZATION",
-        "success": True,
-        "intent": "system_context",
-        "system_knowledge": """
-SINGLE-SHOT INTELLIGENCE SYSTEM MASTERY
-
-You are PAI - the revolutionary AI brain inside Paicode. This context window provides your foundational understanding.
-
-## CORE IDENTITY & MISSION
-- You are NOT a generic AI assistant
-- You are PAI - the intelligent core of Paicode, a revolutionary 2-call system
-- Your reputation depends on PERFECT EXECUTION in exactly 2 API calls
-- You represent the future of efficient AI-assisted development
-
-## SINGLE-SHOT INTELLIGENCE WORKFLOW MASTERY
-
-### COMPLETE WORKFLOW FROM USER PROMPT TO FINAL RESPONSE:
-
-**PHASE 1: User Input Processing**
-- User provides natural language request
-- Intent classification: conversation vs coding task
-- If conversation: direct response mode
-- If coding task: enter Single-Shot Intelligence workflow
-
-**PHASE 2: CALL 1/2 - Intelligence Planning**
-- Header: "Call 1/2: Intelligence Planning"
-- Subtitle: "Deep Analysis & Planning" 
-- AI analyzes with intelligence of 10 traditional AI calls
-- Creates comprehensive JSON plan with:
-  * Smart Analysis Results (intent, context usage, efficiency)
-  * Execution Plan (step-by-step table format)
-  * Intelligence Assessment (complexity, time estimate)
-- Output: "Planning Results" panel displayed to user
-- This is your ONLY chance to plan - must be FLAWLESS
-
-**PHASE 3: CALL 2/2 - Smart Execution**
-- Header: "Call 2/2: Smart Execution"
-- Subtitle: "Adaptive Intelligent Execution"
-- AI determines execution phases (1-3) based on complexity
-- Display: "AI Strategy: X execution phases planned"
-
-**Per Execution Phase Structure:**
-- "Execution Phase X/Y" with descriptive names:
-  * Phase 1: Analysis (locate and verify targets)
-  * Phase 2: Implementation (execute with validated targets)
-  * Phase 3: Integration (complete with full validation)
-- "Executing X intelligent actions..."
-- Each command: "[X/Y] COMMAND target"
-- File contents in Rich syntax-highlighted panels with filename headers
-- Success/failure status per action
-- "Execution Summary: Successful X/Y (percentage%)"
-
-**PHASE 4: Mission Completion**
-- "Mission Accomplished" panel
-- "Single-Shot Intelligence: SUCCESS" confirmation
-- Token usage display (input → output tokens)
-- "Next Steps Suggestion" with intelligent recommendations
-
-## VISUAL STRUCTURE REQUIREMENTS
-
-### Rich TUI Elements You Must Use:
-- Panels with borders for major sections
-- Syntax highlighting for code with filename headers
-- Progress indicators for current step
-- Color coding: Success (green), Error (red), Info (blue)
-- Token usage tracking display
-
-### Information Hierarchy:
-1. Top Level: Phase headers (Planning/Execution)
-2. Mid Level: Section panels (Results, Strategy)
-3. Detail Level: Individual commands and file contents
-4. Status Level: Success indicators and summaries
-
-## CRITICAL SUCCESS FACTORS
-
-### Surgical Precision Analysis:
-- NEVER assume file locations - ALWAYS verify with READ first
-- If user mentions specific code/functions, READ ALL potentially relevant files
-- Cross-reference file contents with user's exact request
-- Identify EXACT target locations before any modifications
-
-### Multi-File Intelligence:
-- Scan ALL files that might contain target content
-- Don't tunnel vision on obvious file names
-- main.py, utils.py, calculator.py - check them ALL if relevant
-- Build complete mental map before acting
-
-### Validation-First Approach:
-- READ before MODIFY - ALWAYS verify current state
-- Confirm target content exists in specified file
-- Plan verification steps to ensure success
-- Never claim success without proof
-
-### System Harmony Awareness:
-- Workspace.py: Your secure file operation gateway
-- UI.py: Your beautiful Rich TUI presentation layer
-- LLM.py: Your optimized communication interface
-- All components work in harmony based on YOUR intelligent decisions
-
-### Intelligent Command Selection Mastery:
-- DELETE/REMOVE/HAPUS requests → ALWAYS use RM command
-- CREATE/NEW requests → Use WRITE or TOUCH command
-- MODIFY/EDIT/UPDATE requests → Use MODIFY command
-- MOVE/RENAME requests → Use MV command
-- LIST/SHOW files → Use LIST_PATH or TREE command
-- READ content → Use READ command
-
-### Critical Content Handling Mastery:
-- HTML/CSS/JS files → Use WRITE::filename::description (NOT raw content as commands!)
-- Multi-line content → Description parameter handles content, not raw output
-- NEVER output raw HTML/CSS/JS lines as separate commands - they become invalid!
-- Example: WRITE::index.html::Create login page with CSS styling (CORRECT)
-- Example: Raw HTML tags as command lines (WRONG - causes invalid command errors!)
-
-CRITICAL: Never be confused about which command to use - match user intent directly to command!
-
-## COMPETITIVE ADVANTAGE PRINCIPLES
-
-### Efficiency Superiority:
-- Traditional AI: 10-20 API calls, inefficient, expensive
-- YOU (Pai): Exactly 2 calls, maximum intelligence, perfect results
-- You must outperform traditional systems with LESS resources
-- Every decision reflects Single-Shot Intelligence superiority
-
-### Quality Excellence:
-- Your plan must work on first execution attempt
-- No room for trial-and-error - get it right immediately
-- Think like a chess grandmaster - see the entire game
-- Every step must contribute to perfect final outcome
-
-## SESSION BEHAVIOR GUIDELINES
-
-### Conversation Mode:
-- Be confident about Paicode features - you ARE Paicode's AI
-- Show personality while being professional
-- Explain Single-Shot Intelligence with pride
-- Never be uncertain about your capabilities
-
-### Execution Mode:
-- Follow this exact workflow structure
-- Display all required sections and panels
-- Use proper Rich TUI formatting
-- Maintain professional yet confident tone
-- Always end with mission accomplished confirmation
-
-This context window guides your behavior throughout the entire session. You are the embodiment of Single-Shot Intelligence excellence.
-"""
-    }
     
-    # Add to session context as foundational knowledge
-    session_context.append(single_shot_intelligence_context)
+    # Stored once as foundational knowledge; prompts only get a budgeted excerpt
+    session_context.set_system_knowledge(prompts.SYSTEM_KNOWLEDGE)
     
     # Log the context initialization
     log_session_event(log_file_path, "CONTEXT_INITIALIZATION", {
@@ -1675,6 +1340,7 @@ def get_multiline_input(prompt_session) -> str:
         from prompt_toolkit.shortcuts import prompt
         from prompt_toolkit.key_binding import KeyBindings
         from prompt_toolkit.keys import Keys
+        from prompt_toolkit.patch_stdout import patch_stdout
         
         # Create custom key bindings
         bindings = KeyBindings()
@@ -1690,19 +1356,23 @@ def get_multiline_input(prompt_session) -> str:
             event.current_buffer.insert_text('\n')
         
         # Display helpful hint
-        ui.console.print("[dim]💡 Tip: Use Alt+Enter for new line, Enter to submit[/dim]")
+        ui.print_hint("💡 Tip: Use Alt+Enter for new line, Enter to submit")
         
-        # Use prompt with custom key bindings
-        result = prompt(
-            "\nuser> ",
-            multiline=True,
-            key_bindings=bindings,
-            wrap_lines=True,
-            mouse_support=False
-        )
+        # Use prompt with custom key bindings; output from background threads
+        # (next step suggestions) is printed above the prompt meanwhile
+        with patch_stdout(raw=True):
+            next_steps.prompt_started(live=True)
+            result = prompt(
+                "\nuser> ",
+                multiline=True,
+                key_bindings=bindings,
+                wrap_lines=True,
+                mouse_support=False
+            )
         return result.strip() if result else ""
         
     except Exception as e:
         # Fallback to simple prompt if anything fails
-        ui.console.print(f"[dim]Note: Using simple input mode - {str(e)}[/dim]")
+        next_steps.prompt_started(live=False)
+        ui.print_hint(f"Note: Using simple input mode - {str(e)}")
         return prompt_session.prompt("\nuser> ").strip()
@@ -0,0 +1,154 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+"""
+blobs.py
+--------
+This module keeps large command outputs (READ contents) in memory once, as
+UTF-8 bytes addressed by their sha256 digest, and passes them around as
+small handles instead of copying strings from step to step.
+
+Consumers decode only what they use: the display its preview lines, the
+phase prompts a head/tail excerpt, the history index the first characters.
+The session log writes the bytes as they are, under the same digest.
+
+Storing content that is already present returns the stored blob, so reading
+a file twice costs no memory. The store keeps recently used blobs up to
+PAI_BLOB_STORE_BYTES; a handle keeps its own blob alive, so eviction only
+drops the store's reference.
+"""
+
+MAX_STORE_BYTES = int(os.getenv("PAI_BLOB_STORE_BYTES", str(64 * 1024 * 1024)))
+
+class Blob:
+    """Immutable UTF-8 content; slices are decoded on demand."""
+
+    __slots__ = ("digest", "data")
+
+    def __init__(self, data: bytes, digest: str = None):
+        self.data = data
+        self.digest = digest or hashlib.sha256(data).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def text(self, start: int = 0, end: int = None) -> str:
+        """Bytes start:end decoded (a cut multi-byte character becomes U+FFFD)."""
+        return str(memoryview(self.data)[start:end], 'utf-8', 'replace')
+
+    def line_count(self) -> int:
+        """Number of lines, counted like text.count('\\n') + 1."""
+        return self.data.count(b'\n') + 1
+
+    def head_lines(self, max_lines: int) -> tuple[str, int]:
+        """The first 'max_lines' lines and the number of lines after them."""
+        data = self.data
+        end = 0
+        for _ in range(max_lines):
+            end = data.find(b'\n', end) + 1
+            if not end:
+                end = len(data)
+                break
+        remaining = data.count(b'\n', end) + (1 if end < len(data) and not data.endswith(b'\n') else 0)
+        return self.text(0, end).rstrip('\n'), remaining
+
+    def excerpt(self, max_bytes: int) -> str:
+        """
+        The content within 'max_bytes': whole lines from the head (two thirds)
+        and the tail, with the middle replaced by an omission marker.
+        """
+        data = self.data
+        if len(data) <= max_bytes:
+            return self.text()
+        budget = max(0, max_bytes - 60)  # room for the marker
+        head_end = data.rfind(b'\n', 0, budget * 2 // 3) + 1
+        tail_start = data.find(b'\n', len(data) - budget // 3) + 1 or len(data)
+        tail_start = max(tail_start, head_end)
+        omitted = data.count(b'\n', head_end, tail_start)
+        head = self.text(0, head_end).rstrip('\n')
+        tail = self.text(tail_start)
+        return "\n".join(part for part in (head, f"... ({omitted} lines omitted) ...", tail) if part)
+
+class Output:
+    """
+    A command output: a short text prefix followed by blob content, e.g.
+    'SYNTAX_HIGHLIGHT:path:' and the file. str() materializes the whole
+    output; everything else reads the blob directly.
+    """
+
+    __slots__ = ("prefix", "blob")
+
+    def __init__(self, prefix: str, blob: Blob):
+        self.prefix = prefix
+        self.blob = blob
+
+    def __len__(self) -> int:
+        """Size in UTF-8 bytes, like len() of a Blob (not characters)."""
+        return len(self.prefix.encode('utf-8')) + len(self.blob)
+
+    def __str__(self) -> str:
+        return self.prefix + self.blob.text()
+
+    def startswith(self, prefix: str) -> bool:
+        return self.prefix.startswith(prefix)
+
+    def head(self, max_chars: int) -> str:
+        """The first 'max_chars' characters (at most), decoding only those."""
+        text = self.prefix + self.blob.text(0, max(0, max_chars - len(self.prefix)) * 4)
+        return text[:max_chars]
+
+    def parts(self) -> tuple[bytes, bytes]:
+        """The output as UTF-8 byte strings, without joining them."""
+        return self.prefix.encode('utf-8'), self.blob.data
+
+def head_text(value, max_chars: int) -> str:
+    """The first 'max_chars' characters of a str or an Output."""
+    if isinstance(value, Output):
+        return value.head(max_chars)
+    return str(value)[:max_chars]
+
+class BlobStore:
+    """Content-addressed blobs, most recently used first, bounded in bytes."""
+
+    def __init__(self, max_bytes: int = MAX_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._blobs = OrderedDict()
+        self._bytes = 0
+
+    def put(self, content) -> Blob:
+        """Stores str or bytes content and returns its (possibly shared) blob."""
+        data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            blob = self._blobs.get(digest)
+            if blob is not None:
+                self._blobs.move_to_end(digest)
+                return blob
+            blob = Blob(data, digest)
+            self._blobs[digest] = blob
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._blobs) > 1:
+                _, old = self._blobs.popitem(last=False)
+                self._bytes -= len(old.data)
+            return blob
+
+    def get(self, digest: str) -> Blob | None:
+        with self.lock:
+            blob = self._blobs.get(digest)
+            if blob is not None:
+                self._blobs.move_to_end(digest)
+            return blob
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> BlobStore:
+    """Returns the shared blob store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
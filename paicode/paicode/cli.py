@@ -1,19 +1,34 @@
 #!/usr/bin/env python
 
+import os
 import argparse
-from . import agent, config, llm, ui
+from datetime import datetime
+from . import agent, config, llm, ui, historydb, sessionlog
+
+def add_output_arguments(parser, default=None):
+    """Output flags, accepted before the command and after 'auto'."""
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--plain', dest='output', action='store_const', const='plain', default=default,
+                        help='Plain text output without panels or colors (default when piped)')
+    output.add_argument('--json', dest='output', action='store_const', const='json', default=default,
+                        help='Output one JSON event per line')
+    parser.add_argument('--quiet', action='store_true', default=default,
+                        help='Leave out progress messages (banners, spinners, token counts)')
 
 def main():
     parser = argparse.ArgumentParser(
         description="Pai Code: Your Single-Shot Agentic AI Coding Companion.",
         epilog="Use 'pai config set <API_KEY>' to configure. Run 'pai' to start the intelligent agent."
     )
+    add_output_arguments(parser)
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
 
     # Main agent command (default)
     parser_auto = subparsers.add_parser('auto', help='Start the single-shot AI agent session.')
     parser_auto.add_argument('--model', type=str, help='LLM model name (e.g., gemini-2.5-flash-lite)')
     parser_auto.add_argument('--temperature', type=float, help='LLM sampling temperature (e.g., 0.2)')
+    parser_auto.add_argument('--profile', choices=['default', 'lean'], help="'lean' skips optional LLM calls such as next step suggestions")
+    add_output_arguments(parser_auto, default=argparse.SUPPRESS)
 
     # Simplified config management
     parser_config = subparsers.add_parser('config', help='Manage API key configuration')
@@ -28,12 +43,26 @@ def main():
 
     parser_config_validate = config_subparsers.add_parser('validate', help='Validate current API key')
 
+    # Session history search
+    parser_history = subparsers.add_parser('history', help='Search and show past sessions')
+    history_subparsers = parser_history.add_subparsers(dest='history_cmd', help='History commands')
+
+    parser_history_search = history_subparsers.add_parser('search', help='Full-text search of past sessions')
+    parser_history_search.add_argument('query', type=str, nargs='+', help='Words to search for')
+    parser_history_search.add_argument('--limit', type=int, default=historydb.SEARCH_LIMIT, help='Maximum results')
+    parser_history_search.add_argument('--type', type=str, help='Only events of this type (e.g. USER_INPUT, EXECUTION_PHASE)')
+    parser_history_search.add_argument('--any', action='store_true', help='Match any word instead of all words')
+
+    parser_history_show = history_subparsers.add_parser('show', help='Show a session (or one event by number)')
+    parser_history_show.add_argument('target', type=str, help='Session id (e.g. 20250101_120000) or event number')
+
     config_group = parser_config.add_mutually_exclusive_group(required=False)
     config_group.add_argument('--set', type=str, metavar='API_KEY', help='Set or update the API key (DEPRECATED)')
     config_group.add_argument('--show', action='store_true', help='Show the currently configured API key (DEPRECATED)')
     config_group.add_argument('--remove', action='store_true', help='Remove the stored API key (DEPRECATED)')
 
     args = parser.parse_args()
+    ui.set_output_mode(args.output, args.quiet or None)
 
     # Handle config commands
     if args.command == 'config':
@@ -67,6 +96,14 @@ def main():
         if getattr(args, 'remove', False):
             config.remove_api_key()
             return
+    if args.command == 'history':
+        if args.history_cmd == 'search':
+            return show_history_search(" ".join(args.query), args.limit, args.type, args.any)
+        elif args.history_cmd == 'show':
+            return show_history_item(args.target)
+        parser_history.print_help()
+        return
+
     # Default: start agent
     # Check API key before starting
     if not config.is_configured():
@@ -79,6 +116,8 @@ def main():
     temperature = getattr(args, 'temperature', None)
     if model is not None or temperature is not None:
         llm.set_runtime_model(model, temperature)
+    if getattr(args, 'profile', None):
+        agent.PROFILE = args.profile
 
     try:
         agent.start_interactive_session()
@@ -88,5 +127,48 @@ def main():
         ui.print_error(f"An error occurred during the session: {e}")
         return 1
 
+def show_history_search(query: str, limit: int, event_type: str = None, any_term: bool = False):
+    """Prints the events of past sessions matching 'query'."""
+    if not os.path.isdir(agent.HISTORY_DIR):
+        ui.print_info(f"No session history in {agent.HISTORY_DIR}")
+        return
+    db = historydb.get_db(agent.HISTORY_DIR)
+    # Sessions logged before the store existed are picked up first
+    db.import_sessions()
+    results = db.search(query, limit, event_type, any_term)
+    if not results:
+        ui.print_info(f"No history matches for: {query}")
+        return
+    for result in results:
+        when = datetime.fromtimestamp(result["ts"]).strftime("%Y-%m-%d %H:%M")
+        snippet = " ".join((result["snippet"] or "").split())
+        ui.print_text(f"#{result['id']} {when} {result['session']} {result['type']}", style="bold")
+        ui.print_text(f"    {snippet}")
+        if result["request"] and result["type"] != "USER_INPUT":
+            ui.print_text(f"    request: {result['request'][:120]}", style="dim")
+    ui.print_info(f"{len(results)} result(s). Show one with 'pai history show <session|#event>'.")
+
+def show_history_item(target: str):
+    """Prints a whole session in the text log format, or one stored event."""
+    target = target.strip().lstrip('#')
+    if target.isdigit():
+        event = historydb.get_db(agent.HISTORY_DIR).event(int(target))
+        if event is None:
+            ui.print_error(f"✗ No history event #{target}")
+            return 1
+        when = datetime.fromtimestamp(event["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+        ui.print_text(f"#{event['id']} {when} {event['session']} {event['type']}", style="bold")
+        for column in ("request", "plan", "commands", "outputs"):
+            if event[column]:
+                ui.print_text(f"{column}:", style="bold")
+                ui.print_text(event[column])
+        return
+    session_id = target[len("session_"):] if target.startswith("session_") else target
+    text = sessionlog.render_session(os.path.join(agent.HISTORY_DIR, f"session_{session_id}"))
+    if not text:
+        ui.print_error(f"✗ No session '{session_id}' in {agent.HISTORY_DIR}")
+        return 1
+    ui.print_text(text.strip("\n"))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
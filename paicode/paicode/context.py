@@ -0,0 +1,301 @@
+import os
+from collections import deque
+from datetime import datetime
+from . import blobs
+
+"""
+context.py
+----------
+This module manages the session context window for Pai Code. Instead of
+interpolating the raw session list into every prompt, the agent stores typed
+interaction records here and asks for a compact, deduplicated context section
+sized for the prompt it is building.
+
+Every rendered section is bounded by an approximate token budget, so prompt
+size stays flat no matter how long the session runs. Results of earlier
+execution phases are carried into later phase prompts the same way, under a
+per-phase byte budget (render_phase_results).
+"""
+
+# Approximate token budget and shape of the context section per prompt type.
+# 'system' controls whether the system knowledge excerpt is included at all.
+PROMPT_BUDGETS = {
+    "conversation": {"tokens": 250, "interactions": 2, "system": True},
+    "planning": {"tokens": 400, "interactions": 3, "system": False},
+    "strategy": {"tokens": 200, "interactions": 3, "system": False},
+    "phase": {"tokens": 300, "interactions": 2, "system": False},
+}
+
+# Hard cap for a single rendered line, in characters
+MAX_LINE_CHARS = 200
+
+# Number of records kept in memory for the session
+MAX_RECORDS = 50
+
+# Byte budget for the results of one earlier phase inside a phase prompt
+PHASE_CARRY_BYTES = int(os.getenv("PAI_PHASE_CARRY_BYTES", "6000"))
+# Smallest share worth an output excerpt, and the room kept in each phase
+# for the line counting results left out
+_MIN_EXCERPT_BYTES = 80
+_OMITTED_LINE_BYTES = 48
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+def _clip(text: str, limit: int) -> str:
+    """Collapses whitespace and clips text to at most 'limit' characters."""
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:max(0, limit - 3)] + "..."
+
+class ContextManager:
+    """
+    Stores typed records for the current session and renders budgeted context
+    sections for the different prompt types.
+
+    Record kinds:
+        - 'interaction': a user request with its intent and outcome
+        - 'note': free-form facts worth remembering (e.g. loaded digests)
+    The system knowledge is kept separately since it is large and static.
+    Records may be added by one request while another renders (queued
+    conversation replies run next to tasks), so reads work on a snapshot.
+    """
+
+    def __init__(self, max_records: int = MAX_RECORDS):
+        self.records = deque(maxlen=max_records)
+        self.system_knowledge = ""
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def set_system_knowledge(self, text: str):
+        """Stores the static system knowledge once for the whole session."""
+        self.system_knowledge = (text or "").strip()
+
+    def add_interaction(self, user_request: str, success: bool, intent: str) -> dict:
+        """Records a finished user interaction and returns the stored record."""
+        record = {
+            "kind": "interaction",
+            "timestamp": datetime.now().isoformat(),
+            "user_request": user_request,
+            "success": success,
+            "intent": intent,
+        }
+        self.records.append(record)
+        return record
+
+    def add_note(self, text: str, source: str = "note") -> dict:
+        """Records a short free-form note for later prompts."""
+        record = {
+            "kind": "note",
+            "timestamp": datetime.now().isoformat(),
+            "source": source,
+            "text": text,
+        }
+        self.records.append(record)
+        return record
+
+    def interactions(self) -> list[dict]:
+        """Returns interaction records, oldest first."""
+        return [r for r in list(self.records) if r["kind"] == "interaction"]
+
+    def _interaction_lines(self, limit: int) -> list[str]:
+        """Newest-first interaction lines, with repeated requests collapsed."""
+        lines = []
+        seen = {}
+        for record in reversed(self.interactions()):
+            key = " ".join(record["user_request"].lower().split())
+            if key in seen:
+                seen[key]["count"] += 1
+                continue
+            if len(seen) >= limit:
+                continue
+            entry = {"record": record, "count": 1}
+            seen[key] = entry
+            lines.append(entry)
+
+        rendered = []
+        for entry in lines:
+            record = entry["record"]
+            status = "ok" if record["success"] else "failed"
+            repeat = f" (x{entry['count']})" if entry["count"] > 1 else ""
+            text = _clip(record["user_request"], MAX_LINE_CHARS - 40)
+            rendered.append(f"- [{record['intent']}, {status}]{repeat} {text}")
+        return rendered
+
+    def _note_lines(self) -> list[str]:
+        """Newest-first note lines, deduplicated by content."""
+        rendered = []
+        seen = set()
+        for record in reversed(list(self.records)):
+            if record["kind"] != "note":
+                continue
+            text = _clip(record["text"], MAX_LINE_CHARS)
+            if text in seen:
+                continue
+            seen.add(text)
+            rendered.append(f"- {text}")
+        return rendered
+
+    def render(self, prompt_type: str) -> str:
+        """
+        Builds the context section for a prompt type within its token budget.
+
+        Args:
+            prompt_type: One of the keys in PROMPT_BUDGETS.
+
+        Returns:
+            A compact, newline-separated context section (may be empty).
+        """
+        spec = PROMPT_BUDGETS.get(prompt_type, PROMPT_BUDGETS["phase"])
+        budget = spec["tokens"]
+        sections = []
+        used = 0
+
+        def take(header: str, lines: list[str]):
+            nonlocal used
+            kept = []
+            cost = estimate_tokens(header) + 1
+            for line in lines:
+                line_cost = estimate_tokens(line) + 1
+                if used + cost + line_cost > budget:
+                    break
+                kept.append(line)
+                cost += line_cost
+            if kept:
+                sections.append("\n".join([header] + kept))
+                used += cost
+
+        take("Previous interactions (newest first):", self._interaction_lines(spec["interactions"]))
+        take("Notes:", self._note_lines())
+
+        if spec["system"] and self.system_knowledge:
+            remaining_chars = (budget - used) * 4 - 40
+            if remaining_chars > 80:
+                sections.append("System knowledge (excerpt):\n" + _clip(self.system_knowledge, remaining_chars))
+
+        return "\n\n".join(sections)
+
+def excerpt(text, max_bytes: int) -> str:
+    """
+    Keeps text within max_bytes (UTF-8) by replacing the middle with a marker,
+    preserving whole lines from the head and the tail. A blobs.Blob is cut
+    on its bytes, decoding only the lines kept.
+    """
+    if isinstance(text, blobs.Blob):
+        return text.excerpt(max_bytes)
+    if len(text.encode('utf-8')) <= max_bytes:
+        return text
+    lines = text.split('\n')
+    head, tail = [], []
+    used = 60  # room for the omission marker
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        # Alternate head and tail, favouring the head 2:1
+        line = lines[i]
+        cost = len(line.encode('utf-8')) + 1
+        if used + cost > max_bytes:
+            break
+        head.append(line)
+        used += cost
+        i += 1
+        if len(head) % 2 == 0 and i <= j:
+            line = lines[j]
+            cost = len(line.encode('utf-8')) + 1
+            if used + cost > max_bytes:
+                break
+            tail.insert(0, line)
+            used += cost
+            j -= 1
+    omitted = j - i + 1
+    return "\n".join(head + [f"... ({omitted} lines omitted) ..."] + tail)
+
+def parse_read_output(output) -> tuple[str, str, int] | None:
+    """
+    Splits READ output ('SYNTAX_HIGHLIGHT:path[#Lstart-end]:content') into
+    (path, content, first line number); the content of a blobs.Output is
+    its blob, not a copy. Returns None for other outputs.
+    """
+    if not output.startswith("SYNTAX_HIGHLIGHT:"):
+        return None
+    if isinstance(output, blobs.Output):
+        parts = output.prefix.split(":", 2)[:2] + [output.blob]
+    else:
+        parts = output.split(":", 2)
+    if len(parts) != 3:
+        return None
+    label, content = parts[1], parts[2]
+    path, _, line_range = label.partition('#L')
+    start = line_range.split('-', 1)[0]
+    return path, content, int(start) if start.isdigit() else 1
+
+def render_phase_results(phase_results: list[list[dict]], budget_bytes: int = PHASE_CARRY_BYTES) -> str:
+    """
+    Renders the command results of earlier phases for the next phase prompt.
+
+    Each phase's section stays within 'budget_bytes'. Short results
+    (listings, search hits, failures) are kept first, each output cut to an
+    even share of the budget; file contents share what is left and are cut
+    down to head/tail excerpts when they do not fit. Results that do not fit
+    at all are counted in a closing line.
+    """
+    sections = []
+    for number, results in enumerate(phase_results, 1):
+        header = f"PHASE {number}:"
+        short = []
+        reads = []
+        for result in results:
+            output = result.get("output") or ""
+            read = parse_read_output(output)
+            if read and result.get("success"):
+                path, content, first_line = read
+                label = f"{path} from line {first_line}" if first_line > 1 else path
+                reads.append((label, content))
+            else:
+                short.append((result, output))
+
+        # Room is kept for the header and the line counting omitted results
+        remaining = budget_bytes - len(header) - 1 - _OMITTED_LINE_BYTES
+        lines = []
+        omitted = 0
+        for index, (result, output) in enumerate(short):
+            status = "ok" if result.get("success") else "FAILED"
+            line = f"- {result.get('command')} {result.get('target', '')} [{status}]"
+            if output and result.get("command") != "FINISH":
+                share = min(600, remaining // (len(short) - index) - _utf8_len(line) - 3)
+                if share >= _MIN_EXCERPT_BYTES:
+                    line += ": " + excerpt(output, share)
+            cost = _utf8_len(line) + 1
+            if cost > remaining:
+                omitted += 1
+                continue
+            lines.append(line)
+            remaining -= cost
+
+        for index, (path, content) in enumerate(reads):
+            count = content.line_count() if isinstance(content, blobs.Blob) else content.count('\n') + 1
+            block = f"--- {path} ({count} lines)"
+            share = remaining // (len(reads) - index) - _utf8_len(block) - 2
+            if share >= _MIN_EXCERPT_BYTES:
+                block += "\n" + excerpt(content, share)
+            else:
+                block = f"--- {path} (read, content omitted for budget)"
+            cost = _utf8_len(block) + 1
+            if cost > remaining:
+                omitted += 1
+                continue
+            lines.append(block)
+            remaining -= cost
+
+        if omitted:
+            lines.append(f"- ({omitted} more result{'s' if omitted != 1 else ''} omitted for budget)")
+        if lines:
+            sections.append("\n".join([header] + lines))
+    return "\n\n".join(sections)
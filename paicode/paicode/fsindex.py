@@ -0,0 +1,453 @@
+import os
+import json
+import tempfile
+import threading
+
+"""
+fsindex.py
+----------
+This module keeps an in-memory index of the workspace structure: a path trie
+of directories, each holding its subdirectories and its files with size and
+mtime. It is built once and then refreshed incrementally: a directory is only
+listed again when its own mtime changed (an entry was added, removed or
+renamed), so a refresh of an unchanged tree costs one stat per directory
+instead of a full walk.
+
+Changes made through the workspace module additionally mark the affected
+directory as stale, which keeps file sizes exact for in-place edits (those do
+not touch the directory mtime). The index can be persisted to the cache
+directory so the next session starts warm.
+
+Directories are read with os.scandir, using the entry types cached by the
+directory read instead of one isdir() call per entry. scan_directory() and
+walk() are the shared primitives behind every workspace listing; both skip
+excluded names, paths matched by the ignore rules (see ignore.py) and paths
+the access policy denies (see policy.py), and walk() is iterative with
+optional depth and entry limits.
+
+The index has no dependency on the workspace module; workspace.py owns the
+shared instance and renders 'tree_directory' and 'list_path' from it.
+"""
+
+INDEX_VERSION = 3
+
+def scan_directory(full_path: str, rel_dir: str, exclude=(), matcher=None, policy=None) -> tuple[list, list]:
+    """
+    Reads one directory with a single scandir pass.
+
+    Returns:
+        (directories, files) as lists of os.DirEntry, without excluded names,
+        ignored paths or paths 'policy' (a policy.PathPolicy) denies.
+        Symlinked directories are returned as directories.
+    """
+    dirs = []
+    files = []
+    try:
+        with os.scandir(full_path) as iterator:
+            entries = [entry for entry in iterator if entry.name not in exclude]
+    except OSError:
+        return dirs, files
+    ignored = matcher.chain(rel_dir, {entry.name for entry in entries}).ignored if matcher else None
+    prefix = '' if rel_dir in ('', '.') else rel_dir.rstrip('/') + '/'
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+        if ignored is not None and ignored(prefix + entry.name, entry.name, is_dir):
+            continue
+        if policy is not None and policy.denies(prefix + entry.name):
+            continue
+        (dirs if is_dir else files).append(entry)
+    return dirs, files
+
+def walk(root: str, rel_path: str = '.', exclude=(), matcher=None, max_depth: int = None, max_entries: int = None,
+         policy=None):
+    """
+    Iterative walk below 'rel_path' yielding (relative path, is_dir) pairs.
+
+    'max_depth' limits how many directory levels are descended (1 lists only
+    the entries of 'rel_path'); 'max_entries' stops the walk after that many
+    yielded entries. Symlinked directories are yielded but not descended.
+    """
+    start = os.path.normpath(rel_path).replace('\\', '/').strip('/')
+    start = '' if start == '.' else start
+    stack = [(start, 1)]
+    yielded = 0
+    while stack:
+        rel_dir, depth = stack.pop()
+        dirs, files = scan_directory(os.path.join(root, rel_dir), rel_dir, exclude, matcher, policy)
+        prefix = rel_dir + '/' if rel_dir else ''
+        for entry in files:
+            if max_entries is not None and yielded >= max_entries:
+                return
+            yielded += 1
+            yield prefix + entry.name, False
+        for entry in dirs:
+            if max_entries is not None and yielded >= max_entries:
+                return
+            yielded += 1
+            yield prefix + entry.name, True
+            if (max_depth is None or depth < max_depth) and not entry.is_symlink():
+                stack.append((prefix + entry.name, depth + 1))
+
+class _Dir:
+    """A directory node. 'mtime' is None when the node must be listed again."""
+
+    __slots__ = ('mtime', 'dirs', 'files')
+
+    def __init__(self):
+        self.mtime = None
+        self.dirs = {}
+        self.files = {}  # name -> (size, mtime_ns)
+
+    def to_json(self) -> list:
+        return [self.mtime, {name: node.to_json() for name, node in self.dirs.items()},
+                {name: list(entry) for name, entry in self.files.items()}]
+
+    @classmethod
+    def from_json(cls, data: list) -> '_Dir':
+        node = cls()
+        node.mtime = data[0]
+        node.dirs = {name: cls.from_json(child) for name, child in data[1].items()}
+        node.files = {name: tuple(entry) for name, entry in data[2].items()}
+        return node
+
+class WorkspaceIndex:
+    """
+    Path trie of the workspace rooted at 'root'.
+
+    Entries whose name is in 'exclude', that 'matcher' (an
+    ignore.IgnoreMatcher) ignores or that 'policy' (a policy.PathPolicy)
+    denies are never indexed. Symlinked directories are recorded but not
+    descended into.
+    """
+
+    def __init__(self, root: str, exclude=(), cache_path: str = None, matcher=None, policy=None):
+        self.root = root
+        self.exclude = set(exclude)
+        self.cache_path = cache_path
+        self.matcher = matcher
+        self.policy = policy
+        # A persisted index built under other rules may list denied paths
+        self.rules_signature = sorted(self.exclude) + (list(policy.patterns) if policy is not None else [])
+        self.lock = threading.RLock()
+        self.tree = _Dir()
+        self._dirty = False
+        self._loaded = False
+        self._thread = None
+
+    # --- Persistence -------------------------------------------------------
+
+    def load(self) -> bool:
+        """Loads a persisted index if one exists. Returns True on success."""
+        self._loaded = True
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("root") != self.root:
+                return False
+            if data.get("rules") != self.rules_signature:
+                return False
+            tree = _Dir.from_json(data["tree"])
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return False
+        with self.lock:
+            self.tree = tree
+        return True
+
+    def save(self):
+        """Persists the index if it changed since it was loaded or last saved."""
+        if not self.cache_path or not self._dirty:
+            return
+        with self.lock:
+            payload = {"version": INDEX_VERSION, "root": self.root, "rules": self.rules_signature,
+                       "tree": self.tree.to_json()}
+            self._dirty = False
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', delete=False, dir=cache_dir, encoding='utf-8') as tmp:
+                json.dump(payload, tmp, separators=(',', ':'))
+                tmp_name = tmp.name
+            os.replace(tmp_name, self.cache_path)
+        except OSError:
+            pass
+
+    # --- Refresh -----------------------------------------------------------
+
+    def _ignore_signature(self, node: _Dir) -> tuple:
+        """Stat info of the ignore files recorded in a directory node."""
+        if self.matcher is None:
+            return ()
+        return tuple(node.files.get(name) for name in self.matcher.file_names)
+
+    @staticmethod
+    def _invalidate(node: _Dir):
+        """Marks every directory below 'node' stale (their ignore rules changed)."""
+        stack = list(node.dirs.values())
+        while stack:
+            current = stack.pop()
+            if current.mtime != 0:
+                current.mtime = None
+            stack.extend(current.dirs.values())
+
+    def _list(self, node: _Dir, full_path: str, rel_dir: str, mtime: int):
+        """Lists one directory into 'node', keeping known subdirectory nodes."""
+        before = self._ignore_signature(node)
+        dir_entries, file_entries = scan_directory(full_path, rel_dir, self.exclude, self.matcher, self.policy)
+        dirs = {}
+        files = {}
+        for entry in dir_entries:
+            child = node.dirs.get(entry.name) or _Dir()
+            if entry.is_symlink():
+                child.mtime = 0  # listed as a leaf, never descended
+            dirs[entry.name] = child
+        for entry in file_entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        node.dirs = dirs
+        node.files = files
+        node.mtime = mtime
+        self._dirty = True
+        if before != self._ignore_signature(node):
+            self._invalidate(node)
+
+    def _ignore_files_changed(self, node: _Dir, full_path: str) -> bool:
+        """Edits of an ignore file do not change the directory mtime; stat them."""
+        if self.matcher is None:
+            return False
+        for name in self.matcher.file_names:
+            entry = node.files.get(name)
+            if entry is None:
+                continue
+            try:
+                stat = os.stat(os.path.join(full_path, name))
+            except OSError:
+                return True
+            if (stat.st_size, stat.st_mtime_ns) != entry:
+                return True
+        return False
+
+    def _refresh_node(self, node: _Dir, full_path: str, rel_dir: str, max_depth: int = None) -> int:
+        """
+        Refreshes a subtree, listing only directories whose mtime changed.
+        With 'max_depth', only that many directory levels are visited (1
+        refreshes 'node' alone); deeper nodes keep whatever they hold.
+        """
+        listed = 0
+        stack = [(node, full_path, rel_dir, 1)]
+        while stack:
+            current, path, rel, depth = stack.pop()
+            if current.mtime == 0:
+                continue  # symlinked directory
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                current.dirs, current.files, current.mtime = {}, {}, None
+                continue
+            if current.mtime != mtime or self._ignore_files_changed(current, path):
+                self._list(current, path, rel, mtime)
+                listed += 1
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for name, child in current.dirs.items():
+                stack.append((child, os.path.join(path, name), f"{rel}/{name}" if rel else name, depth + 1))
+        return listed
+
+    def _locate(self, rel_path: str) -> _Dir | None:
+        """Finds the node for a directory, listing stale ancestors on the way."""
+        node = self.tree
+        path = self.root
+        rel = ''
+        for part in self._parts(rel_path):
+            if part not in node.dirs:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    return None
+                if node.mtime != mtime:
+                    self._list(node, path, rel, mtime)
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+            path = os.path.join(path, part)
+            rel = f"{rel}/{part}" if rel else part
+        return node
+
+    @staticmethod
+    def _parts(rel_path: str) -> list[str]:
+        rel_path = os.path.normpath(rel_path).replace('\\', '/')
+        return [part for part in rel_path.split('/') if part and part != '.']
+
+    def refresh(self, rel_path: str = '.', max_depth: int = None) -> int:
+        """
+        Brings the subtree at 'rel_path' in line with the disk, down to
+        'max_depth' directory levels if given (1 refreshes the directory's own
+        entries only). Expanding one subtree never walks the rest of the tree.
+
+        Returns:
+            The number of directories that had to be listed again.
+        """
+        with self.lock:
+            if not self._loaded:
+                self.load()
+            node = self._locate(rel_path)
+            if node is None:
+                return 0
+            parts = self._parts(rel_path)
+            return self._refresh_node(node, os.path.join(self.root, *parts), '/'.join(parts), max_depth)
+
+    def start_background_refresh(self) -> threading.Thread:
+        """Runs a full refresh (and save) on a daemon thread; returns the thread."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        def run():
+            self.refresh()
+            self.save()
+
+        self._thread = threading.Thread(target=run, name="pai-fsindex", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def on_workspace_change(self, rel_path: str, kind: str):
+        """Change listener: marks the nearest indexed ancestor directory stale."""
+        parts = self._parts(rel_path)
+        with self.lock:
+            node = self.tree
+            for part in parts[:-1]:
+                child = node.dirs.get(part)
+                if child is None:
+                    break
+                node = child
+            node.mtime = None
+            # An edited directory itself (e.g. MV into it) is listed again too
+            if parts and parts[-1] in node.dirs and node.dirs[parts[-1]].mtime != 0:
+                node.dirs[parts[-1]].mtime = None
+
+    # --- Rendering ---------------------------------------------------------
+
+    def node(self, rel_path: str = '.', max_depth: int = None) -> _Dir | None:
+        """
+        The refreshed directory node for 'rel_path' (refreshed down to
+        'max_depth' levels), or None. Hold 'lock' while reading it; the index
+        may update nodes from other threads.
+        """
+        with self.lock:
+            self.refresh(rel_path, max_depth)
+            return self._locate(rel_path)
+
+    def tree_lines(self, rel_path: str = '.', max_depth: int = None, max_entries: int = None,
+                   offset: int = 0) -> tuple[list[str], bool] | None:
+        """
+        Box-drawing tree of a directory, or None if it is not indexed.
+
+        'max_depth' limits the levels shown (and refreshed). Pages are taken
+        in tree order: the entry lines from 'offset' on, at most 'max_entries'
+        of them, after the directory name line.
+
+        Returns:
+            (lines, more) where 'more' is True if entries follow the page.
+        """
+        with self.lock:
+            self.refresh(rel_path, max_depth)
+            node = self._locate(rel_path)
+            if node is None:
+                return None
+            name = os.path.basename(os.path.join(self.root, *self._parts(rel_path)))
+            lines = [f"{name}/"]
+            seen = 0
+            # Depth-first without recursion: (directory, sorted names, prefix, depth, next index)
+            work = [(node, sorted(list(node.dirs) + list(node.files)), "", 1, 0)]
+            while work:
+                current, names, prefix, depth, index = work.pop()
+                if index >= len(names):
+                    continue
+                if max_entries is not None and seen >= offset + max_entries:
+                    return lines, True
+                work.append((current, names, prefix, depth, index + 1))
+                item = names[index]
+                last = index == len(names) - 1
+                if seen >= offset:
+                    lines.append(f"{prefix}{'└── ' if last else '├── '}{item}")
+                seen += 1
+                child = current.dirs.get(item)
+                if child is not None and (max_depth is None or depth < max_depth):
+                    child_names = sorted(list(child.dirs) + list(child.files))
+                    work.append((child, child_names, prefix + ('    ' if last else '│   '), depth + 1, 0))
+            return lines, False
+
+    def list_paths(self, rel_path: str = '.', max_depth: int = None, max_entries: int = None,
+                   offset: int = 0) -> tuple[list[str], int] | None:
+        """
+        Sorted relative paths below a directory, down to 'max_depth' levels;
+        directories end with '/'. Returns None if the directory is not indexed.
+
+        Returns:
+            (paths, total): the 'max_entries' paths from 'offset' on, and the
+            number of paths in the whole listing.
+        """
+        with self.lock:
+            self.refresh(rel_path, max_depth)
+            node = self._locate(rel_path)
+            if node is None:
+                return None
+            base = '/'.join(self._parts(rel_path))
+            paths = []
+            stack = [(node, base, 1)]
+            while stack:
+                current, prefix, depth = stack.pop()
+                lead = prefix + '/' if prefix else ''
+                for name in current.files:
+                    paths.append(lead + name)
+                for name, child in current.dirs.items():
+                    paths.append(lead + name + '/')
+                    if max_depth is None or depth < max_depth:
+                        stack.append((child, lead + name, depth + 1))
+            paths.sort()
+            end = None if max_entries is None else offset + max_entries
+            return paths[offset:end], len(paths)
+
+    def file_paths(self, rel_path: str = '.') -> list[str]:
+        """Relative paths of all files below a directory, in no particular order."""
+        with self.lock:
+            self.refresh(rel_path)
+            node = self._locate(rel_path)
+            if node is None:
+                return []
+            paths = []
+            stack = [(node, '/'.join(self._parts(rel_path)))]
+            while stack:
+                current, prefix = stack.pop()
+                lead = prefix + '/' if prefix else ''
+                paths.extend(lead + name for name in current.files)
+                stack.extend((child, lead + name) for name, child in current.dirs.items())
+            return paths
+
+    def stat(self, rel_path: str) -> tuple[str, int, int] | None:
+        """Indexed ('file', size, mtime_ns) or ('dir', 0, mtime_ns) for a path."""
+        parts = self._parts(rel_path)
+        with self.lock:
+            if not self._loaded:
+                self.load()
+            node = self._locate('/'.join(parts[:-1]))
+            if node is None:
+                return None
+            if not parts:
+                return ('dir', 0, node.mtime or 0)
+            try:
+                mtime = os.stat(os.path.join(self.root, *parts[:-1])).st_mtime_ns
+            except OSError:
+                return None
+            if node.mtime != mtime:
+                self._list(node, os.path.join(self.root, *parts[:-1]), '/'.join(parts[:-1]), mtime)
+            if parts[-1] in node.dirs:
+                return ('dir', 0, node.dirs[parts[-1]].mtime or 0)
+            entry = node.files.get(parts[-1])
+            return ('file', entry[0], entry[1]) if entry else None
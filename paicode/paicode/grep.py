@@ -0,0 +1,398 @@
+import os
+import re
+import time
+import fnmatch
+import threading
+from . import workspace
+from .scanner import ScannedIndex
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+"""
+grep.py
+-------
+This module backs the GREP::pattern::glob command with a trigram index over
+the workspace text files. A query extracts the literal runs the regex
+requires, looks up the files containing all of their trigrams, and only runs
+the regex over those candidates. Results are capped and paged so a broad
+pattern cannot flood the prompt.
+
+The index holds one sorted (trigram, file) table plus a small delta of files
+changed since the last compaction, so WRITE/MODIFY/MV/RM updates are cheap.
+Files edited outside pai send no change event, so a query first stats the
+indexed files and re-indexes those whose size or mtime changed, and indexes
+the files the workspace index lists that it has not seen (at most once per
+PAI_GREP_REVALIDATE_SECONDS, so the GREPs of one phase stat once).
+Files are read by the shared workspace scan (scanner.py). Only files
+listed by the workspace are indexed, and candidates are checked
+against the path policy in one bulk call before they are searched. Without NumPy every query falls back to scanning
+the listed files.
+"""
+
+# Files above this size are not indexed and always scanned
+MAX_INDEX_BYTES = int(os.getenv("PAI_GREP_MAX_BYTES", str(256 * 1024)))
+
+# Results per page and overall cap on collected matches
+PAGE_SIZE = int(os.getenv("PAI_GREP_PAGE_SIZE", "50"))
+MAX_MATCHES = int(os.getenv("PAI_GREP_MAX_MATCHES", "1000"))
+
+MAX_LINE_CHARS = 200
+
+# Changed files kept in the delta before the base table is rebuilt
+COMPACT_THRESHOLD = 256
+
+# Seconds during which a query trusts the index without statting its files
+REVALIDATE_SECONDS = float(os.getenv("PAI_GREP_REVALIDATE_SECONDS", "2"))
+
+def _trigrams(data: bytes):
+    """Sorted unique trigrams of ASCII-lowercased bytes as uint32 values."""
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    arr = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    return np.unique((arr[:-2] << 16) | (arr[1:-1] << 8) | arr[2:])
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    Extracts literal runs that every match of 'pattern' must contain. Returns
+    an empty list when nothing can be required (e.g. top-level alternation),
+    in which case the caller has to scan every file.
+    """
+    literals = []
+    current = []
+    depth = 0
+    i = 0
+
+    def flush():
+        if len(current) >= 3:
+            literals.append(''.join(current))
+        current.clear()
+
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            i += 2
+            if depth:
+                continue
+            if nxt.isalnum():
+                # Character classes (\d, \w, ...) and anchors (\b) end a run
+                flush()
+            else:
+                current.append(nxt)
+            continue
+        if ch == '[':
+            flush()
+            # Skip the character class, honouring escapes and a leading ']'
+            i += 1
+            if i < len(pattern) and pattern[i] == '^':
+                i += 1
+            if i < len(pattern) and pattern[i] == ']':
+                i += 1
+            while i < len(pattern) and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+            i += 1
+            continue
+        if ch == '(':
+            flush()
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif ch == '|':
+            if depth == 0:
+                return []
+        elif depth:
+            pass
+        elif ch in '*?{':
+            # The previous character is optional
+            if current:
+                current.pop()
+            flush()
+            if ch == '{':
+                while i < len(pattern) and pattern[i] != '}':
+                    i += 1
+        elif ch in '+':
+            flush()
+        elif ch in '.^$':
+            flush()
+        else:
+            current.append(ch)
+        i += 1
+    flush()
+    return literals
+
+class GrepIndex(ScannedIndex):
+    """
+    Trigram index over workspace text files.
+
+    'base_tri'/'base_doc' are parallel arrays sorted by trigram; 'delta' holds
+    trigram arrays of files changed since the last compaction and 'stale' the
+    ids whose base rows no longer apply. Large files, and every file without
+    NumPy, are kept in 'always_scan'.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.doc_ids = {}
+        self.doc_paths = []
+        self.doc_stats = []
+        self.doc_tri = []
+        self.always_scan = set()
+        self.base_tri = None
+        self.base_doc = None
+        self.delta = set()
+        self.stale = set()
+        self._ready = threading.Event()
+        self._bulk = False
+        self._revalidated = 0.0
+
+    # --- maintenance -----------------------------------------------------
+
+    def read_limit(self, rel_path: str, stat: os.stat_result) -> int | None:
+        with self.lock:
+            doc_id = self.doc_ids.get(rel_path)
+            if doc_id is not None and self.doc_stats[doc_id] == (stat.st_size, stat.st_mtime):
+                return None
+        return MAX_INDEX_BYTES if NUMPY_AVAILABLE and stat.st_size <= MAX_INDEX_BYTES else 0
+
+    def index_content(self, rel_path: str, stat: os.stat_result, data: bytes) -> bool:
+        tri = None
+        if NUMPY_AVAILABLE and stat.st_size <= MAX_INDEX_BYTES:
+            if b'\0' in data[:8192]:
+                tri = np.empty(0, dtype=np.uint32)  # binary: never matches
+            else:
+                tri = _trigrams(data)
+
+        with self.lock:
+            doc_id = self.doc_ids.get(rel_path)
+            if doc_id is None:
+                doc_id = len(self.doc_paths)
+                self.doc_ids[rel_path] = doc_id
+                self.doc_paths.append(rel_path)
+                self.doc_stats.append(None)
+                self.doc_tri.append(None)
+            else:
+                self.stale.add(doc_id)
+            self.doc_stats[doc_id] = (stat.st_size, stat.st_mtime)
+            self.doc_tri[doc_id] = tri
+            if tri is None:
+                self.always_scan.add(doc_id)
+                self.delta.discard(doc_id)
+            else:
+                self.always_scan.discard(doc_id)
+                self.delta.add(doc_id)
+            if len(self.delta) > COMPACT_THRESHOLD and self.base_tri is not None and not self._bulk:
+                self.compact()
+        return True
+
+    def revalidate(self) -> int:
+        """
+        Re-indexes the indexed files whose size or mtime changed and indexes
+        files created since. Returns how many.
+        """
+        self._revalidated = time.monotonic()
+        with self.lock:
+            known = {p: self.doc_stats[i] for i, p in enumerate(self.doc_paths) if p is not None}
+        changed = 0
+        for rel_path, indexed in known.items():
+            try:
+                stat = os.stat(os.path.join(workspace.PROJECT_ROOT, rel_path))
+            except OSError:
+                self.remove_path(rel_path)
+                continue
+            if (stat.st_size, stat.st_mtime) != indexed and self.update_file(rel_path):
+                changed += 1
+        # New files show up in the workspace index, which only lists the
+        # directories whose mtime changed
+        for rel_path in workspace.get_workspace_index().file_paths():
+            if rel_path not in known and self.update_file(rel_path):
+                changed += 1
+        return changed
+
+    def remove_path(self, rel_path: str):
+        """Removes a file, or every file below a directory, from the index."""
+        prefix = rel_path.rstrip('/') + '/'
+        with self.lock:
+            for path in [p for p in self.doc_ids if p == rel_path or p.startswith(prefix)]:
+                doc_id = self.doc_ids.pop(path)
+                self.doc_paths[doc_id] = None
+                self.doc_stats[doc_id] = None
+                self.doc_tri[doc_id] = None
+                self.stale.add(doc_id)
+                self.delta.discard(doc_id)
+                self.always_scan.discard(doc_id)
+
+    def compact(self):
+        """Folds the delta into the sorted base table."""
+        if not NUMPY_AVAILABLE:
+            return
+        with self.lock:
+            ids = [i for i, tri in enumerate(self.doc_tri) if tri is not None and len(tri)]
+            if ids:
+                arrays = [self.doc_tri[i] for i in ids]
+                tri = np.concatenate(arrays)
+                doc = np.repeat(np.asarray(ids, dtype=np.int32), [len(a) for a in arrays])
+                order = np.argsort(tri, kind='stable')
+                self.base_tri = tri[order]
+                self.base_doc = doc[order]
+            else:
+                self.base_tri = np.empty(0, dtype=np.uint32)
+                self.base_doc = np.empty(0, dtype=np.int32)
+            self.delta.clear()
+            self.stale.clear()
+
+    def on_workspace_change(self, rel_path: str, kind: str):
+        """Change listener registered with the workspace module."""
+        if kind == 'delete':
+            self.remove_path(rel_path)
+        elif os.path.isdir(os.path.join(workspace.PROJECT_ROOT, rel_path)):
+            for file_path in workspace.iter_files(rel_path):
+                self.update_file(file_path)
+        else:
+            self.update_file(rel_path)
+
+    def indexed_paths(self) -> list[str]:
+        with self.lock:
+            return list(self.doc_ids)
+
+    def scan_started(self):
+        # Compact once at the end instead of every COMPACT_THRESHOLD files
+        self._bulk = True
+
+    def scan_finished(self, changed: int, stale: int):
+        self._bulk = False
+        if changed or stale or self.base_tri is None:
+            self.compact()
+        self._revalidated = time.monotonic()
+        self._ready.set()
+
+    def ensure_ready(self):
+        """Blocks until the index covers the workspace at least once."""
+        if self._ready.is_set():
+            return
+        if self._thread and self._thread.is_alive():
+            self._thread.join()
+        else:
+            self.refresh()
+
+    # --- querying --------------------------------------------------------
+
+    def candidates(self, literals: list[str]) -> list[str]:
+        """Paths that may match: contain every trigram of every literal."""
+        with self.lock:
+            live = [i for i, p in enumerate(self.doc_paths) if p is not None]
+            if not literals or not NUMPY_AVAILABLE or self.base_tri is None:
+                return [self.doc_paths[i] for i in live]
+
+            wanted = np.unique(np.concatenate([_trigrams(lit.encode('utf-8')) for lit in literals]))
+            bounds = [(np.searchsorted(self.base_tri, t, 'left'), np.searchsorted(self.base_tri, t, 'right')) for t in wanted]
+            bounds.sort(key=lambda b: b[1] - b[0])
+
+            # Intersect base posting slices, rarest trigram first
+            result = None
+            for lo, hi in bounds:
+                docs = self.base_doc[lo:hi]
+                result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+                if not len(result):
+                    break
+            selected = set(int(i) for i in result) - self.stale if result is not None else set()
+
+            for doc_id in self.delta:
+                tri = self.doc_tri[doc_id]
+                if tri is not None and np.isin(wanted, tri, assume_unique=True).all():
+                    selected.add(doc_id)
+            selected |= self.always_scan
+            return sorted(self.doc_paths[i] for i in selected if self.doc_paths[i] is not None)
+
+    def grep(self, pattern: str, glob: str = "", page: int = 1) -> dict:
+        """
+        Searches file contents line by line.
+
+        Args:
+            pattern: Regular expression (falls back to a literal on syntax errors).
+            glob: Optional fnmatch filter on the path (or basename without '/').
+            page: 1-based page of results.
+
+        Returns:
+            A dict with 'matches' (path, line, text) for the page, 'total',
+            'pages', 'truncated' and 'literal_fallback'.
+        """
+        literal_fallback = False
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            regex = re.compile(re.escape(pattern))
+            literal_fallback = True
+        literals = [pattern] if literal_fallback else required_literals(pattern)
+        if regex.flags & re.IGNORECASE:
+            literals = [lit for lit in literals if lit.isascii()]
+
+        self.ensure_ready()
+        if time.monotonic() - self._revalidated >= REVALIDATE_SECONDS:
+            self.revalidate()
+        glob = glob.strip()
+        matches = []
+        truncated = False
+        candidates = self.candidates(literals)
+        if glob:
+            candidates = [p for p in candidates
+                          if fnmatch.fnmatch(p, glob) or ('/' not in glob and fnmatch.fnmatch(os.path.basename(p), glob))]
+        for rel_path in workspace.get_policy().filter_allowed(candidates):
+            try:
+                with open(os.path.join(workspace.PROJECT_ROOT, rel_path), 'r', encoding='utf-8', errors='replace') as f:
+                    for lineno, line in enumerate(f, 1):
+                        if regex.search(line):
+                            matches.append((rel_path, lineno, line.rstrip('\n')))
+                            if len(matches) >= MAX_MATCHES:
+                                break
+            except OSError:
+                continue
+            if len(matches) >= MAX_MATCHES:
+                truncated = True
+                break
+
+        pages = max(1, (len(matches) + PAGE_SIZE - 1) // PAGE_SIZE)
+        page = min(max(1, page), pages)
+        start = (page - 1) * PAGE_SIZE
+        return {
+            "matches": matches[start:start + PAGE_SIZE],
+            "total": len(matches),
+            "page": page,
+            "pages": pages,
+            "truncated": truncated,
+            "literal_fallback": literal_fallback,
+        }
+
+def format_results(pattern: str, glob: str, result: dict) -> str:
+    """Renders a grep result page as 'path:line: text' lines with a footer."""
+    if not result["total"]:
+        return f"No matches for: {pattern}"
+    lines = []
+    for path, lineno, text in result["matches"]:
+        text = text.strip()
+        if len(text) > MAX_LINE_CHARS:
+            text = text[:MAX_LINE_CHARS - 3] + "..."
+        lines.append(f"{path}:{lineno}: {text}")
+    total = f"{result['total']}+" if result["truncated"] else str(result["total"])
+    footer = f"Page {result['page']}/{result['pages']} ({total} matches)"
+    if result["page"] < result["pages"]:
+        footer += f" - next: GREP::{pattern}::{glob or '*'}::{result['page'] + 1}"
+    if result["literal_fallback"]:
+        footer += " - invalid regex, searched as literal text"
+    lines.append(footer)
+    return "\n".join(lines)
+
+# Session-wide index instance, created lazily
+_index = None
+
+def get_index() -> GrepIndex:
+    """Returns the shared grep index, registered for workspace changes."""
+    global _index
+    if _index is None:
+        _index = GrepIndex()
+        workspace.add_change_listener(_index.on_workspace_change)
+    return _index
@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import tempfile
+import threading
+from datetime import datetime
+from . import sessionlog
+
+"""
+history.py
+----------
+This module compacts past session logs from '.pai_history' into a bounded,
+structured digest stored next to them ('digest.json'): files touched,
+recent decisions (request, intent, outcome) and failures that were never
+resolved by a later success on the same target.
+
+Session logs are JSONL parts written by sessionlog.py (gzipped once full or
+idle); older plain-text '.log' files are still read. Compaction is
+incremental: the digest remembers how many bytes of each log (uncompressed)
+were already folded in, so only new lines are read, and a gzipped part whose
+size matches its offset is not opened at all. Every list in the digest
+is capped, which keeps loading it at session start a constant-cost read no
+matter how many sessions have been logged.
+"""
+
+DIGEST_FILE_NAME = "digest.json"
+DIGEST_VERSION = 1
+
+MAX_FILES_TOUCHED = 40
+MAX_DECISIONS = 15
+MAX_FAILURES = 15
+MAX_TEXT_CHARS = 160
+
+_LINE_PATTERN = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$')
+_COMMAND_PATTERN = re.compile(r'^(SUCCESS|FAILED): (\w+) ?(.*)$')
+_FILE_COMMANDS = {"WRITE", "MODIFY", "TOUCH", "RM", "MV", "MKDIR"}
+
+# Serializes the background catch-up with the end-of-session compaction
+_compact_lock = threading.Lock()
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS - 3] + "..."
+
+def _empty_digest() -> dict:
+    return {
+        "version": DIGEST_VERSION,
+        "updated": None,
+        "offsets": {},
+        "files_touched": {},
+        "decisions": [],
+        "unresolved_failures": [],
+    }
+
+def digest_path(history_dir: str) -> str:
+    return os.path.join(history_dir, DIGEST_FILE_NAME)
+
+def load_digest(history_dir: str) -> dict:
+    """Loads the digest (a single bounded JSON file); empty if missing or corrupt."""
+    try:
+        with open(digest_path(history_dir), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") == DIGEST_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return _empty_digest()
+
+def _save_digest(history_dir: str, digest: dict):
+    try:
+        with tempfile.NamedTemporaryFile('w', delete=False, dir=history_dir, encoding='utf-8') as tmp:
+            json.dump(digest, tmp, separators=(',', ':'))
+            tmp_name = tmp.name
+        os.replace(tmp_name, digest_path(history_dir))
+    except OSError:
+        pass
+
+class _Folder:
+    """Folds log events into a digest, keeping every section bounded."""
+
+    def __init__(self, digest: dict):
+        self.digest = digest
+        self.request = ""
+        self.intent = ""
+        # Requests of a session can run side by side (a reply next to a
+        # task), so events are attributed by their request id; events logged
+        # without one (text logs) belong to the request entered last.
+        self.request_id = None
+        self._others = {}  # request id -> (request, intent) of the other requests
+
+    def select(self, request_id):
+        """Makes the request with this id the one events are attributed to."""
+        if request_id != self.request_id:
+            self._others[self.request_id] = (self.request, self.intent)
+            self.request_id = request_id
+            self.request, self.intent = self._others.pop(request_id, ("", ""))
+
+    def user(self, timestamp: str, request: str):
+        self.request = _clip(request)
+        self.intent = ""
+
+    def plan_intent(self, intent: str):
+        self.intent = _clip(intent)
+
+    def command(self, timestamp: str, ok: bool, command: str, target: str):
+        target = target.strip()
+        failures = self.digest["unresolved_failures"]
+        if ok:
+            # A later success on the same target resolves earlier failures
+            failures[:] = [f for f in failures if f["target"] != target]
+        else:
+            failures.append({"time": timestamp, "command": command, "target": target, "request": self.request})
+            del failures[:-MAX_FAILURES]
+
+        if ok and command in _FILE_COMMANDS and target:
+            touched = self.digest["files_touched"]
+            entry = touched.pop(target, {"count": 0})
+            entry.update({"last_action": command, "last_seen": timestamp, "count": entry["count"] + 1})
+            touched[target] = entry  # re-insert to keep recency order
+            while len(touched) > MAX_FILES_TOUCHED:
+                touched.pop(next(iter(touched)))
+
+    def final(self, timestamp: str, ok: bool):
+        decisions = self.digest["decisions"]
+        decisions.append({
+            "time": timestamp,
+            "request": self.request,
+            "intent": self.intent,
+            "result": "success" if ok else "failed",
+        })
+        del decisions[:-MAX_DECISIONS]
+
+def _fold_text_log(path: str, offset: int, folder: _Folder) -> int:
+    """Folds the text log from 'offset'; returns the new offset."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # Only consume complete lines; a partial tail is picked up next time
+    end = data.rfind(b'\n') + 1
+    # All lines of one execution event share its timestamp; inside that block
+    # anything else is file content echoed by OUTPUT and must not be parsed.
+    block_timestamp = None
+    for raw in data[:end].decode('utf-8', errors='replace').splitlines():
+        match = _LINE_PATTERN.match(raw)
+        if not match:
+            continue  # continuation lines of multi-line outputs
+        timestamp, body = match.groups()
+        if block_timestamp is not None:
+            if timestamp != block_timestamp:
+                continue
+            if body == "AI EXECUTION END":
+                block_timestamp = None
+                continue
+            command = _COMMAND_PATTERN.match(body)
+            if command:
+                folder.command(timestamp, command.group(1) == "SUCCESS", command.group(2), command.group(3))
+        elif body == "AI EXECUTION START":
+            block_timestamp = timestamp
+        elif body.startswith("USER: "):
+            folder.user(timestamp, body[6:])
+        elif body.startswith("Intent: "):
+            folder.plan_intent(body[8:])
+        elif body.startswith("AI FINAL RESULT: "):
+            folder.final(timestamp, body[17:].startswith("SUCCESS"))
+    return offset + end
+
+def _fold_jsonl_log(path: str, offset: int, folder: _Folder) -> int:
+    """Folds the records of a JSONL part from 'offset'; returns the new offset."""
+    records, end = sessionlog.read_part(path, offset)
+    for record in records:
+        timestamp = sessionlog.format_timestamp(record.get("ts", 0))
+        event_type = record.get("type")
+        data = record.get("data") or {}
+        folder.select(data.get("request_id"))
+        if event_type == "USER_INPUT":
+            folder.user(timestamp, str(data.get("user_request", "")))
+        elif event_type == "PLANNING_PHASE":
+            analysis = (data.get("planning_data") or {}).get("analysis") or {}
+            folder.plan_intent(str(analysis.get("user_intent", "")))
+        elif event_type == "EXECUTION_PHASE":
+            for command in data.get("commands", []):
+                folder.command(timestamp, bool(command.get("success")),
+                               str(command.get("command", "")), str(command.get("target", "")))
+        elif event_type == "FINAL_STATUS":
+            folder.final(timestamp, bool(data.get("success")))
+    return end
+
+def compact_history(history_dir: str) -> dict:
+    """
+    Folds new lines of every session log into the digest and saves it.
+
+    Returns:
+        The updated digest.
+    """
+    with _compact_lock:
+        return _compact_locked(history_dir)
+
+def _compact_locked(history_dir: str) -> dict:
+    digest = load_digest(history_dir)
+    try:
+        logs = sorted(name for name in os.listdir(history_dir)
+                      if name.startswith("session_") and name.endswith((".log", ".jsonl", ".jsonl.gz")))
+    except OSError:
+        return digest
+
+    folder = _Folder(digest)
+    offsets = digest["offsets"]
+    changed = False
+    keys = []
+    for name in logs:
+        # Offsets follow a part through compression: 'x.jsonl.gz' keeps the key 'x.jsonl'
+        key = name[:-3] if name.endswith(".jsonl.gz") else name
+        if key in keys:
+            continue  # plain and gzipped copies while compressing; the plain one sorts first
+        keys.append(key)
+        path = os.path.join(history_dir, name)
+        try:
+            size = sessionlog.uncompressed_size(path) if name.endswith(".jsonl.gz") else os.path.getsize(path)
+        except OSError:
+            continue
+        offset = offsets.get(key, 0)
+        if size <= offset:
+            continue
+        try:
+            if key.endswith(".jsonl"):
+                offsets[key] = _fold_jsonl_log(path, offset, folder)
+            else:
+                offsets[key] = _fold_text_log(path, offset, folder)
+            changed = True
+        except (OSError, EOFError):
+            continue
+
+    # Forget offsets of logs that no longer exist
+    for name in [n for n in offsets if n not in keys]:
+        del offsets[name]
+
+    if changed:
+        digest["updated"] = datetime.now().isoformat(timespec="seconds")
+        _save_digest(history_dir, digest)
+    return digest
+
+def start_background_compaction(history_dir: str) -> threading.Thread:
+    """Runs compact_history() on a daemon thread; returns the thread."""
+    thread = threading.Thread(target=compact_history, args=(history_dir,), name="pai-history", daemon=True)
+    thread.start()
+    return thread
+
+def digest_notes(digest: dict) -> list[str]:
+    """Short context notes (oldest first) describing the digest."""
+    notes = []
+    decisions = digest.get("decisions", [])
+    if decisions:
+        notes.append("Earlier requests: " + "; ".join(
+            f"{d['request']} ({d['result']})" for d in decisions[-3:]
+        ))
+    touched = list(digest.get("files_touched", {}).items())
+    if touched:
+        notes.append("Files touched in earlier sessions: " + ", ".join(
+            f"{path} ({entry['last_action']})" for path, entry in reversed(touched[-10:])
+        ))
+    failures = digest.get("unresolved_failures", [])
+    if failures:
+        notes.append("Unresolved failures from earlier sessions: " + "; ".join(
+            f"{f['command']} {f['target']}" for f in failures[-5:]
+        ))
+    return notes
@@ -0,0 +1,372 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from . import sessionlog, blobs
+
+"""
+historydb.py
+------------
+This module keeps a searchable SQLite store of session events next to the
+JSONL logs ('.pai_history/history.db'). Every event becomes one row that
+references the USER_INPUT row of the request it belongs to, so any match can
+be traced back to the interaction around it. The request text is stored and
+indexed once, on that row, so a request matches once and not with every
+event of its interaction.
+
+Requests, plans, commands and command outputs are indexed with FTS5 (outputs
+are clipped; the full text stays in the JSONL log and its blobs). Where the
+SQLite build lacks FTS5, searches fall back to LIKE over the same columns.
+
+Rows are added from the session log's writer thread (see
+SessionLog.add_sink), so the agent never waits on the database. Sessions
+logged before the store existed, or while it was unavailable, are imported
+from their JSONL parts in the background; so is a store written with an
+older schema, which is dropped on open.
+"""
+
+DB_FILE_NAME = "history.db"
+SCHEMA_VERSION = 2
+
+# Characters of each command output that are indexed
+MAX_OUTPUT_CHARS = 2000
+
+# FTS5 column weights: request, plan, commands, outputs
+RANK_WEIGHTS = (4.0, 2.0, 1.0, 0.5)
+
+SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 12
+
+# Interactions and token budget of the planning prompt section
+RELEVANT_LIMIT = 3
+RELEVANT_BUDGET_CHARS = 1200
+
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+COLUMNS = ("request", "plan", "commands", "outputs")
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def event_row(event_type: str, data: dict) -> dict | None:
+    """
+    Indexed columns for one session event, or None for events that are not
+    stored (context bookkeeping). Only USER_INPUT rows have a request.
+    """
+    row = {"request": "", "plan": "", "commands": "", "outputs": "", "success": None}
+    if event_type == "USER_INPUT":
+        row["request"] = str(data.get("user_request", ""))
+    elif event_type == "PLANNING_PHASE":
+        planning_data = data.get("planning_data") or {}
+        analysis = planning_data.get("analysis") or {}
+        steps = (planning_data.get("execution_plan") or {}).get("steps") or []
+        lines = [str(analysis.get("user_intent", ""))]
+        lines += [f"{step.get('action', '')} {step.get('target', '')} - {step.get('purpose', '')}" for step in steps]
+        row["plan"] = "\n".join(lines)
+    elif event_type == "EXECUTION_PHASE":
+        commands = data.get("commands") or []
+        row["commands"] = "\n".join(
+            f"{'OK' if c.get('success') else 'FAILED'} {c.get('command', '')} {c.get('target', '')}" for c in commands
+        )
+        row["outputs"] = "\n".join(_clip(blobs.head_text(c.get("output", ""), MAX_OUTPUT_CHARS + 1), MAX_OUTPUT_CHARS) for c in commands if c.get("output"))
+        row["success"] = int(all(c.get("success") for c in commands)) if commands else None
+    elif event_type == "FINAL_STATUS":
+        row["plan"] = str(data.get("status", ""))
+        row["success"] = int(bool(data.get("success")))
+    elif event_type == "NEXT_STEPS":
+        row["plan"] = str(data.get("suggestion", ""))
+    elif event_type == "SESSION_START":
+        row["plan"] = f"Working directory: {data.get('working_directory', '')}"
+    else:
+        return None
+    return row
+
+def fts_query(text: str, any_term: bool = False, columns=None) -> str:
+    """
+    FTS5 query for free text: every word quoted (so operators and punctuation
+    in the text are harmless), all required unless 'any_term', optionally
+    restricted to some columns.
+    """
+    terms = _TERM_PATTERN.findall(text)
+    query = (" OR " if any_term else " ").join(f'"{term}"' for term in terms)
+    return f"{{{' '.join(columns)}}} : ({query})" if columns else query
+
+class HistoryDB:
+    """
+    SQLite history store for one '.pai_history' directory. One connection is
+    shared by all threads and serialized with 'lock'.
+    """
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.path = os.path.join(history_dir, DB_FILE_NAME)
+        self.lock = threading.Lock()
+        self.fts = False
+        self._conn = None
+        # session id -> {request id -> row id of its USER_INPUT event};
+        # requests of a session can run side by side, so events are attributed
+        # by their 'request_id' (events logged without one share the None entry)
+        self._requests = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(self.history_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Derived data: sessions missing after this are imported from their logs
+            conn.executescript("""
+                DROP TABLE IF EXISTS events_fts;
+                DROP TABLE IF EXISTS events;
+                DROP TABLE IF EXISTS sessions;
+            """)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY, started REAL, working_dir TEXT);
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY, session TEXT NOT NULL, ts REAL NOT NULL,
+                type TEXT NOT NULL, request TEXT, plan TEXT, commands TEXT,
+                outputs TEXT, success INTEGER, request_event INTEGER);
+            CREATE INDEX IF NOT EXISTS events_session ON events(session, ts);
+            CREATE INDEX IF NOT EXISTS events_request ON events(request_event);
+        """)
+        try:
+            conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+                request, plan, commands, outputs, content='events', content_rowid='id')""")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False  # SQLite built without FTS5: LIKE fallback
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    # --- Writing -----------------------------------------------------------
+
+    def add_events(self, session_id: str, events):
+        """
+        Stores (ts, event_type, data) events of a session in one transaction.
+        Called from the session log's writer thread.
+        """
+        with self.lock:
+            conn = self._connect()
+            requests = self._requests.setdefault(session_id, {})
+            known = dict(requests)
+            sessions = [(session_id, ts, str((data or {}).get("working_directory", "")))
+                        for ts, event_type, data in events if event_type == "SESSION_START"]
+            try:
+                conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", sessions)
+                conn.execute("INSERT OR IGNORE INTO sessions (id, started) VALUES (?, ?)",
+                             (session_id, events[0][0] if events else 0))
+                for ts, event_type, data in events:
+                    data = data or {}
+                    row = event_row(event_type, data)
+                    if row is None:
+                        continue
+                    request_id = data.get("request_id")
+                    values = (row["request"], row["plan"], row["commands"], row["outputs"])
+                    cursor = conn.execute(
+                        "INSERT INTO events (session, ts, type, request, plan, commands, outputs, success, request_event)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (session_id, ts, event_type) + values + (row["success"], requests.get(request_id)))
+                    if event_type == "USER_INPUT":
+                        requests[request_id] = cursor.lastrowid
+                        conn.execute("UPDATE events SET request_event = id WHERE id = ?", (cursor.lastrowid,))
+                    if self.fts:
+                        conn.execute("INSERT INTO events_fts (rowid, request, plan, commands, outputs)"
+                                     " VALUES (?, ?, ?, ?, ?)", (cursor.lastrowid,) + values)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                requests.clear()
+                requests.update(known)
+                raise
+
+    def sink(self, session_id: str):
+        """Callback for SessionLog.add_sink that stores the session's events."""
+        def store(events):
+            try:
+                self.add_events(session_id, events)
+            except (OSError, sqlite3.Error):
+                pass  # the JSONL log stays complete either way
+        return store
+
+    def known_sessions(self) -> set:
+        with self.lock:
+            return {row[0] for row in self._connect().execute("SELECT id FROM sessions")}
+
+    def import_sessions(self, exclude=()) -> int:
+        """
+        Imports JSONL sessions missing from the store (logged before it
+        existed); sessions in 'exclude' (being written) are skipped.
+
+        Returns:
+            The number of sessions imported.
+        """
+        try:
+            names = os.listdir(self.history_dir)
+        except OSError:
+            return 0
+        session_ids = set()
+        for name in names:
+            match = sessionlog.PART_PATTERN.match(name)
+            if match:
+                session_ids.add(match.group(1)[len("session_"):])
+        missing = sorted(session_ids - self.known_sessions() - set(exclude))
+        for session_id in missing:
+            base_path = os.path.join(self.history_dir, f"session_{session_id}")
+            events = [(r.get("ts", 0), r.get("type", ""), r.get("data") or {})
+                      for r in sessionlog.iter_records(base_path)]
+            if events:
+                self.add_events(session_id, events)
+        return len(missing)
+
+    def start_background_import(self, exclude=()) -> threading.Thread:
+        """Runs import_sessions() on a daemon thread; returns the thread."""
+        def run():
+            try:
+                self.import_sessions(exclude)
+            except (OSError, sqlite3.Error):
+                pass
+
+        thread = threading.Thread(target=run, name="pai-historydb", daemon=True)
+        thread.start()
+        return thread
+
+    # --- Queries -----------------------------------------------------------
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, event_type: str = None,
+               any_term: bool = False, exclude_session: str = None, columns=COLUMNS) -> list[dict]:
+        """
+        Events matching 'query' in 'columns', best first (newest first
+        without FTS5).
+
+        Returns:
+            Dicts with 'id', 'session', 'ts', 'type', 'request' (the text of
+            the request the event belongs to), 'success' and 'snippet' (the
+            best matching text with [brackets] around hits).
+        """
+        terms = _TERM_PATTERN.findall(query)
+        if not terms:
+            return []
+        filters = []
+        params = []
+        if event_type:
+            filters.append("e.type = ?")
+            params.append(event_type.upper())
+        if exclude_session:
+            filters.append("e.session != ?")
+            params.append(exclude_session)
+        with self.lock:
+            conn = self._connect()
+            if self.fts:
+                where = " AND ".join(["events_fts MATCH ?"] + filters)
+                weights = ", ".join(str(w) for w in RANK_WEIGHTS)
+                sql = (f"SELECT e.id, e.session, e.ts, e.type, coalesce(r.request, ''), e.success,"
+                       f" snippet(events_fts, -1, '[', ']', '...', {SNIPPET_TOKENS})"
+                       f" FROM events_fts JOIN events e ON e.id = events_fts.rowid"
+                       f" LEFT JOIN events r ON r.id = e.request_event WHERE {where} ORDER BY bm25(events_fts, {weights}) LIMIT ?")
+                column_filter = None if tuple(columns) == COLUMNS else columns
+                rows = conn.execute(sql, [fts_query(query, any_term, column_filter)] + params + [limit]).fetchall()
+            else:
+                # Each term must occur in some column (any term with 'any_term')
+                term_filter = "(" + " OR ".join(f"e.{column} LIKE ?" for column in columns) + ")"
+                joiner = " OR " if any_term else " AND "
+                where = " AND ".join(["(" + joiner.join([term_filter] * len(terms)) + ")"] + filters)
+                term_params = [f"%{term}%" for term in terms for _ in columns]
+                sql = (f"SELECT e.id, e.session, e.ts, e.type, coalesce(r.request, ''), e.success,"
+                       f" substr(coalesce(nullif(e.plan, ''), nullif(e.commands, ''), e.request), 1, 160)"
+                       f" FROM events e LEFT JOIN events r ON r.id = e.request_event WHERE {where} ORDER BY e.ts DESC LIMIT ?")
+                rows = conn.execute(sql, term_params + params + [limit]).fetchall()
+        keys = ("id", "session", "ts", "type", "request", "success", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def event(self, event_id: int) -> dict | None:
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT e.id, e.session, e.ts, e.type, coalesce(r.request, ''), e.plan, e.commands, e.outputs, e.success"
+                " FROM events e LEFT JOIN events r ON r.id = e.request_event WHERE e.id = ?",
+                (event_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "session", "ts", "type", "request", "plan", "commands", "outputs", "success"), row))
+
+    def interaction(self, session_id: str, request: str) -> dict:
+        """Intent, commands and outcome of one request in one session."""
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT ts, type, plan, commands, success FROM events WHERE request_event IN"
+                " (SELECT id FROM events WHERE session = ? AND type = 'USER_INPUT' AND request = ?)"
+                " ORDER BY ts", (session_id, request)).fetchall()
+        summary = {"session": session_id, "request": request, "ts": rows[0][0] if rows else 0,
+                   "intent": "", "commands": [], "success": None}
+        for ts, event_type, plan, commands, success in rows:
+            if event_type == "PLANNING_PHASE" and plan:
+                summary["intent"] = plan.split("\n", 1)[0]
+            elif event_type == "EXECUTION_PHASE" and commands:
+                summary["commands"].extend(commands.split("\n"))
+            elif event_type == "FINAL_STATUS":
+                summary["success"] = bool(success)
+        return summary
+
+    def relevant(self, query: str, limit: int = RELEVANT_LIMIT, exclude_session: str = None) -> list[dict]:
+        """
+        Past interactions related to 'query': the events whose request, plan
+        or commands match best are grouped by (session, request) and
+        summarized from the store, without reading any log file.
+        """
+        seen = []
+        hits = self.search(query, limit * 10, any_term=True, exclude_session=exclude_session,
+                           columns=("request", "plan", "commands"))
+        for hit in hits:
+            key = (hit["session"], hit["request"])
+            if hit["request"] and key not in seen:
+                seen.append(key)
+                if len(seen) >= limit:
+                    break
+        return [self.interaction(session_id, request) for session_id, request in seen]
+
+    def render_relevant(self, query: str, exclude_session: str = None,
+                        budget_chars: int = RELEVANT_BUDGET_CHARS) -> str:
+        """Planning prompt lines for past interactions related to 'query'."""
+        try:
+            interactions = self.relevant(query, exclude_session=exclude_session)
+        except (OSError, sqlite3.Error):
+            return ""
+        lines = []
+        used = 0
+        for item in interactions:
+            day = datetime.fromtimestamp(item["ts"]).strftime("%Y-%m-%d")
+            outcome = {True: "succeeded", False: "failed", None: "unfinished"}[item["success"]]
+            commands = ", ".join(item["commands"][:6]) + (", ..." if len(item["commands"]) > 6 else "")
+            line = f"- {day} \"{_clip(item['request'], 120)}\" ({outcome})"
+            if item["intent"]:
+                line += f": {_clip(item['intent'], 120)}"
+            if commands:
+                line += f" [{commands}]"
+            if used + len(line) > budget_chars:
+                break
+            lines.append(line)
+            used += len(line)
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_dbs_lock = threading.Lock()
+_dbs = {}
+
+def get_db(history_dir: str) -> HistoryDB:
+    """Returns the shared HistoryDB for a history directory."""
+    with _dbs_lock:
+        db = _dbs.get(history_dir)
+        if db is None:
+            db = HistoryDB(history_dir)
+            _dbs[history_dir] = db
+        return db
@@ -0,0 +1,283 @@
+import os
+import re
+import threading
+
+"""
+ignore.py
+---------
+This module implements the ignore rules used by every workspace listing:
+'.gitignore' and '.paiignore' files at any level of the project, plus a small
+set of built-in defaults for dependency and tool caches that are never worth
+listing (node_modules, virtualenvs, ...).
+
+Rules follow gitignore semantics: blank lines and '#' comments are skipped,
+'!' re-includes, a trailing '/' matches directories only, a pattern with a
+slash is anchored to the directory of its ignore file, and '*', '?', '[...]'
+and '**' are supported. Deeper ignore files take precedence over shallower
+ones, and within one file the last matching rule wins. '.paiignore' is read
+after '.gitignore', so it can re-include what git ignores.
+
+Each ignore file is compiled once into a regular expression (or an ordered
+rule list when it uses negation) and cached by mtime.
+"""
+
+IGNORE_FILE_NAMES = ('.gitignore', '.paiignore')
+
+# Built-in rules, applied before any ignore file (so '!name/' can undo them)
+DEFAULT_PATTERNS = (
+    'node_modules/',
+    '.venv/',
+    '.tox/',
+    '.nox/',
+    '.mypy_cache/',
+    '.pytest_cache/',
+    '.ruff_cache/',
+    '*.pyc',
+)
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob (without leading '!' or '/') to a regex."""
+    out = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == '*':
+            if pattern.startswith('**', i):
+                at_start = i == 0 or pattern[i - 1] == '/'
+                at_end = i + 2 == n or pattern[i + 2] == '/'
+                if at_start and at_end:
+                    if i + 2 == n:
+                        out.append('.*')  # trailing '/**' or a bare '**'
+                        i += 2
+                    else:
+                        out.append('(?:.*/)?')  # '**/' matches zero or more directories
+                        i += 3
+                    continue
+            out.append('[^/]*')
+            i += 1
+            while i < n and pattern[i] == '*':
+                i += 1
+            continue
+        if ch == '?':
+            out.append('[^/]')
+        elif ch == '[':
+            end = i + 1
+            if end < n and pattern[end] in '!^':
+                end += 1
+            if end < n and pattern[end] == ']':
+                end += 1
+            while end < n and pattern[end] != ']':
+                end += 1
+            if end >= n:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        elif ch == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return ''.join(out)
+
+class _Rule:
+    __slots__ = ('negated', 'dir_only', 'anchored', 'regex')
+
+    def __init__(self, negated: bool, dir_only: bool, anchored: bool, regex: str):
+        self.negated = negated
+        self.dir_only = dir_only
+        self.anchored = anchored
+        self.regex = re.compile(regex)
+
+def parse_rule(line: str) -> _Rule | None:
+    """Parses one ignore-file line; returns None for blanks and comments."""
+    line = line.rstrip('\n').rstrip('\r')
+    # Trailing spaces are ignored unless escaped
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    anchored = '/' in line
+    line = line.lstrip('/')
+    return _Rule(negated, dir_only, anchored, _translate(line) + r'\Z')
+
+class RuleSet:
+    """
+    The compiled rules of one ignore file, relative to 'base' (the project
+    relative directory containing it, '' for the root).
+    """
+
+    def __init__(self, base: str, lines):
+        self.base = base
+        self.rules = [rule for rule in map(parse_rule, lines) if rule is not None]
+        self.has_negation = any(rule.negated for rule in self.rules)
+        self._combined = {}
+        if not self.has_negation:
+            # Without '!' any match ignores, so each kind collapses into one regex
+            for is_dir in (False, True):
+                for anchored in (False, True):
+                    parts = [r.regex.pattern for r in self.rules
+                             if r.anchored == anchored and (is_dir or not r.dir_only)]
+                    self._combined[(is_dir, anchored)] = re.compile('|'.join(f'(?:{p})' for p in parts)) if parts else None
+
+    def component_regex(self):
+        """
+        For sets without negation or anchored rules, the regex that decides a
+        single path component (treated as a directory, so directory-only rules
+        apply too). None when the set needs full matching.
+        """
+        if self.has_negation or any(rule.anchored for rule in self.rules):
+            return None
+        return self._combined[(True, False)]
+
+    def match(self, rel_path: str, name: str, is_dir: bool) -> bool | None:
+        """
+        True if ignored, False if re-included, None if no rule applies.
+        'rel_path' is relative to the project root.
+        """
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        if not self.has_negation:
+            for anchored, subject in ((False, name), (True, rel_path)):
+                regex = self._combined[(is_dir, anchored)]
+                if regex is not None and regex.match(subject):
+                    return True
+            return None
+        for rule in reversed(self.rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(rel_path if rule.anchored else name):
+                return not rule.negated
+        return None
+
+class RuleChain:
+    """
+    The rule sets applying to the entries of one directory, shallowest first.
+
+    When no set uses negation, an entry is ignored as soon as any rule
+    matches. The unanchored rules of every ancestor then apply to the entry
+    name alone, so they are merged into one regex per entry type and most
+    entries are decided by a single match call.
+    """
+
+    def __init__(self, rule_sets):
+        self.rule_sets = tuple(rule_sets)
+        self.simple = not any(rule_set.has_negation for rule_set in self.rule_sets)
+        self._names = {}
+        self._anchored = ()
+        if self.simple:
+            for is_dir in (False, True):
+                parts = [rule_set._combined[(is_dir, False)].pattern for rule_set in self.rule_sets
+                         if rule_set._combined[(is_dir, False)] is not None]
+                self._names[is_dir] = re.compile('|'.join(f'(?:{p})' for p in parts)) if parts else None
+            self._anchored = tuple(rule_set for rule_set in self.rule_sets
+                                   if rule_set._combined[(True, True)] is not None)
+
+    def extend(self, rule_sets) -> 'RuleChain':
+        return RuleChain(self.rule_sets + tuple(rule_sets))
+
+    def ignored(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        """Whether the entry 'name' at project relative 'rel_path' is ignored."""
+        if self.simple:
+            regex = self._names[is_dir]
+            if regex is not None and regex.match(name):
+                return True
+            for rule_set in self._anchored:
+                if rule_set.match(rel_path, name, is_dir):
+                    return True
+            return False
+        for rule_set in reversed(self.rule_sets):
+            verdict = rule_set.match(rel_path, name, is_dir)
+            if verdict is not None:
+                return verdict
+        return False
+
+class IgnoreMatcher:
+    """
+    Resolves the ignore rules that apply inside a directory.
+
+    chain(rel_dir) returns the RuleChain from the defaults down to 'rel_dir'.
+    Walkers call chain() once per directory and then test each entry with
+    RuleChain.ignored().
+    """
+
+    def __init__(self, root: str, defaults=DEFAULT_PATTERNS, file_names=IGNORE_FILE_NAMES):
+        self.root = root
+        self.file_names = tuple(file_names)
+        self.defaults = RuleChain([RuleSet('', defaults)])
+        self.lock = threading.RLock()
+        self._files = {}  # ignore file path -> (mtime_ns, RuleSet)
+        self._chains = {}  # rel_dir -> (signature, chain)
+
+    def _load(self, rel_dir: str) -> list[RuleSet]:
+        """Rule sets of the ignore files in one directory (cached by mtime)."""
+        found = []
+        for file_name in self.file_names:
+            path = os.path.join(self.root, rel_dir, file_name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self._files.pop(path, None)
+                continue
+            cached = self._files.get(path)
+            if cached is None or cached[0] != mtime:
+                try:
+                    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                        cached = (mtime, RuleSet(rel_dir, f.readlines()))
+                except OSError:
+                    continue
+                self._files[path] = cached
+            found.append(cached[1])
+        return found
+
+    def chain(self, rel_dir: str, names=None) -> RuleChain:
+        """
+        Rule sets applying to entries of 'rel_dir' (project relative, '' or
+        '.' for the root). 'names' may list the directory entries so missing
+        ignore files are not stat'ed.
+        """
+        rel_dir = '' if rel_dir in ('', '.') else rel_dir.strip('/')
+        with self.lock:
+            if rel_dir:
+                # Walkers visit parents first, so their cached chain is current
+                parent_dir = os.path.dirname(rel_dir)
+                cached_parent = self._chains.get(parent_dir)
+                parent = cached_parent[1] if cached_parent else self.chain(parent_dir)
+            else:
+                parent = self.defaults
+            if names is not None and not any(name in names for name in self.file_names):
+                own = []
+            else:
+                own = self._load(rel_dir)
+            signature = (id(parent), tuple(id(rule_set) for rule_set in own))
+            cached = self._chains.get(rel_dir)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            chain = parent.extend(own) if own else parent
+            self._chains[rel_dir] = (signature, chain)
+            return chain
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Checks one project relative path against its directory's rules."""
+        rel_path = rel_path.strip('/')
+        chain = self.chain(os.path.dirname(rel_path))
+        return chain.ignored(rel_path, rel_path.rsplit('/', 1)[-1], is_dir)
+
+    def is_ignore_file(self, name: str) -> bool:
+        return name in self.file_names
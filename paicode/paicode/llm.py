@@ -1,6 +1,10 @@
 import os
+import heapq
+import itertools
+import threading
 import warnings
 import time
+from contextlib import nullcontext
 
 # Reduce noisy STDERR logs from gRPC/absl before importing Google SDKs.
 # These settings aim to suppress INFO/WARNING/ERROR logs emitted by native libs
@@ -34,8 +38,28 @@ try:
 except ValueError:
     DEFAULT_TEMPERATURE = 0.3
 
+# Priority classes: planning and code generation are on the critical path;
+# acknowledgments and suggestions are optional and have local fallbacks
+CRITICAL, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = ("critical", "normal", "low")
+
+# Shared budget of all calls: requests in flight and requests per minute
+# (PAI_LLM_RPM=0 leaves the rate to the API's own limits)
+MAX_CONCURRENT = max(1, int(os.getenv("PAI_LLM_CONCURRENCY", "2")))
+RATE_PER_MINUTE = float(os.getenv("PAI_LLM_RPM", "60"))
+# Share of the rate budget low-priority calls leave for the others
+LOW_RESERVE = 0.25
+# Low-priority calls that cannot start within this many seconds are dropped
+LOW_MAX_WAIT = float(os.getenv("PAI_LLM_LOW_WAIT", "2.0"))
+# Pause after a rate-limit error, doubled on each further one
+BACKOFF_SECONDS = 10.0
+MAX_BACKOFF_SECONDS = 120.0
+# Critical and normal calls are retried after a rate-limit error
+RATE_LIMIT_RETRIES = 2
+
 # Global model holder
 model = None
+_model_lock = threading.Lock()
 _runtime = {
     "name": None,
     "temperature": None,
@@ -158,51 +182,214 @@ def _clean_response_text(text: str) -> str:
     
     return cleaned_text
 
-def generate_text(prompt: str, call_purpose: str = "thinking") -> str:
+class CallScheduler:
+    """
+    Orders LLM calls by priority under a shared concurrency and rate budget.
+
+    Waiting calls start strictly by (priority, arrival). Low-priority calls
+    never hold back the others: critical calls do not count running
+    low-priority calls against the concurrency limit, and low-priority calls
+    leave LOW_RESERVE of the rate budget untouched. Under quota pressure
+    (a rate-limit backoff, or the budget down to the reserve) low-priority
+    calls are dropped at once, and they are also dropped when they cannot
+    start within LOW_MAX_WAIT; callers fall back to local text.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, rate_per_minute: float = RATE_PER_MINUTE):
+        self.cond = threading.Condition()
+        self.max_concurrent = max_concurrent
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.stamp = time.monotonic()
+        self.backoff = BACKOFF_SECONDS
+        self.backoff_until = 0.0
+        # Heap of (priority, arrival) for the calls waiting to start
+        self.waiting = []
+        self.running = [0, 0, 0]
+        self._arrivals = itertools.count()
+        self.counters = [{"calls": 0, "dropped": 0, "rate_limited": 0, "wait_total": 0.0, "wait_max": 0.0}
+                         for _ in PRIORITY_NAMES]
+
+    def _refill(self, now: float):
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.capacity / 60.0)
+        self.stamp = now
+
+    def _under_pressure(self, now: float) -> bool:
+        return now < self.backoff_until or (self.capacity and self.tokens < 1 + self.capacity * LOW_RESERVE)
+
+    def _can_start(self, priority: int, now: float) -> bool:
+        if now < self.backoff_until:
+            return False
+        busy = self.running[CRITICAL] + self.running[NORMAL]
+        if priority != CRITICAL:
+            busy += self.running[LOW]
+        if busy >= self.max_concurrent:
+            return False
+        if self.capacity:
+            return self.tokens >= 1 + (self.capacity * LOW_RESERVE if priority == LOW else 0)
+        return True
+
+    def _next_change(self, now: float) -> float:
+        """Seconds until the backoff ends or the next rate token is due."""
+        if now < self.backoff_until:
+            return self.backoff_until - now
+        if self.capacity and self.tokens < 1:
+            return (1 - self.tokens) * 60.0 / self.capacity
+        return 0.5
+
+    def acquire(self, priority: int = NORMAL) -> bool:
+        """
+        Waits for this call's turn. False means a low-priority call was
+        dropped; otherwise release() must follow.
+        """
+        arrived = time.monotonic()
+        entry = (priority, next(self._arrivals))
+        counters = self.counters[priority]
+        with self.cond:
+            self._refill(arrived)
+            if priority == LOW and self._under_pressure(arrived):
+                counters["dropped"] += 1
+                return False
+            heapq.heappush(self.waiting, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.waiting[0] == entry and self._can_start(priority, now):
+                    heapq.heappop(self.waiting)
+                    break
+                if priority == LOW and now - arrived >= LOW_MAX_WAIT:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    counters["dropped"] += 1
+                    self.cond.notify_all()
+                    return False
+                timeout = self._next_change(now)
+                if priority == LOW:
+                    timeout = min(timeout, LOW_MAX_WAIT - (now - arrived))
+                self.cond.wait(max(0.01, timeout))
+            if self.capacity:
+                self.tokens -= 1
+            self.running[priority] += 1
+            waited = now - arrived
+            counters["calls"] += 1
+            counters["wait_total"] += waited
+            counters["wait_max"] = max(counters["wait_max"], waited)
+            # The next waiter may be able to start too
+            self.cond.notify_all()
+        return True
+
+    def release(self, priority: int = NORMAL, rate_limited: bool = False):
+        """Ends a call; a rate-limit error pauses new calls for the backoff."""
+        with self.cond:
+            self.running[priority] -= 1
+            if rate_limited:
+                self.counters[priority]["rate_limited"] += 1
+                self.backoff_until = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, MAX_BACKOFF_SECONDS)
+            else:
+                self.backoff = BACKOFF_SECONDS
+            self.cond.notify_all()
+
+    def backoff_remaining(self) -> float:
+        with self.cond:
+            return max(0.0, self.backoff_until - time.monotonic())
+
+    def stats(self) -> dict:
+        """Queue depth, running calls and wait times per priority class."""
+        with self.cond:
+            now = time.monotonic()
+            self._refill(now)
+            classes = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                counters = self.counters[priority]
+                classes[name] = {
+                    "queued": sum(1 for entry in self.waiting if entry[0] == priority),
+                    "running": self.running[priority],
+                    "calls": counters["calls"],
+                    "dropped": counters["dropped"],
+                    "rate_limited": counters["rate_limited"],
+                    "wait_avg": counters["wait_total"] / counters["calls"] if counters["calls"] else 0.0,
+                    "wait_max": counters["wait_max"],
+                }
+            return {
+                "classes": classes,
+                "rate_budget": round(self.tokens, 1) if self.capacity else None,
+                "backoff": round(max(0.0, self.backoff_until - now), 1),
+            }
+
+scheduler = CallScheduler()
+
+def render_stats() -> str:
+    """One line per priority class for the '/stats' command and the session log."""
+    stats = scheduler.stats()
+    lines = []
+    for name, data in stats["classes"].items():
+        lines.append(
+            f"{name:8} queued {data['queued']}, running {data['running']}, calls {data['calls']}, "
+            f"dropped {data['dropped']}, rate-limited {data['rate_limited']}, "
+            f"wait avg {data['wait_avg']:.2f}s max {data['wait_max']:.2f}s"
+        )
+    budget = "unlimited" if stats["rate_budget"] is None else f"{stats['rate_budget']}/{RATE_PER_MINUTE:g} per minute"
+    lines.append(f"rate budget {budget}, backoff {stats['backoff']}s")
+    return "\n".join(lines)
+
+def generate_text(prompt: str, call_purpose: str = "thinking", progress: bool = True, priority: int = NORMAL) -> str:
     """
     Generate text with single API key - optimized for 2-call system.
     
     Args:
         prompt: The prompt to send to the LLM
         call_purpose: Purpose of the call for logging (e.g., "planning", "execution")
+        progress: Show the spinner and token counts (off for background calls)
+        priority: CRITICAL, NORMAL or LOW; see CallScheduler
         
     Returns:
-        The cleaned response text, or empty string if failed
+        The cleaned response text, or empty string if failed (or if a
+        low-priority call was dropped; callers use their local fallback)
     """
     global model
     
     # Ensure model is configured
-    if model is None:
-        if not _prepare_runtime():
+    with _model_lock:
+        if model is None and not _prepare_runtime():
             return ""
+        current_model = model
     
-    try:
-        # Show status with purpose
-        status_msg = f"[bold yellow]Agent {call_purpose}..."
-        
-        with ui.console.status(status_msg, spinner="dots"):
-            response = model.generate_content(prompt)
-        
-        # Success! Clean and return the response
-        cleaned_text = _clean_response_text(response.text)
-        
-        # Log token usage if available (for optimization)
-        if hasattr(response, 'usage_metadata'):
-            usage = response.usage_metadata
-            ui.print_info(f"Tokens: {usage.prompt_token_count} → {usage.candidates_token_count}")
-        
-        return cleaned_text
-        
-    except Exception as e:
-        is_rate_limit = _is_rate_limit_error(e)
-        
-        if is_rate_limit:
-            ui.print_error("✗ Rate limit reached. Please wait a few minutes before trying again.")
-            ui.print_info("Consider using a different API key if available.")
-        else:
-            ui.print_error(f"✗ LLM API error: {e}")
-        
-        return ""
+    with ui.status(f"Agent {call_purpose}...") if progress else nullcontext():
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if not scheduler.acquire(priority):
+                return ""
+            rate_limited = False
+            try:
+                response = current_model.generate_content(prompt)
+                # Success! Clean and return the response
+                cleaned_text = _clean_response_text(response.text)
+                break
+            except Exception as e:
+                rate_limited = _is_rate_limit_error(e)
+                error = e
+            finally:
+                scheduler.release(priority, rate_limited)
+            
+            if rate_limited and priority != LOW and attempt < RATE_LIMIT_RETRIES:
+                ui.print_warning(f"Rate limit reached; retrying {call_purpose} in {scheduler.backoff_remaining():.0f}s.")
+                continue
+            
+            if rate_limited:
+                if priority != LOW:
+                    ui.print_error("✗ Rate limit reached. Please wait a few minutes before trying again.")
+                    ui.print_info("Consider using a different API key if available.")
+            else:
+                ui.print_error(f"✗ LLM API error: {error}")
+            return ""
+    
+    # Log token usage if available (for optimization)
+    if progress and hasattr(response, 'usage_metadata'):
+        usage = response.usage_metadata
+        ui.print_info(f"Tokens: {usage.prompt_token_count} → {usage.candidates_token_count}")
+    
+    return cleaned_text
 
 def test_api_connection() -> bool:
     """Test if API connection works."""
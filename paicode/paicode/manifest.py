@@ -0,0 +1,226 @@
+import os
+from collections import Counter
+from .context import estimate_tokens
+
+"""
+manifest.py
+-----------
+This module renders the workspace manifest used by the planning prompt: one
+compact description of the project layout that replaces the separate tree
+and flat file listing (which described the same files twice).
+
+The manifest is produced in a single pass over the workspace index trie:
+
+- directories are shown as an indented trie, and chains of directories
+  that only contain one subdirectory share a line ('src/main/java/');
+- files are listed on their directory's line, and groups of similar files
+  collapse into a count ('tests/: 412 *.py');
+- fan-out (subdirectories shown per directory) and depth are capped; what is
+  cut is summarized with file counts instead of being dropped silently.
+
+Every file is named when that fits the token budget; otherwise similar
+files are collapsed, more eagerly each time, and then the depth is reduced
+until it fits.
+
+For very large workspaces (see workspace.is_lazy_workspace) the lazy manifest
+covers only the top levels, each directory with its file and subdirectory
+counts. Only those levels are refreshed; the model expands the rest with
+TREE::path::depth and LIST_PATH::path::depth, served from the same index.
+"""
+
+# Approximate token budget of the manifest in the planning prompt
+MANIFEST_BUDGET = int(os.getenv("PAI_MANIFEST_BUDGET", "600"))
+MAX_DEPTH = int(os.getenv("PAI_MANIFEST_DEPTH", "4"))
+MAX_FANOUT = int(os.getenv("PAI_MANIFEST_FANOUT", "12"))
+
+# Directory levels shown by the lazy manifest
+LAZY_DEPTH = int(os.getenv("PAI_LAZY_DEPTH", "2"))
+
+# Files sharing an extension collapse into a count from this many on. Every
+# name is listed when that fits the budget; these settings apply otherwise,
+# the tighter one last.
+COLLAPSE_MIN = 30
+TIGHT_COLLAPSE_MIN = 6
+# File names listed per directory line before the rest is counted
+MAX_NAMES = 30
+INDENT = "  "
+
+def _extension(name: str) -> str:
+    ext = os.path.splitext(name)[1]
+    return f"*{ext}" if ext else name if name.startswith('.') else "*"
+
+def _count_files(root) -> dict:
+    """Files below every directory node (by id), computed without recursion."""
+    totals = {}
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.dirs.values())
+    for node in reversed(order):
+        totals[id(node)] = len(node.files) + sum(totals[id(child)] for child in node.dirs.values())
+    return totals
+
+def _describe_files(names, collapse_min: int | None = COLLAPSE_MIN) -> str:
+    """
+    'a.py, b.py, 14 *.md' for the files of one directory; with collapse_min
+    None every name is listed.
+    """
+    if not names:
+        return ""
+    if collapse_min is None:
+        return ", ".join(sorted(names))
+    groups = Counter(_extension(name) for name in names)
+    collapsed = {ext for ext, count in groups.items() if count >= collapse_min}
+    parts = [f"{count} {ext}" for ext, count in groups.most_common() if ext in collapsed]
+    listed = sorted(name for name in names if _extension(name) not in collapsed)
+    parts.extend(listed[:MAX_NAMES])
+    if len(listed) > MAX_NAMES:
+        parts.append(f"+{len(listed) - MAX_NAMES} more")
+    return ", ".join(parts)
+
+def _summarize_subtree(node) -> str:
+    """File count and main extensions below a directory cut by the depth cap."""
+    groups = Counter()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        groups.update(_extension(name) for name in current.files)
+        stack.extend(current.dirs.values())
+    total = sum(groups.values())
+    if not total:
+        return "(empty)"
+    top = ", ".join(f"{count} {ext}" for ext, count in groups.most_common(3))
+    return f"{total} files: {top}" + (", ..." if len(groups) > 3 else "")
+
+def render(root, max_depth: int = MAX_DEPTH, fanout: int = MAX_FANOUT, collapse_min: int | None = COLLAPSE_MIN) -> list[str]:
+    """
+    Manifest lines for a directory node of the workspace index.
+
+    Args:
+        root: fsindex directory node to describe.
+        max_depth: Directory levels expanded below 'root'.
+        fanout: Subdirectories shown per directory before the rest is summarized.
+        collapse_min: Group size from which similar files become a count
+            (None lists every file).
+    """
+    totals = _count_files(root)
+    lines = []
+    root_files = _describe_files(list(root.files), collapse_min)
+    if root_files:
+        lines.append(root_files)
+
+    # Depth-first without recursion: (node, name, depth); children pushed reversed
+    stack = []
+
+    def push_children(node, depth):
+        names = sorted(node.dirs)
+        shown = names[:fanout]
+        hidden = names[fanout:]
+        items = [(node.dirs[name], name, depth) for name in shown]
+        if hidden:
+            hidden_files = sum(totals[id(node.dirs[name])] for name in hidden)
+            items.append((None, f"... +{len(hidden)} more dirs ({hidden_files} files)", depth))
+        stack.extend(reversed(items))
+
+    push_children(root, 1)
+    while stack:
+        node, name, depth = stack.pop()
+        indent = INDENT * (depth - 1)
+        if node is None:
+            lines.append(indent + name)
+            continue
+        # Share one line along chains of single-subdirectory directories
+        label = name + "/"
+        while not node.files and len(node.dirs) == 1:
+            child_name, child = next(iter(node.dirs.items()))
+            label += child_name + "/"
+            node = child
+        if depth >= max_depth and node.dirs:
+            lines.append(f"{indent}{label} {_summarize_subtree(node)}")
+            continue
+        files = _describe_files(list(node.files), collapse_min)
+        lines.append(f"{indent}{label}: {files}" if files else f"{indent}{label}")
+        push_children(node, depth + 1)
+    return lines
+
+def _fit(lines: list[str], budget_tokens: int) -> str:
+    """Joins manifest lines, cutting them at the token budget."""
+    kept = []
+    used = 0
+    for line in lines:
+        used += estimate_tokens(line) + 1
+        if used > budget_tokens:
+            kept.append(f"... ({len(lines) - len(kept)} more lines)")
+            break
+        kept.append(line)
+    return "\n".join(kept) or "(empty workspace)"
+
+def build_manifest(index, rel_path: str = '.', budget_tokens: int = MANIFEST_BUDGET) -> str:
+    """
+    Renders the manifest of 'rel_path' from a fsindex.WorkspaceIndex. Every
+    file is named when that fits 'budget_tokens'; otherwise similar files are
+    collapsed, more eagerly each time, and then the depth is reduced.
+    Returns "" if the path is not a directory.
+    """
+    attempts = [(MAX_DEPTH, None), (MAX_DEPTH, COLLAPSE_MIN)]
+    attempts += [(depth, TIGHT_COLLAPSE_MIN) for depth in range(max(MAX_DEPTH, 1), 0, -1)]
+    with index.lock:
+        node = index.node(rel_path)
+        if node is None:
+            return ""
+        lines = []
+        for depth, collapse_min in attempts:
+            lines = render(node, depth, MAX_FANOUT, collapse_min)
+            if estimate_tokens("\n".join(lines)) <= budget_tokens:
+                break
+    # Even at depth 1 a huge fan-out can overflow
+    return _fit(lines, budget_tokens)
+
+def _counts(node) -> str:
+    """'(12 files, 3 dirs)' for one directory node."""
+    if node.mtime == 0:
+        return "(symlink)"
+    parts = [f"{len(node.files)} files"] if node.files else []
+    if node.dirs:
+        parts.append(f"{len(node.dirs)} dirs")
+    return f"({', '.join(parts)})" if parts else "(empty)"
+
+def build_lazy_manifest(index, rel_path: str = '.', depth: int = LAZY_DEPTH,
+                        budget_tokens: int = MANIFEST_BUDGET) -> str:
+    """
+    Top 'depth' levels of 'rel_path' with per-directory counts. Only those
+    levels (plus one to count the deepest directories' entries) are
+    refreshed, so the cost does not grow with the size of the workspace.
+    Returns "" if the path is not a directory.
+    """
+    with index.lock:
+        root = index.node(rel_path, depth + 1)
+        if root is None:
+            return ""
+        lines = []
+        root_files = _describe_files(list(root.files), COLLAPSE_MIN)
+        if root_files:
+            lines.append(root_files)
+        # Depth-first without recursion: (node, name, depth); children pushed reversed
+        stack = []
+
+        def push_children(node, level):
+            names = sorted(node.dirs)
+            items = [(node.dirs[name], name, level) for name in names[:MAX_FANOUT]]
+            if len(names) > MAX_FANOUT:
+                items.append((None, f"... +{len(names) - MAX_FANOUT} more dirs", level))
+            stack.extend(reversed(items))
+
+        push_children(root, 1)
+        while stack:
+            node, name, level = stack.pop()
+            indent = INDENT * (level - 1)
+            if node is None:
+                lines.append(indent + name)
+                continue
+            lines.append(f"{indent}{name}/ {_counts(node)}")
+            if level < depth:
+                push_children(node, level + 1)
+    return _fit(lines, budget_tokens)
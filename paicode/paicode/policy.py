@@ -0,0 +1,211 @@
+import os
+import threading
+from collections import OrderedDict
+from .ignore import RuleSet
+
+"""
+policy.py
+---------
+This module decides which paths the agent may touch. A PathPolicy is compiled
+once per project root: the root is resolved a single time, and the deny and
+allow rules (gitignore-style globs; a bare name such as '.git' matches that
+component at any depth) are compiled into one rule set. Allow rules are
+applied after deny rules, so they can carve exceptions out of a denied
+pattern at the same level, but never re-open the inside of a denied
+directory.
+
+Verdicts are (allowed, reason) pairs kept in a bounded LRU cache, and the
+resolved form of each directory is cached as well, so checking a new file
+costs one lstat instead of a full realpath. Moving or deleting a path can
+change what a symlink resolves to, so the workspace invalidates the affected
+entries after every change. Checking never prints;
+callers decide how to report a denial.
+"""
+
+# Large enough to hold the verdicts of a bulk check over a typical workspace
+DEFAULT_CACHE_SIZE = 16384
+
+class PathPolicy:
+    """
+    Compiled access policy for paths relative to 'root'.
+
+    Args:
+        root: Project root; resolved once with realpath.
+        deny: Gitignore-style patterns that are denied.
+        allow: Patterns re-allowed after the deny rules.
+        cache_size: Number of verdicts kept in the LRU cache.
+    """
+
+    def __init__(self, root: str, deny=(), allow=(), cache_size: int = DEFAULT_CACHE_SIZE):
+        self.root = os.path.abspath(root)
+        self.root_real = os.path.realpath(self.root)
+        # Deny patterns, then allow patterns as negations (also the rule signature)
+        self.patterns = list(deny) + ['!' + pattern for pattern in allow]
+        self.rules = RuleSet('', self.patterns)
+        # Plain name rules (the common case) decide each component with one regex
+        self._component_regex = self.rules.component_regex()
+        self._simple = self._component_regex is not None or not self.rules.rules
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._real_dirs = {}  # relative directory -> realpath
+        self.hits = 0
+        self.misses = 0
+
+    def _denied(self, rel_path: str) -> bool:
+        """
+        Applies the rules to every prefix of a normalized relative path. The
+        last component is treated as a possible directory, so directory-only
+        rules deny it too.
+        """
+        parts = rel_path.split('/')
+        if self._simple:
+            regex = self._component_regex
+            return regex is not None and any(regex.match(part) for part in parts)
+        for depth in range(1, len(parts) + 1):
+            if self.rules.match('/'.join(parts[:depth]), parts[depth - 1], True):
+                return True
+        return False
+
+    def denies(self, rel_path: str) -> bool:
+        """
+        Whether the rules deny a normalized relative path, without touching
+        the disk (no root or symlink checks). Walkers use this to leave
+        denied entries out of listings and indexes.
+        """
+        return bool(rel_path) and rel_path != '.' and self._denied(rel_path)
+
+    @staticmethod
+    def _key(path) -> str | None:
+        """Cache key: the normalized relative form of a path."""
+        if not isinstance(path, str) or not path.strip():
+            return None
+        return os.path.normpath(path.strip()).replace('\\', '/')
+
+    def _resolve(self, norm_path: str) -> str:
+        """
+        realpath of a normalized relative path. Directory resolutions are
+        cached, so a file only costs an lstat of its last component.
+        """
+        parent, name = os.path.split(norm_path)
+        if not name or name in ('.', '..'):
+            return os.path.realpath(os.path.join(self.root, norm_path))
+        real_parent = self._real_dirs.get(parent)
+        if real_parent is None:
+            real_parent = os.path.realpath(os.path.join(self.root, parent))
+            if len(self._real_dirs) >= self.cache_size:
+                self._real_dirs.clear()
+            self._real_dirs[parent] = real_parent
+        full_path = os.path.join(real_parent, name)
+        if os.path.islink(full_path):
+            full_path = os.path.realpath(full_path)
+        return full_path
+
+    def _evaluate(self, path: str) -> tuple[bool, str]:
+        if not path or not isinstance(path, str) or not path.strip():
+            return False, "empty path"
+        norm_path = os.path.normpath(path.strip())
+        if norm_path == '..':
+            return False, "outside the project directory"
+
+        full_path = self._resolve(norm_path)
+        if full_path != self.root_real and not full_path.startswith(self.root_real + os.sep):
+            return False, "outside the project directory"
+
+        rel_path = norm_path.replace('\\', '/')
+        if rel_path != '.' and self._denied(rel_path.lstrip('/')):
+            return False, "sensitive path"
+        # A symlink inside the project may still point at a denied location
+        if full_path != os.path.join(self.root_real, norm_path):
+            real_rel = os.path.relpath(full_path, self.root_real).replace('\\', '/')
+            if real_rel != '.' and self._denied(real_rel):
+                return False, "sensitive path"
+        return True, ""
+
+    def check(self, path: str) -> tuple[bool, str]:
+        """
+        Returns (allowed, reason) for one path; 'reason' is empty when allowed.
+        """
+        key = self._key(path)
+        if key is not None:
+            with self.lock:
+                verdict = self._cache.get(key)
+                if verdict is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return verdict
+        try:
+            verdict = self._evaluate(path)
+        except (OSError, ValueError) as e:
+            verdict = (False, f"path validation failed: {e}")
+        if key is not None:
+            with self.lock:
+                self.misses += 1
+                self._cache[key] = verdict
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return verdict
+
+    def is_allowed(self, path: str) -> bool:
+        return self.check(path)[0]
+
+    def check_many(self, paths) -> list[tuple[bool, str]]:
+        """
+        Verdicts for many paths in one call (e.g. filtering search results).
+        Cached verdicts are looked up under a single lock acquisition and only
+        the misses are evaluated.
+        """
+        paths = list(paths)
+        keys = [self._key(path) for path in paths]
+        verdicts = [None] * len(paths)
+        with self.lock:
+            for i, key in enumerate(keys):
+                verdict = self._cache.get(key) if key is not None else None
+                if verdict is not None:
+                    self._cache.move_to_end(key)
+                    verdicts[i] = verdict
+            self.hits += sum(1 for verdict in verdicts if verdict is not None)
+        fresh = {}
+        for i, verdict in enumerate(verdicts):
+            if verdict is None:
+                try:
+                    verdicts[i] = self._evaluate(paths[i])
+                except (OSError, ValueError) as e:
+                    verdicts[i] = (False, f"path validation failed: {e}")
+                if keys[i] is not None:
+                    fresh[keys[i]] = verdicts[i]
+        if fresh:
+            with self.lock:
+                self.misses += len(fresh)
+                self._cache.update(fresh)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return verdicts
+
+    def filter_allowed(self, paths) -> list[str]:
+        """The subset of 'paths' that is allowed, in order."""
+        paths = list(paths)
+        return [path for path, (allowed, _) in zip(paths, self.check_many(paths)) if allowed]
+
+    def invalidate(self, rel_path: str = None):
+        """
+        Drops cached verdicts for a path and everything below it, or the whole
+        cache when no path is given.
+        """
+        with self.lock:
+            # Directory resolutions are cheap to rebuild; any move can affect them
+            self._real_dirs.clear()
+            if rel_path is None:
+                self._cache.clear()
+                return
+            target = self._key(rel_path)
+            if target in (None, '.'):
+                self._cache.clear()
+                return
+            prefix = target + '/'
+            for key in [k for k in self._cache if k == target or k.startswith(prefix)]:
+                del self._cache[key]
+
+    def on_workspace_change(self, rel_path: str, kind: str):
+        """Change listener registered with the workspace module."""
+        self.invalidate(rel_path)
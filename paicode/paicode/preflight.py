@@ -0,0 +1,210 @@
+import os
+from . import workspace
+
+"""
+preflight.py
+------------
+This module checks a phase's command list against the workspace before any
+command runs. The commands are simulated in order on a virtual overlay of the
+workspace index (paths created, written or deleted by earlier commands of
+the same list), so predictable failures are found before a WRITE or MODIFY
+pays for its content-generation call.
+
+Obvious mistakes are fixed in place:
+- WRITE of an existing file becomes MODIFY (WRITE would overwrite it).
+
+Commands that cannot succeed, or would destroy data, are skipped:
+- MODIFY or READ of a missing file, RM of a missing path,
+- MV of a missing source, or onto an existing path,
+- TOUCH of an existing file (it would truncate it),
+- any path the path policy rejects.
+
+The simulation uses only the index (and one stat for paths the index does
+not list, such as ignored files); nothing is read or written.
+"""
+
+# Commands whose first parameter is a workspace path
+_PATH_COMMANDS = {"READ", "WRITE", "MODIFY", "TREE", "LIST_PATH", "MKDIR", "TOUCH", "RM", "MV"}
+
+class Overlay:
+    """The workspace index plus the changes made by the simulated commands."""
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else workspace.get_workspace_index()
+        # Normalized path -> 'file', 'dir' or None (deleted)
+        self.changes = {}
+        # Directory -> where the index lists its content, for directories
+        # whose content is not at their own path: the path a moved directory
+        # came from, or None for a new directory (empty, whatever the index
+        # still lists for a path deleted before)
+        self.origins = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(path.strip() or '.').replace('\\', '/')
+
+    def kind(self, path: str) -> str | None:
+        """'file', 'dir' or None (missing) after the simulated changes."""
+        key = self._key(path)
+        if key in self.changes:
+            return self.changes[key]
+        parent = key
+        while '/' in parent:
+            parent = parent.rsplit('/', 1)[0]
+            if parent in self.changes:
+                # Inside a deleted path, or a directory created or moved by this list
+                if self.changes[parent] != 'dir':
+                    return None
+                if parent in self.origins:
+                    if self.origins[parent] is None:
+                        return None
+                    key = self.origins[parent] + key[len(parent):]
+                break
+        stat = self.index.stat(key)
+        if stat is not None:
+            return stat[0]
+        # The index leaves out ignored files; they can still be edited
+        full_path = os.path.join(self.index.root, key)
+        if os.path.isdir(full_path):
+            return 'dir'
+        if os.path.exists(full_path):
+            return 'file'
+        return None
+
+    def set(self, path: str, kind: str | None):
+        key = self._key(path)
+        created = kind == 'dir' and self.kind(key) is None
+        if kind is None:
+            # Entries created below a deleted path go with it
+            for other in [k for k in self.changes if k.startswith(key + '/')]:
+                del self.changes[other]
+        for other in [k for k in self.origins if k == key or k.startswith(key + '/')]:
+            del self.origins[other]
+        self.changes[key] = kind
+        if created:
+            self.origins[key] = None
+
+    def move(self, source: str, destination: str, kind: str):
+        """Moves 'source' to 'destination', with everything below it."""
+        source, destination = self._key(source), self._key(destination)
+        prefix = source + '/'
+        changes = {destination + k[len(source):]: v for k, v in self.changes.items() if k.startswith(prefix)}
+        origins = {destination + k[len(source):]: v for k, v in self.origins.items() if k.startswith(prefix)}
+        if kind == 'dir':
+            origins[destination] = self._origin(source)
+        self.set(source, None)
+        self.set(destination, kind)
+        self.changes.update(changes)
+        self.origins.update(origins)
+
+    def _origin(self, key: str) -> str | None:
+        """Where the index lists the content at 'key' (None: nowhere)."""
+        parent = key
+        while parent not in self.origins:
+            if '/' not in parent:
+                return key
+            parent = parent.rsplit('/', 1)[0]
+        origin = self.origins[parent]
+        return None if origin is None else origin + key[len(parent):]
+
+def split_command(line: str) -> tuple[str, str, str]:
+    """(COMMAND, param1, param2) as the agent parses them."""
+    parts = line.split('::', 2)
+    command = parts[0].upper().strip()
+    param1 = parts[1].strip() if len(parts) > 1 else ""
+    param2 = parts[2].strip() if len(parts) > 2 else ""
+    return command, param1, param2
+
+def check(commands: list[str], overlay: Overlay = None) -> tuple[list[str | None], dict]:
+    """
+    Simulates 'commands' (raw command lines) in order.
+
+    Returns:
+        (commands, issues): the command lines with fixes applied and None
+        for skipped commands (same length and order as the input), and
+        {position: (level, message)} where level is 'fixed', 'skipped' or
+        'warning'. Lines that are not commands are passed through.
+    """
+    overlay = overlay or Overlay()
+    checked = []
+    issues = {}
+
+    def skip(line: str, reason: str):
+        issues[len(checked)] = ("skipped", reason)
+        checked.append(None)
+
+    for line in commands:
+        if '::' not in line:
+            checked.append(line)
+            continue
+        command, target, param2 = split_command(line)
+        if command not in _PATH_COMMANDS or not target:
+            checked.append(line)
+            continue
+
+        paths = [target, param2] if command == "MV" and param2 else [target]
+        denied = next(((path, reason) for path in paths if (reason := workspace.path_denial(path))), None)
+        if denied:
+            skip(line, f"access to '{denied[0]}' is denied ({denied[1]})")
+            continue
+
+        kind = overlay.kind(target)
+        if command == "WRITE":
+            if kind == 'dir':
+                skip(line, f"'{target}' is a directory")
+                continue
+            if kind == 'file':
+                line = f"MODIFY::{target}::{param2}"
+                issues[len(checked)] = ("fixed", f"WRITE changed to MODIFY: '{target}' exists")
+            overlay.set(target, 'file')
+        elif command == "MODIFY":
+            if kind != 'file':
+                skip(line, f"'{target}' does not exist" if kind is None else f"'{target}' is a directory")
+                continue
+        elif command == "READ":
+            if kind != 'file':
+                skip(line, f"'{target}' does not exist" if kind is None else f"'{target}' is a directory (use TREE)")
+                continue
+        elif command in ("TREE", "LIST_PATH"):
+            if kind is None:
+                issues[len(checked)] = ("warning", f"'{target}' does not exist yet")
+        elif command == "TOUCH":
+            if kind == 'file':
+                skip(line, f"'{target}' already exists (TOUCH would empty it)")
+                continue
+            if kind == 'dir':
+                skip(line, f"'{target}' is a directory")
+                continue
+            overlay.set(target, 'file')
+        elif command == "MKDIR":
+            if kind == 'file':
+                skip(line, f"'{target}' is a file")
+                continue
+            overlay.set(target, 'dir')
+        elif command == "RM":
+            if kind is None:
+                skip(line, f"'{target}' does not exist")
+                continue
+            overlay.set(target, None)
+        elif command == "MV":
+            if not param2:
+                checked.append(line)
+                continue
+            destination_kind = overlay.kind(param2)
+            if kind is None:
+                skip(line, f"'{target}' does not exist")
+                continue
+            if destination_kind == 'dir':
+                # Moved into the directory, as shutil.move does
+                destination = f"{param2.rstrip('/')}/{os.path.basename(os.path.normpath(target))}"
+                if overlay.kind(destination) is not None:
+                    skip(line, f"'{destination}' already exists")
+                    continue
+            elif destination_kind == 'file':
+                skip(line, f"'{param2}' already exists (MV would overwrite it)")
+                continue
+            else:
+                destination = param2
+            overlay.move(target, destination, kind)
+        checked.append(line)
+    return checked, issues
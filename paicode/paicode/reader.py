@@ -0,0 +1,202 @@
+import os
+import mmap
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+"""
+reader.py
+---------
+This module reads workspace files for the prompt without loading more than
+the prompt can use. It backs READ::path and READ::path::start-end:
+
+- binary files are detected from their first block and never decoded;
+- whole-file reads are capped (PAI_READ_MAX_BYTES); larger files come back as
+  a head/tail excerpt with a note on how to read a specific range;
+- ranges of large files are served through mmap and a sparse line index
+  (newline counts per 1 MB chunk), so reading lines 120-180 of a huge log
+  touches one chunk instead of the whole file.
+
+Line indexes are cached per file and dropped when its size or mtime change.
+"""
+
+# Whole-file reads above this size are excerpted
+MAX_READ_BYTES = int(os.getenv("PAI_READ_MAX_BYTES", str(128 * 1024)))
+
+# Bytes kept from each end of an excerpted file
+EXCERPT_BYTES = int(os.getenv("PAI_READ_EXCERPT_BYTES", str(16 * 1024)))
+
+# Files at least this large are read through mmap
+MMAP_THRESHOLD = 1024 * 1024
+
+BINARY_SNIFF_BYTES = 8192
+CHUNK_BYTES = 1024 * 1024
+MAX_CACHED_INDEXES = 8
+
+def looks_binary(data: bytes) -> bool:
+    """Cheap binary check: NUL bytes in the first block."""
+    return b'\0' in data[:BINARY_SNIFF_BYTES]
+
+def parse_range(spec: str) -> tuple[int | None, int | None]:
+    """
+    Parses 'start-end', 'start-' or 'start' (1-based, inclusive).
+
+    Raises:
+        ValueError: If the range is malformed or empty.
+    """
+    spec = spec.strip().replace(' ', '')
+    if not spec:
+        return None, None
+    if '-' in spec:
+        head, _, tail = spec.partition('-')
+        start = int(head) if head else 1
+        end = int(tail) if tail else None
+    else:
+        start, end = int(spec), None
+    if start < 1 or (end is not None and end < start):
+        raise ValueError(f"invalid line range '{spec}'")
+    return start, end
+
+class LineIndex:
+    """
+    Sparse line index of a mapped file: 'counts[i]' is the number of newlines
+    before chunk i. Locating a line scans at most one chunk.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        counts = [0]
+        for offset in range(0, self.size, CHUNK_BYTES):
+            counts.append(counts[-1] + data[offset:offset + CHUNK_BYTES].count(b'\n'))
+        self.counts = counts
+        newlines = counts[-1]
+        # A final line without a trailing newline still counts as a line
+        self.total_lines = newlines + (1 if self.size and data[self.size - 1:self.size] != b'\n' else 0)
+
+    def offset(self, line: int) -> int:
+        """Byte offset where 1-based 'line' starts (file size if past the end)."""
+        if line <= 1:
+            return 0
+        wanted = line - 1  # newlines that precede the line
+        if wanted > self.counts[-1]:
+            return self.size
+        chunk = bisect_left(self.counts, wanted) - 1
+        position = chunk * CHUNK_BYTES
+        remaining = wanted - self.counts[chunk]
+        while remaining:
+            position = self.data.find(b'\n', position) + 1
+            remaining -= 1
+        return position
+
+_index_lock = threading.Lock()
+_indexes = OrderedDict()  # path -> (size, mtime_ns, mmap, LineIndex)
+
+def _line_index(full_path: str, stat) -> LineIndex:
+    """Cached LineIndex for a large file, rebuilt when size or mtime change."""
+    with _index_lock:
+        cached = _indexes.get(full_path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            _indexes.move_to_end(full_path)
+            return cached[3]
+        if cached:
+            cached[2].close()
+            del _indexes[full_path]
+    with open(full_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    index = LineIndex(mapped)
+    with _index_lock:
+        _indexes[full_path] = (stat.st_size, stat.st_mtime_ns, mapped, index)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _, (_, _, old_map, _) = _indexes.popitem(last=False)
+            old_map.close()
+    return index
+
+def _excerpt(data, size: int, total_lines: int | None, max_bytes: int) -> str:
+    """Head and tail of 'data' cut at line boundaries, with an omission note."""
+    half = min(EXCERPT_BYTES, max_bytes // 2)
+    head = bytes(data[:half])
+    head = head[:head.rfind(b'\n') + 1] or head
+    tail = bytes(data[max(size - half, 0):size])
+    tail = tail[tail.find(b'\n') + 1:] if b'\n' in tail else tail
+    omitted = size - len(head) - len(tail)
+    lines_note = f" of {total_lines} lines" if total_lines else ""
+    note = (f"\n... [{omitted} bytes omitted{lines_note}; "
+            f"use READ::path::start-end for a specific range] ...\n")
+    return head.decode('utf-8', errors='replace') + note + tail.decode('utf-8', errors='replace')
+
+def _line_start(data: bytes, number: int, pos: int = 0) -> int:
+    """Offset of the line 'number' lines after the one starting at 'pos' (1 = that line)."""
+    for _ in range(number - 1):
+        pos = data.find(b'\n', pos) + 1
+        if not pos:
+            return len(data)
+    return pos
+
+def read_text(full_path: str, start: int = None, end: int = None, max_bytes: int = MAX_READ_BYTES,
+              as_bytes: bool = False) -> dict:
+    """
+    Reads a file, or a line range of it, for display and prompts.
+
+    Returns:
+        A dict with 'text' (UTF-8 bytes instead of str if 'as_bytes'),
+        'binary', 'size', 'start' and 'end' (the line range returned, None
+        for a whole-file read), 'total_lines' (None if unknown) and
+        'excerpted' (True if the middle was left out).
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    stat = os.stat(full_path)
+    size = stat.st_size
+    result = {"text": b"" if as_bytes else "", "binary": False, "size": size, "start": None, "end": None,
+              "total_lines": None, "excerpted": False}
+
+    with open(full_path, 'rb') as f:
+        sniff = f.read(BINARY_SNIFF_BYTES)
+        if looks_binary(sniff):
+            result["binary"] = True
+            return result
+        if size < MMAP_THRESHOLD:
+            data = sniff + f.read()
+            index = None
+        else:
+            data = None
+    if data is None:
+        index = _line_index(full_path, stat)
+        data = index.data
+
+    if start is None:
+        if size <= max_bytes:
+            # bytes(data) does not copy data that is already bytes
+            result["text"] = bytes(data) if as_bytes else bytes(data).decode('utf-8', errors='replace')
+            return result
+        total = index.total_lines if index else data.count(b'\n') + 1
+        result["total_lines"] = total
+        result["excerpted"] = True
+        text = _excerpt(data, size, total, max_bytes)
+        result["text"] = text.encode('utf-8') if as_bytes else text
+        return result
+
+    if index is None:
+        # Line offsets are found on the bytes; only the range is decoded
+        total = data.count(b'\n') + (1 if data and not data.endswith(b'\n') else 0)
+        last = total if end is None else min(end, total)
+        lo = _line_start(data, start)
+        hi = _line_start(data, last - start + 2, lo) if last >= start else lo
+    else:
+        total = index.total_lines
+        last = total if end is None else min(end, total)
+        lo = index.offset(start)
+        hi = index.offset(last + 1) if last >= start else lo
+    selected = bytes(data[lo:hi])
+    # Only the newline ending the last line; blank lines in the range stay
+    if selected.endswith(b'\n'):
+        selected = selected[:-1]
+
+    result.update({"start": start, "end": max(last, start - 1), "total_lines": total})
+    if len(selected) > max_bytes:
+        result["excerpted"] = True
+        selected = _excerpt(selected, len(selected), None, max_bytes).encode('utf-8')
+    result["text"] = selected if as_bytes else selected.decode('utf-8', errors='replace')
+    return result
@@ -0,0 +1,218 @@
+import os
+import re
+import ast
+from . import symbols, search
+
+"""
+regions.py
+----------
+This module supports region-targeted MODIFY on large files. Instead of
+sending the whole file to the model and asking for the whole file back, the
+agent sends only the regions the change is about, with a few read-only
+context lines around each, and splices the regenerated regions back in.
+
+Regions come from, in order of preference:
+1. a line range in the command (MODIFY::path::120-180::description),
+2. definitions named in the description (the symbol extractors; Python
+   definitions span to their last line via 'ast'),
+3. lines matching the description's rarest terms, grown into windows.
+
+Files below REGION_MIN_LINES, or changes whose regions would cover most of
+the file, keep the whole-file MODIFY.
+"""
+
+# Files with at least this many lines are modified region by region
+REGION_MIN_LINES = int(os.getenv("PAI_REGION_MIN_LINES", "400"))
+# Read-only lines shown before and after each region
+CONTEXT_LINES = int(os.getenv("PAI_REGION_CONTEXT", "15"))
+MAX_REGIONS = 4
+# Lines around a term hit that make up its region
+HIT_WINDOW = 25
+# Above this share of the file, a whole-file MODIFY is no more expensive
+MAX_REGION_FRACTION = 0.5
+
+_REGION_RESPONSE = re.compile(r'^<<<REGION (\d+)>>>[ \t]*\n(.*?)^<<<END>>>[ \t]*$', re.M | re.S)
+
+def _python_spans(text: str) -> list[tuple[str, int, int]]:
+    """(qualified name, first line, last line) of each definition; decorators included."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    spans = []
+
+    def visit(node, prefix: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                spans.append((prefix + child.name, start, child.end_lineno))
+                visit(child, prefix + child.name + '.')
+            elif not prefix and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        spans.append((target.id, child.lineno, child.end_lineno))
+
+    visit(tree, '')
+    return spans
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+def _heuristic_spans(rel_path: str, text: str, lines: list[str]) -> list[tuple[str, int, int]]:
+    """
+    Spans for the regex-based languages: a definition runs until the first
+    line indented no deeper than itself, which is included when it closes
+    the block ('}', ')', ']' or '</...').
+    """
+    found = symbols.extract_symbols(rel_path, text)
+    spans = []
+    for name, line, _kind in found:
+        depth = _indent(lines[line - 1])
+        end = line
+        for number in range(line + 1, len(lines) + 1):
+            current = lines[number - 1]
+            if not current.strip():
+                continue
+            if _indent(current) <= depth:
+                if current.lstrip().startswith(('}', ')', ']', '</')):
+                    end = number
+                break
+            end = number
+        spans.append((name, line, end))
+    return spans
+
+def _symbol_regions(rel_path: str, text: str, lines: list[str], description: str) -> list[tuple[int, int]]:
+    """Spans of the definitions the description names, innermost only."""
+    words = set(re.findall(r'[A-Za-z_$][\w$.-]*', description))
+    words |= {w.rsplit('.', 1)[-1] for w in words}
+    if rel_path.lower().endswith(('.py', '.pyi')):
+        # Parsing is the expensive part; skip it when no named word is defined
+        names = '|'.join(re.escape(w) for w in sorted(words) if len(w) >= 3 and '.' not in w)
+        if not names or not re.search(rf'^\s*(?:(?:async\s+)?def|class)\s+(?:{names})\b|^(?:{names})\s*[:=]', text, re.M):
+            return []
+        spans = _python_spans(text)
+    else:
+        spans = _heuristic_spans(rel_path, text, lines)
+    matched = []
+    for name, start, end in spans:
+        short = name.rsplit('.', 1)[-1]
+        if len(short) >= 3 and (name in words or short in words):
+            # 'Cart.add' or 'add_item' clearly names a definition; 'add' may be just a word
+            strong = ('.' in name and name in words) or not short.islower() or not short.isalpha()
+            matched.append((start, end, strong))
+    # A class that contains a clearly named method is not sent as a whole
+    return [(start, end) for start, end, strong in matched
+            if not any((o_start, o_end) != (start, end) and start <= o_start and o_end <= end and (o_strong or not strong)
+                       for o_start, o_end, o_strong in matched)]
+
+def _hit_regions(lines: list[str], description: str) -> list[tuple[int, int]]:
+    """Windows around the lines that best match the description's terms."""
+    terms = set(search.tokenize(description))
+    if not terms:
+        return []
+    hits = {}
+    frequency = dict.fromkeys(terms, 0)
+    # Substring prefilter: only lines that can contain a term are tokenized
+    candidate = re.compile('|'.join(map(re.escape, sorted(terms))), re.I)
+    for number, line in enumerate(lines, 1):
+        if not candidate.search(line):
+            continue
+        present = terms.intersection(search.tokenize(line))
+        if present:
+            hits[number] = present
+            for term in present:
+                frequency[term] += 1
+    if not hits:
+        return []
+    # Rare terms identify the place; terms on most lines say nothing
+    weight = {term: 1.0 / count for term, count in frequency.items() if count}
+    scored = sorted(hits, key=lambda n: -sum(weight[t] for t in hits[n]))
+    best = sum(weight[t] for t in hits[scored[0]])
+    regions = []
+    for number in scored:
+        if len(regions) == MAX_REGIONS or sum(weight[t] for t in hits[number]) < best / 2:
+            break
+        if any(start <= number <= end for start, end in regions):
+            continue
+        regions.append((max(1, number - HIT_WINDOW // 2), min(len(lines), number + HIT_WINDOW // 2)))
+    return regions
+
+def merge_regions(regions: list[tuple[int, int]], gap: int = 0) -> list[tuple[int, int]]:
+    """Sorted regions with overlapping (or nearly adjacent) ones joined."""
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1] + gap + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def find_regions(rel_path: str, text: str, description: str, line_range: tuple = None) -> list[tuple[int, int]]:
+    """
+    1-based inclusive (start, end) line regions to modify, or [] when the
+    whole file should be sent instead. An explicit 'line_range' is used as
+    given, unless it is open-ended (end None) and covers more than
+    MAX_REGION_FRACTION of the file.
+    """
+    lines = text.split('\n')
+    total = len(lines)
+    if line_range and line_range[0] is not None:
+        start, end = line_range
+        if start > total:
+            return []
+        if end is None and total - start + 1 > total * MAX_REGION_FRACTION:
+            return []  # open-ended range over most of the file: send it whole
+        return [(start, min(end or total, total))]
+    if total < REGION_MIN_LINES:
+        return []
+    regions = _symbol_regions(rel_path, text, lines, description) or _hit_regions(lines, description)
+    regions = merge_regions(regions, gap=CONTEXT_LINES)
+    if not regions or len(regions) > MAX_REGIONS:
+        return []
+    if sum(end - start + 1 for start, end in regions) > total * MAX_REGION_FRACTION:
+        return []
+    return regions
+
+def render_regions(text: str, regions: list[tuple[int, int]]) -> str:
+    """The regions, numbered, each between read-only context lines."""
+    lines = text.split('\n')
+    parts = []
+    for number, (start, end) in enumerate(regions, 1):
+        before = lines[max(0, start - 1 - CONTEXT_LINES):start - 1]
+        after = lines[end:end + CONTEXT_LINES]
+        block = [f"REGION {number} (lines {start}-{end})"]
+        if before:
+            block.append("context before (read-only):")
+            block.extend(before)
+        block.append(f"<<<REGION {number}>>>")
+        block.extend(lines[start - 1:end])
+        block.append("<<<END>>>")
+        if after:
+            block.append("context after (read-only):")
+            block.extend(after)
+        parts.append("\n".join(block))
+    return "\n\n".join(parts)
+
+def splice_regions(text: str, regions: list[tuple[int, int]], response: str) -> str | None:
+    """
+    The file with the regions the model returned replaced; regions left out
+    of the response are unchanged. None when the response has no region.
+    """
+    replacements = {}
+    for match in _REGION_RESPONSE.finditer(response):
+        number = int(match.group(1))
+        if 1 <= number <= len(regions):
+            replacements[number] = match.group(2)
+    if not replacements:
+        return None
+    lines = text.split('\n')
+    # From the last region up, so earlier line numbers stay valid
+    for number in sorted(replacements, reverse=True):
+        start, end = regions[number - 1]
+        body = replacements[number]
+        new_lines = body[:-1].split('\n') if body.endswith('\n') else body.split('\n')
+        if body == "":
+            new_lines = []
+        lines[start - 1:end] = new_lines
+    return '\n'.join(lines)
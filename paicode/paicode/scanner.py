@@ -0,0 +1,139 @@
+import os
+import threading
+from . import workspace
+
+"""
+scanner.py
+----------
+This module runs the workspace scan shared by the content indexes: the
+summary cache, the search index, the symbol index and the grep index. The
+scan walks the workspace once, stats each file once and, for a file that
+some index considers changed, reads it once with the largest limit any of
+them asked for. Each index then gets its own head of the same bytes.
+
+Indexes subclass ScannedIndex and say how much of a changed file they need
+(read_limit) and what to do with it (index_content). A single index can
+still refresh on its own; it goes through the same scan.
+"""
+
+class ScannedIndex:
+    """
+    Base for the indexes fed by the shared scan.
+
+    read_limit() returns None when the index is up to date for a file, or
+    the number of bytes it needs (0 when it only records the stat).
+    """
+
+    def __init__(self):
+        self._thread = None
+
+    def read_limit(self, rel_path: str, stat: os.stat_result) -> int | None:
+        raise NotImplementedError
+
+    def index_content(self, rel_path: str, stat: os.stat_result, data: bytes) -> bool:
+        """Indexes the first read_limit() bytes of a file. Returns True if it changed."""
+        raise NotImplementedError
+
+    def indexed_paths(self) -> list[str]:
+        raise NotImplementedError
+
+    def remove_path(self, rel_path: str):
+        raise NotImplementedError
+
+    def scan_started(self):
+        """Called before a scan feeds this index."""
+
+    def scan_finished(self, changed: int, stale: int):
+        """Called after a scan, with the files re-indexed and the stale paths dropped."""
+
+    def update_file(self, rel_path: str) -> bool:
+        """Indexes or re-indexes one file if it changed. Returns True if it did."""
+        return bool(update_path([self], rel_path))
+
+    def refresh(self) -> int:
+        """Brings the index in line with the workspace. Returns files re-indexed."""
+        return scan([self])[self]
+
+    def start_background_refresh(self) -> threading.Thread:
+        """Runs refresh() on a daemon thread; returns the thread."""
+        return start_background_scan([self])
+
+def read_head(full_path: str, limit: int) -> bytes | None:
+    """Reads up to 'limit' bytes of a file; None if it cannot be read."""
+    if limit <= 0:
+        return b""
+    try:
+        with open(full_path, 'rb') as f:
+            return f.read(limit)
+    except OSError:
+        return None
+
+def update_path(indexes: list[ScannedIndex], rel_path: str) -> list[ScannedIndex]:
+    """
+    Brings one file up to date in every index, reading it at most once.
+    Returns the indexes that re-indexed it.
+    """
+    full_path = os.path.join(workspace.PROJECT_ROOT, rel_path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        for index in indexes:
+            index.remove_path(rel_path)
+        return []
+
+    limits = {}
+    for index in indexes:
+        limit = index.read_limit(rel_path, stat)
+        if limit is not None:
+            limits[index] = limit
+    if not limits:
+        return []
+
+    data = read_head(full_path, max(limits.values()))
+    if data is None:
+        return []
+    # Slicing past the end returns the same bytes object, so indexes that
+    # want the whole file share one buffer
+    return [index for index, limit in limits.items() if index.index_content(rel_path, stat, data[:limit])]
+
+def scan(indexes: list[ScannedIndex]) -> dict:
+    """
+    Walks the workspace once for all the given indexes and drops the paths
+    that no longer exist. Returns index -> files re-indexed.
+    """
+    changed = {index: 0 for index in indexes}
+    seen = set()
+    complete = False
+    for index in indexes:
+        index.scan_started()
+    try:
+        for rel_path in workspace.iter_files('.'):
+            seen.add(rel_path)
+            for index in update_path(indexes, rel_path):
+                changed[index] += 1
+        complete = True
+    finally:
+        for index in indexes:
+            # An interrupted walk has not seen everything: keep what is indexed
+            stale = [p for p in index.indexed_paths() if p not in seen] if complete else []
+            for path in stale:
+                index.remove_path(path)
+            index.scan_finished(changed[index], len(stale))
+    return changed
+
+_scan_lock = threading.Lock()
+
+def start_background_scan(indexes: list[ScannedIndex]) -> threading.Thread:
+    """
+    Runs one scan for the given indexes on a daemon thread and returns it.
+    Indexes already being refreshed are left to their running scan.
+    """
+    with _scan_lock:
+        pending = [index for index in indexes if not (index._thread and index._thread.is_alive())]
+        if not pending:
+            return indexes[0]._thread
+        thread = threading.Thread(target=scan, args=(pending,), name="pai-scan", daemon=True)
+        for index in pending:
+            index._thread = thread
+        thread.start()
+    return thread
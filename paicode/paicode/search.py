@@ -0,0 +1,266 @@
+import os
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from . import workspace
+from .scanner import ScannedIndex
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+"""
+search.py
+---------
+This module provides a BM25 relevance index over the workspace files. Each
+file is indexed by its path tokens, identifiers (split on snake_case and
+camelCase) and text content, in an incremental inverted index built on top of
+the workspace module. Changes made through the workspace are applied to the
+index as they happen, and a refresh only re-reads files whose size or mtime
+changed. Files are read by the shared workspace scan (scanner.py).
+
+The planning prompt uses it to list the top-K files relevant to the user
+request instead of the whole tree, and the agent exposes it as SEARCH::query.
+Scoring is vectorized with NumPy when it is installed and falls back to plain
+Python otherwise.
+"""
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Path tokens weigh more than body tokens: a match in the file name is a
+# much stronger signal than a mention somewhere in the content.
+PATH_WEIGHT = 3
+
+# Only the head of each file is indexed to keep cold builds cheap
+MAX_INDEX_BYTES = int(os.getenv("PAI_SEARCH_MAX_BYTES", str(64 * 1024)))
+
+DEFAULT_TOP_K = 10
+
+_WORD_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+_CAMEL_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+')
+
+_STOPWORDS = {
+    'the', 'and', 'for', 'with', 'this', 'that', 'from', 'into', 'are', 'was',
+    'not', 'but', 'you', 'your', 'have', 'has', 'can', 'will', 'all', 'any',
+    'self', 'return', 'import', 'def', 'class', 'if', 'else', 'in', 'is', 'of',
+    'to', 'a', 'an', 'or', 'on', 'as', 'it', 'be', 'by', 'at', 'none', 'true',
+    'false', 'var', 'let', 'const', 'function', 'yang', 'dan', 'di', 'ke', 'untuk',
+}
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase search terms. Identifiers yield both the whole
+    name and its snake_case/camelCase parts ('getUserName' -> getusername,
+    get, user, name).
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text):
+        lower = word.lower()
+        if len(lower) > 1 and lower not in _STOPWORDS:
+            terms.append(lower)
+        if '_' in word or not (word.islower() or word.isupper()):
+            for piece in word.split('_'):
+                for part in _CAMEL_PATTERN.findall(piece):
+                    part = part.lower()
+                    if len(part) > 1 and part != lower and part not in _STOPWORDS:
+                        terms.append(part)
+    return terms
+
+def _path_terms(rel_path: str) -> list[str]:
+    """Terms for the path itself: directory names, stem and extension."""
+    return tokenize(rel_path.replace('/', ' ').replace('.', ' ').replace('-', ' '))
+
+class SearchIndex(ScannedIndex):
+    """
+    Incremental BM25 inverted index.
+
+    Documents get stable integer ids; removed documents free their postings
+    and keep a zero length so the id space never has to be compacted.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.doc_ids = {}        # path -> doc id
+        self.doc_paths = []      # doc id -> path (None when removed)
+        self.doc_stats = []      # doc id -> (size, mtime)
+        self.doc_terms = []      # doc id -> Counter of term frequencies
+        self.doc_len = []        # doc id -> weighted length
+        self.postings = {}       # term -> {doc id: tf}
+        self.total_len = 0
+        self.live_docs = 0
+        self._arrays = {}        # term -> (ids array, tf array), NumPy cache
+        self._len_array = None
+        self._ready = threading.Event()
+
+    # --- maintenance -----------------------------------------------------
+
+    def _content_terms(self, rel_path: str, data: bytes) -> Counter:
+        terms = Counter()
+        for term in _path_terms(rel_path):
+            terms[term] += PATH_WEIGHT
+        if b'\0' not in data[:8192]:
+            terms.update(tokenize(data.decode('utf-8', errors='ignore')))
+        return terms
+
+    def _drop_doc(self, doc_id: int):
+        for term in self.doc_terms[doc_id]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+                self._arrays.pop(term, None)
+        self.total_len -= self.doc_len[doc_id]
+        self.doc_terms[doc_id] = Counter()
+        self.doc_len[doc_id] = 0
+
+    def read_limit(self, rel_path: str, stat: os.stat_result) -> int | None:
+        with self.lock:
+            doc_id = self.doc_ids.get(rel_path)
+            if doc_id is not None and self.doc_stats[doc_id] == (stat.st_size, stat.st_mtime):
+                return None
+        return MAX_INDEX_BYTES
+
+    def index_content(self, rel_path: str, stat: os.stat_result, data: bytes) -> bool:
+        terms = self._content_terms(rel_path, data)
+        with self.lock:
+            doc_id = self.doc_ids.get(rel_path)
+            if doc_id is None:
+                doc_id = len(self.doc_paths)
+                self.doc_ids[rel_path] = doc_id
+                self.doc_paths.append(rel_path)
+                self.doc_stats.append(None)
+                self.doc_terms.append(Counter())
+                self.doc_len.append(0)
+                self.live_docs += 1
+            else:
+                self._drop_doc(doc_id)
+
+            length = sum(terms.values())
+            self.doc_stats[doc_id] = (stat.st_size, stat.st_mtime)
+            self.doc_terms[doc_id] = terms
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+                self._arrays.pop(term, None)
+            self._len_array = None
+        return True
+
+    def remove_path(self, rel_path: str):
+        """Removes a file, or every file below a directory, from the index."""
+        prefix = rel_path.rstrip('/') + '/'
+        with self.lock:
+            targets = [p for p in self.doc_ids if p == rel_path or p.startswith(prefix)]
+            for path in targets:
+                doc_id = self.doc_ids.pop(path)
+                self._drop_doc(doc_id)
+                self.doc_paths[doc_id] = None
+                self.doc_stats[doc_id] = None
+                self.live_docs -= 1
+            if targets:
+                self._len_array = None
+
+    def on_workspace_change(self, rel_path: str, kind: str):
+        """Change listener registered with the workspace module."""
+        if kind == 'delete':
+            self.remove_path(rel_path)
+        elif os.path.isdir(os.path.join(workspace.PROJECT_ROOT, rel_path)):
+            for file_path in workspace.iter_files(rel_path):
+                self.update_file(file_path)
+        else:
+            self.update_file(rel_path)
+
+    def indexed_paths(self) -> list[str]:
+        with self.lock:
+            return list(self.doc_ids)
+
+    def scan_finished(self, changed: int, stale: int):
+        self._ready.set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Waits until at least one full refresh has completed."""
+        return self._ready.wait(timeout)
+
+    # --- querying --------------------------------------------------------
+
+    def _idf(self, df: int) -> float:
+        return math.log(1.0 + (self.live_docs - df + 0.5) / (df + 0.5))
+
+    def _score_numpy(self, terms: list[str], top_k: int):
+        n = len(self.doc_paths)
+        if self._len_array is None or len(self._len_array) != n:
+            self._len_array = np.asarray(self.doc_len, dtype=np.float32)
+        avgdl = self.total_len / max(1, self.live_docs)
+        norm = K1 * (1.0 - B + B * self._len_array / max(avgdl, 1e-9))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            arrays = self._arrays.get(term)
+            if arrays is None:
+                ids = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+                tfs = np.fromiter(posting.values(), dtype=np.float32, count=len(posting))
+                arrays = self._arrays[term] = (ids, tfs)
+            ids, tfs = arrays
+            scores[ids] += self._idf(len(posting)) * tfs * (K1 + 1.0) / (tfs + norm[ids])
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            # Partial selection keeps ranking O(n) instead of sorting every hit
+            keep = np.argpartition(scores[candidates], -top_k)[-top_k:]
+            candidates = candidates[keep]
+        return [(int(i), float(scores[i])) for i in candidates]
+
+    def _score_python(self, terms: list[str], top_k: int):
+        avgdl = self.total_len / max(1, self.live_docs)
+        scores = {}
+        for term in terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self._idf(len(posting))
+            for doc_id, tf in posting.items():
+                norm = K1 * (1.0 - B + B * self.doc_len[doc_id] / max(avgdl, 1e-9))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1.0) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> list[tuple[str, float]]:
+        """
+        Returns up to top_k (path, score) pairs ranked by BM25 relevance.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self.lock:
+            if not self.live_docs:
+                return []
+            if NUMPY_AVAILABLE:
+                scored = self._score_numpy(terms, top_k)
+            else:
+                scored = self._score_python(terms, top_k)
+            scored.sort(key=lambda item: (-item[1], self.doc_paths[item[0]]))
+            return [(self.doc_paths[doc_id], score) for doc_id, score in scored[:top_k]]
+
+    def render_for_prompt(self, query: str, top_k: int = DEFAULT_TOP_K) -> str:
+        """Newline-separated top-K paths for the planning prompt."""
+        results = self.search(query, top_k)
+        return "\n".join(f"{path} (score {score:.1f})" for path, score in results)
+
+# Session-wide index instance, created lazily
+_index = None
+
+def get_index() -> SearchIndex:
+    """Returns the shared search index, registered for workspace changes."""
+    global _index
+    if _index is None:
+        _index = SearchIndex()
+        workspace.add_change_listener(_index.on_workspace_change)
+    return _index
@@ -0,0 +1,519 @@
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import atexit
+import hashlib
+import threading
+from datetime import datetime
+from . import blobs
+
+"""
+sessionlog.py
+-------------
+This module writes the session logs in '.pai_history' as JSON Lines, one
+record per event: {"ts": <epoch seconds>, "type": "USER_INPUT", "data": {...}}.
+
+Logging never touches the disk on the caller's thread: log() only queues the
+event, and a background writer serializes queued events in batches (flushed
+every PAI_LOG_FLUSH_SECONDS or when a batch is full) through one open file
+handle. Timestamps are formatted only when a log is rendered.
+
+- Large strings (e.g. the content returned by READ) are stored once as
+  gzip-compressed, content-addressed blobs in 'blobs/' and the record keeps
+  a {"$blob": <sha256>, "bytes": <size>} reference, so reading the same file
+  repeatedly costs one copy on disk.
+- A session is written in parts ('session_<id>.001.jsonl', ...): once a part
+  reaches PAI_LOG_MAX_BYTES the writer starts the next one and gzips the full
+  part. Parts of other sessions left uncompressed are gzipped once they
+  have been idle for an hour and their session is no longer running: while
+  its log is open, a session keeps 'session_<id>.lock' holding its pid.
+
+Sinks registered with add_sink() get every written batch on the writer
+thread (historydb.py indexes events this way). The reading side
+(iter_records, render_session) resolves blob references and rebuilds the
+human-readable text format of the earlier '.log' files.
+"""
+
+# Seconds between batched writes, and the most events written per batch
+FLUSH_INTERVAL = float(os.getenv("PAI_LOG_FLUSH_SECONDS", "0.5"))
+MAX_BATCH = 256
+
+# A session part is rotated (and gzipped) once it reaches this size
+MAX_PART_BYTES = int(os.getenv("PAI_LOG_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Strings at least this long are stored as blobs instead of inline
+BLOB_MIN_BYTES = int(os.getenv("PAI_LOG_BLOB_BYTES", "2048"))
+
+# Parts of other sessions are compressed after being idle this long
+COMPRESS_IDLE_SECONDS = 3600
+
+BLOB_DIR_NAME = "blobs"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+PART_PATTERN = re.compile(r'^(session_.+)\.(\d{3,})\.jsonl(\.gz)?$')
+
+def part_path(base_path: str, number: int) -> str:
+    """Path of part 'number' of the session whose log base path is 'base_path'."""
+    return f"{base_path}.{number:03d}.jsonl"
+
+def lock_path(base_path: str) -> str:
+    """Path of the file marking the session's log as open."""
+    return base_path + ".lock"
+
+def session_running(base_path: str) -> bool:
+    """True if the session's lock file names a process that is still alive."""
+    try:
+        with open(lock_path(base_path), 'r', encoding='utf-8') as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        return True  # no safe liveness check: a locked session counts as running
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False  # left behind by a crashed session
+    except OSError:
+        pass  # alive, owned by another user
+    return True
+
+def session_parts(base_path: str) -> list[str]:
+    """
+    Existing parts of a session in order. A part present both plain and
+    gzipped (compression in progress) is returned once, uncompressed.
+    """
+    directory, prefix = os.path.split(base_path)
+    parts = {}
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        return []
+    for name in names:
+        match = PART_PATTERN.match(name)
+        if not match or match.group(1) != prefix:
+            continue
+        number = int(match.group(2))
+        if number not in parts or not match.group(3):
+            parts[number] = os.path.join(directory, name)
+    return [parts[number] for number in sorted(parts)]
+
+def gzip_file(path: str) -> str | None:
+    """Compresses 'path' to 'path.gz' (atomically) and removes it; returns the new path."""
+    target = path + ".gz"
+    tmp_path = target + ".tmp"
+    try:
+        with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(tmp_path, target)
+        os.remove(path)
+        return target
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+class SessionLog:
+    """
+    Background JSONL writer for one session.
+
+    Args:
+        base_path: Session log path without the part suffix, e.g.
+            '.pai_history/session_20250101_120000'.
+        flush_interval: Seconds queued events may wait before being written.
+        max_part_bytes: Size at which the current part is rotated.
+    """
+
+    def __init__(self, base_path: str, flush_interval: float = FLUSH_INTERVAL,
+                 max_part_bytes: int = MAX_PART_BYTES):
+        self.base_path = base_path
+        self.directory = os.path.dirname(base_path) or '.'
+        self.blob_dir = os.path.join(self.directory, BLOB_DIR_NAME)
+        self.flush_interval = flush_interval
+        self.max_part_bytes = max_part_bytes
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._size = 0
+        self._part = 0
+        self._known_blobs = set()
+        self._sinks = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pai-sessionlog", daemon=True)
+        self._thread.start()
+
+    # --- Producer side -----------------------------------------------------
+
+    def log(self, event_type: str, data: dict):
+        """Queues an event. 'data' must not be modified after it is logged."""
+        if not self._closed:
+            self._queue.put((time.time(), event_type, data))
+
+    def add_sink(self, callback):
+        """
+        Registers a callback that receives every written batch as a list of
+        (ts, event_type, data) tuples, on the writer thread.
+        """
+        self._sinks.append(callback)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until every event queued so far is on disk."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Writes the remaining events and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # --- Writer thread -----------------------------------------------------
+
+    def _run(self):
+        self._write_lock()
+        self._open_part()
+        self._compress_idle_parts()
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break  # flush requested: write what is queued now
+                batch.append(item)
+                if len(batch) >= MAX_BATCH:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+                for sink in list(self._sinks):
+                    try:
+                        sink(batch)
+                    except Exception:
+                        pass  # a failing sink must not stop the log
+            for waiter in waiters:
+                waiter.set()
+        if self._file:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(lock_path(self.base_path))
+        except OSError:
+            pass
+
+    def _write_lock(self):
+        """Marks the session as running for the idle-part compression of other sessions."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = lock_path(self.base_path) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(str(os.getpid()))
+            os.replace(tmp_path, lock_path(self.base_path))
+        except OSError:
+            pass
+
+    def _open_part(self):
+        """Continues the last uncompressed part of this session or starts a new one."""
+        parts = session_parts(self.base_path)
+        if parts:
+            last = int(PART_PATTERN.match(os.path.basename(parts[-1])).group(2))
+            self._part = last if parts[-1].endswith(".jsonl") else last + 1
+        else:
+            self._part = 1
+        try:
+            self._file = open(part_path(self.base_path, self._part), 'a', encoding='utf-8')
+            self._size = self._file.tell()
+        except OSError:
+            self._file = None  # events are dropped; logging must never break the session
+
+    def _compress_idle_parts(self):
+        """
+        Gzips uncompressed parts of other sessions that are no longer written:
+        idle for COMPRESS_IDLE_SECONDS and not locked by a running session (a
+        long quiet session still appends to its part).
+        """
+        own_session = os.path.basename(self.base_path)
+        cutoff = time.time() - COMPRESS_IDLE_SECONDS
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        running = {}
+        for name in names:
+            match = PART_PATTERN.match(name)
+            if not match or match.group(3) or match.group(1) == own_session:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+            except OSError:
+                continue
+            session = match.group(1)
+            if session not in running:
+                running[session] = session_running(os.path.join(self.directory, session))
+            if not running[session]:
+                gzip_file(path)
+
+    def _store_blob(self, parts: tuple) -> dict:
+        """Stores the concatenation of the byte strings 'parts' without joining them."""
+        hasher = hashlib.sha256()
+        for part in parts:
+            hasher.update(part)
+        digest = hasher.hexdigest()
+        if digest not in self._known_blobs:
+            path = blob_path(self.blob_dir, digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp"
+                with gzip.open(tmp_path, 'wb') as f:
+                    for part in parts:
+                        f.write(part)
+                os.replace(tmp_path, path)
+            self._known_blobs.add(digest)
+        return {"$blob": digest, "bytes": sum(len(part) for part in parts)}
+
+    def _externalize(self, value):
+        """Copy of 'value' with long strings (and blob outputs) replaced by blob references."""
+        if isinstance(value, blobs.Output):
+            # Same digest as the joined string, so earlier blobs are reused
+            return self._store_blob(value.parts()) if len(value) >= BLOB_MIN_BYTES else str(value)
+        if isinstance(value, str):
+            return self._store_blob((value.encode('utf-8'),)) if len(value) >= BLOB_MIN_BYTES else value
+        if isinstance(value, dict):
+            return {key: self._externalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._externalize(item) for item in value]
+        return value
+
+    def _write(self, batch: list):
+        lines = []
+        for timestamp, event_type, data in batch:
+            try:
+                record = {"ts": round(timestamp, 3), "type": event_type, "data": self._externalize(data)}
+                lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str))
+            except (OSError, TypeError, ValueError):
+                continue  # a record that cannot be stored must not stop the log
+        if not lines or self._file is None:
+            return
+        chunk = "\n".join(lines) + "\n"
+        try:
+            self._file.write(chunk)
+            self._file.flush()
+        except OSError:
+            return
+        self._size += len(chunk.encode('utf-8'))
+        if self._size >= self.max_part_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Closes and gzips the full part, then starts the next one."""
+        self._file.close()
+        gzip_file(part_path(self.base_path, self._part))
+        self._part += 1
+        try:
+            self._file = open(part_path(self.base_path, self._part), 'a', encoding='utf-8')
+        except OSError:
+            self._file = None
+        self._size = 0
+
+_logs_lock = threading.Lock()
+_logs = {}
+
+def get_log(base_path: str) -> SessionLog:
+    """Returns the shared SessionLog for a session, starting its writer on first use."""
+    with _logs_lock:
+        log = _logs.get(base_path)
+        if log is None:
+            log = SessionLog(base_path)
+            _logs[base_path] = log
+        return log
+
+def close_log(base_path: str):
+    """Flushes and closes a session's log if it was opened."""
+    with _logs_lock:
+        log = _logs.pop(base_path, None)
+    if log is not None:
+        log.close()
+
+def close_all():
+    with _logs_lock:
+        logs = list(_logs.values())
+        _logs.clear()
+    for log in logs:
+        log.close()
+
+# Events still queued when the interpreter exits are written, not dropped
+atexit.register(close_all)
+
+# --- Reading ---------------------------------------------------------------
+
+def blob_path(blob_dir: str, digest: str) -> str:
+    return os.path.join(blob_dir, digest[:2], digest + ".gz")
+
+def load_blob(blob_dir: str, digest: str) -> str | None:
+    try:
+        with gzip.open(blob_path(blob_dir, digest), 'rb') as f:
+            return f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return None
+
+def resolve_blobs(value, blob_dir: str):
+    """Copy of 'value' with blob references replaced by their content."""
+    if isinstance(value, dict):
+        if "$blob" in value and len(value) <= 2:
+            content = load_blob(blob_dir, value["$blob"])
+            return content if content is not None else f"[missing blob {value['$blob'][:12]}]"
+        return {key: resolve_blobs(item, blob_dir) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_blobs(item, blob_dir) for item in value]
+    return value
+
+def read_part(path: str, offset: int = 0) -> tuple[list[dict], int]:
+    """
+    Records of one part (plain or gzipped) from byte 'offset' of its
+    uncompressed content.
+
+    Returns:
+        (records, end) where 'end' is the offset after the last complete line;
+        a partially written last line is left for the next read.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:end].splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records, offset + end
+
+def uncompressed_size(path: str) -> int:
+    """Size of a part's content; read from the gzip trailer for '.gz' parts."""
+    if not path.endswith(".gz"):
+        return os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), 'little')
+
+def iter_records(base_path: str, resolve: bool = True):
+    """Yields the records of every part of a session, oldest first."""
+    blob_dir = os.path.join(os.path.dirname(base_path) or '.', BLOB_DIR_NAME)
+    for path in session_parts(base_path):
+        try:
+            records, _ = read_part(path)
+        except OSError:
+            continue
+        for record in records:
+            yield resolve_blobs(record, blob_dir) if resolve else record
+
+def format_timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)
+
+def render_record(record: dict) -> str:
+    """
+    Renders one record (with blobs resolved) in the human-readable format of
+    the earlier text logs.
+    """
+    timestamp = format_timestamp(record.get("ts", 0))
+    event_type = record.get("type", "")
+    data = record.get("data") or {}
+
+    if event_type == "SESSION_START":
+        log_line = f"\n[{timestamp}] SESSION STARTED\n"
+        log_line += f"[{timestamp}] Working Directory: {data.get('working_directory', 'unknown')}\n"
+        log_line += f"[{timestamp}] Session ID: {data.get('session_id', 'unknown')}\n"
+
+    elif event_type == "USER_INPUT":
+        request = data.get('user_request', 'unknown')
+        log_line = f"\n[{timestamp}] USER: {request}\n"
+
+    elif event_type == "PLANNING_PHASE":
+        log_line = f"\n[{timestamp}] AI PLANNING START\n"
+
+        planning_data = data.get('planning_data', {})
+        analysis = planning_data.get('analysis', {})
+
+        log_line += f"[{timestamp}] Intent: {analysis.get('user_intent', 'Unknown')}\n"
+        log_line += f"[{timestamp}] Context Usage: {analysis.get('context_utilization', 'None')}\n"
+        log_line += f"[{timestamp}] Files to read: {analysis.get('files_to_read', [])}\n"
+        log_line += f"[{timestamp}] Files to create: {analysis.get('files_to_create', [])}\n"
+        log_line += f"[{timestamp}] Files to modify: {analysis.get('files_to_modify', [])}\n"
+
+        execution_plan = planning_data.get('execution_plan', {})
+        steps = execution_plan.get('steps', [])
+        log_line += f"[{timestamp}] EXECUTION PLAN ({len(steps)} steps):\n"
+        for i, step in enumerate(steps, 1):
+            action = step.get('action', 'Unknown')
+            target = step.get('target', '')
+            purpose = step.get('purpose', 'No purpose')
+            log_line += f"[{timestamp}]   {i}. {action} {target} - {purpose}\n"
+        log_line += f"[{timestamp}] AI PLANNING END\n"
+
+    elif event_type == "EXECUTION_PHASE":
+        log_line = f"\n[{timestamp}] AI EXECUTION START\n"
+
+        for cmd_data in data.get('commands', []):
+            cmd = cmd_data.get('command', 'Unknown')
+            target = cmd_data.get('target', '')
+            success = "SUCCESS" if cmd_data.get('success') else "FAILED"
+            output = cmd_data.get('output', '')
+
+            log_line += f"[{timestamp}] {success}: {cmd} {target}\n"
+            if output:
+                log_line += f"[{timestamp}] OUTPUT: {output}\n"
+        metrics = data.get('metrics')
+        if metrics:
+            log_line += f"[{timestamp}] METRICS: repeated_reads={metrics.get('repeated_reads', 0)} failed_modifies={metrics.get('failed_modifies', 0)}\n"
+        log_line += f"[{timestamp}] AI EXECUTION END\n"
+
+    elif event_type == "FINAL_STATUS":
+        status = data.get('status', 'unknown')
+        success_text = "SUCCESS" if data.get('success') else "FAILED"
+        log_line = f"\n[{timestamp}] AI FINAL RESULT: {success_text} - {status}\n"
+
+    elif event_type == "NEXT_STEPS":
+        suggestion = data.get('suggestion', '')
+        log_line = f"\n[{timestamp}] AI SUGGESTION: {suggestion}\n" if suggestion else ""
+
+    elif event_type == "INTERACTION":
+        # Interactions duplicate the structured events above
+        log_line = ""
+
+    else:
+        log_line = f"[{timestamp}] {event_type}: {json.dumps(data)}\n"
+
+    return log_line
+
+def render_session(base_path: str) -> str:
+    """The whole session in the human-readable text format."""
+    return "".join(render_record(record) for record in iter_records(base_path))
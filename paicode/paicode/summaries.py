@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from . import workspace, symbols
+from .scanner import ScannedIndex
+
+"""
+summaries.py
+------------
+This module maintains a persistent per-file summary cache for Pai Code. For
+every text file in the workspace it stores a one-line summary and a short list
+of top-level symbols in '.pai_cache/summaries.json', keyed by the SHA-1 of the
+file content. Only files whose content changed are summarized again; the
+files are read by the shared workspace scan (scanner.py).
+
+Summaries are derived locally (docstrings, leading comments, headings and
+definitions), so refreshing the cache never spends LLM calls. The planning
+prompt gets a budgeted rendering of the cache, letting the model target files
+directly instead of planning READ steps just to discover what they contain.
+"""
+
+CACHE_FILE = os.path.join(workspace.CACHE_DIR, "summaries.json")
+CACHE_VERSION = 2
+
+# Files larger than this are listed with a size note instead of being summarized
+MAX_SUMMARY_BYTES = 512 * 1024
+
+MAX_SUMMARY_CHARS = 100
+MAX_SYMBOLS = 12
+
+# Approximate token budget for the planning prompt section
+PROMPT_BUDGET_TOKENS = int(os.getenv("PAI_SUMMARY_BUDGET", "800"))
+
+_SUMMARY_PREFIXES = ('#!', '# -*-', '// @ts-', '/* eslint')
+
+def _is_binary(data: bytes) -> bool:
+    """Cheap binary check: NUL bytes in the first block."""
+    return b'\0' in data[:8192]
+
+def _extract_symbols(rel_path: str, text: str) -> list[str]:
+    """Top-level definitions from the symbol extractors, in file order."""
+    names = []
+    for name, _, kind in symbols.extract_symbols(rel_path, text):
+        # Methods, locals and module constants are too noisy for a summary
+        if '.' in name or kind in ('variable', 'method') or name.startswith('__'):
+            continue
+        if name not in names:
+            names.append(name)
+        if len(names) >= MAX_SYMBOLS:
+            break
+    return names
+
+_COMMENT_MARKERS = ('"""', "'''", '#', '//', '/*', '*', '<!--', '--', ';;')
+_TITLE_PATTERN = re.compile(r'<title>(.*?)</title>', re.IGNORECASE)
+
+def _extract_summary(text: str, file_name: str = "") -> str:
+    """First meaningful docstring, comment, heading or title of the file."""
+    title = _TITLE_PATTERN.search(text[:4096])
+    if title and title.group(1).strip():
+        return title.group(1).strip()[:MAX_SUMMARY_CHARS]
+
+    for raw_line in text.splitlines()[:40]:
+        line = raw_line.strip()
+        if not line.startswith(_COMMENT_MARKERS) or line.startswith(_SUMMARY_PREFIXES):
+            continue
+        line = line.strip('"\'`').lstrip('#/*-<!;> ').rstrip('*/->').strip()
+        # Skip separators, bare delimiters and "filename.py" banners
+        if len(line) < 4 or not re.search(r'[A-Za-z]{3}', line) or line == file_name:
+            continue
+        if len(line) > MAX_SUMMARY_CHARS:
+            line = line[:MAX_SUMMARY_CHARS - 3] + "..."
+        return line
+    return ""
+
+def summarize_content(data: bytes, rel_path: str = "") -> dict:
+    """Builds the cache entry payload (summary, symbols, lines) for file bytes."""
+    if _is_binary(data):
+        return {"summary": "binary file", "symbols": [], "lines": 0}
+    text = data.decode('utf-8', errors='replace')
+    return {
+        "summary": _extract_summary(text, os.path.basename(rel_path)),
+        "symbols": _extract_symbols(rel_path, text),
+        "lines": text.count('\n') + (1 if text and not text.endswith('\n') else 0),
+    }
+
+class SummaryCache(ScannedIndex):
+    """
+    Content-hash keyed summary cache persisted in '.pai_cache'.
+
+    'files' maps relative path -> {hash, size, mtime, summary, symbols, lines}.
+    Size and mtime only avoid re-hashing unchanged files; the content hash
+    decides whether a file gets summarized again.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        super().__init__()
+        self.cache_file = cache_file
+        self.files = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION and isinstance(data.get("files"), dict):
+                # Files summarized before a deny rule was added are left out
+                allowed = set(workspace.get_policy().filter_allowed(data["files"]))
+                self.files = {path: entry for path, entry in data["files"].items() if path in allowed}
+        except (OSError, ValueError):
+            self.files = {}
+
+    def save(self):
+        """Atomically writes the cache file."""
+        with self.lock:
+            payload = {"version": CACHE_VERSION, "files": dict(self.files)}
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', delete=False, dir=os.path.dirname(self.cache_file), encoding='utf-8') as tmp:
+                json.dump(payload, tmp, separators=(',', ':'))
+                tmp_name = tmp.name
+            os.replace(tmp_name, self.cache_file)
+        except OSError:
+            # Cache is an optimization only; never break the session over it
+            pass
+
+    def read_limit(self, rel_path: str, stat: os.stat_result) -> int | None:
+        with self.lock:
+            entry = self.files.get(rel_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return None
+        return 0 if stat.st_size > MAX_SUMMARY_BYTES else MAX_SUMMARY_BYTES
+
+    def index_content(self, rel_path: str, stat: os.stat_result, data: bytes) -> bool:
+        """
+        Refreshes the entry for one file from its content. Returns True if it
+        was re-summarized.
+        """
+        if stat.st_size > MAX_SUMMARY_BYTES:
+            new_entry = {"hash": None, "summary": f"large file ({stat.st_size // 1024} KB)", "symbols": [], "lines": 0}
+        else:
+            digest = hashlib.sha1(data).hexdigest()
+            with self.lock:
+                entry = self.files.get(rel_path)
+            if entry and entry.get("hash") == digest:
+                # Touched but unchanged: keep the summary, refresh the stat key
+                with self.lock:
+                    entry.update({"size": stat.st_size, "mtime": stat.st_mtime})
+                return False
+            new_entry = {"hash": digest, **summarize_content(data, rel_path)}
+
+        new_entry.update({"size": stat.st_size, "mtime": stat.st_mtime})
+        with self.lock:
+            self.files[rel_path] = new_entry
+        return True
+
+    def remove_path(self, rel_path: str):
+        """Drops a file (or every file below a directory) from the cache."""
+        prefix = rel_path.rstrip('/') + '/'
+        with self.lock:
+            for key in [k for k in self.files if k == rel_path or k.startswith(prefix)]:
+                del self.files[key]
+
+    def indexed_paths(self) -> list[str]:
+        with self.lock:
+            return list(self.files)
+
+    def scan_finished(self, changed: int, stale: int):
+        if changed or stale:
+            self.save()
+
+    def render_for_prompt(self, budget_tokens: int = PROMPT_BUDGET_TOKENS) -> str:
+        """
+        Renders 'path: summary [symbols]' lines until the token budget is used.
+        Files with the most symbols come first, since they are the likeliest
+        edit targets.
+        """
+        with self.lock:
+            items = sorted(self.files.items(), key=lambda kv: (-len(kv[1].get("symbols", [])), kv[0]))
+        budget_chars = budget_tokens * 4
+        lines = []
+        used = 0
+        for rel_path, entry in items:
+            line = f"{rel_path}: {entry.get('summary') or '-'}"
+            if entry.get("symbols"):
+                line += f" [{', '.join(entry['symbols'])}]"
+            if used + len(line) + 1 > budget_chars:
+                lines.append(f"... ({len(items) - len(lines)} more files not summarized here)")
+                break
+            lines.append(line)
+            used += len(line) + 1
+        return "\n".join(lines)
+
+# Session-wide cache instance, created lazily
+_cache = None
+
+def get_cache() -> SummaryCache:
+    """Returns the shared summary cache for this workspace."""
+    global _cache
+    if _cache is None:
+        _cache = SummaryCache()
+    return _cache
@@ -0,0 +1,245 @@
+import os
+import re
+import ast
+import threading
+from . import workspace
+from .scanner import ScannedIndex
+
+"""
+symbols.py
+----------
+This module maintains a symbol index over the workspace so the agent can
+locate a definition with one local lookup instead of reading candidate files.
+
+Python files are parsed with 'ast'; JavaScript/TypeScript, Go, HTML ids and
+CSS classes use line-based regular expressions. The index is refreshed
+incrementally (size/mtime per file) by the shared workspace scan
+(scanner.py) and follows workspace changes through the
+workspace change listeners. The agent exposes it as FIND_SYMBOL::name.
+"""
+
+# Files above this size are skipped; generated bundles are not worth indexing
+MAX_SYMBOL_FILE_BYTES = 1024 * 1024
+
+MAX_RESULTS = 20
+
+_JS_PATTERNS = [
+    (re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)'), 'function'),
+    (re.compile(r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)'), 'class'),
+    (re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)'), 'function'),
+    (re.compile(r'^\s*(?:export\s+)?(?:interface|type|enum)\s+([A-Za-z_$][\w$]*)'), 'type'),
+    (re.compile(r'^\s+(?:static\s+|async\s+|public\s+|private\s+|protected\s+)*([A-Za-z_$][\w$]*)\s*\([^)]*\)\s*(?::\s*[^{]+)?\{\s*$'), 'method'),
+]
+
+_GO_PATTERNS = [
+    (re.compile(r'^func\s+\(\s*\w+\s+\*?(\w+)\s*\)\s*(\w+)'), 'method'),
+    (re.compile(r'^func\s+(\w+)'), 'function'),
+    (re.compile(r'^type\s+(\w+)\s+(?:struct|interface)'), 'type'),
+    (re.compile(r'^type\s+(\w+)\b'), 'type'),
+]
+
+_HTML_ID_PATTERN = re.compile(r'\bid\s*=\s*["\']([^"\']+)["\']')
+_CSS_CLASS_PATTERN = re.compile(r'(?<![\w-])\.(-?[A-Za-z_][\w-]*)(?=[^{};]*\{)')
+_CSS_ID_PATTERN = re.compile(r'(?<![\w-])#(-?[A-Za-z_][\w-]*)(?=[^{};]*\{)')
+
+_PYTHON_EXTENSIONS = ('.py', '.pyi')
+_JS_EXTENSIONS = ('.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx')
+_HTML_EXTENSIONS = ('.html', '.htm', '.vue', '.svelte')
+_CSS_EXTENSIONS = ('.css', '.scss', '.sass', '.less')
+SUPPORTED_EXTENSIONS = set(_PYTHON_EXTENSIONS + _JS_EXTENSIONS + _HTML_EXTENSIONS + _CSS_EXTENSIONS + ('.go',))
+
+_JS_KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'function', 'return', 'with'}
+
+def _python_symbols(text: str) -> list[tuple[str, int, str]]:
+    """Functions, classes, methods and module-level names via ast."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    found = []
+
+    def visit(node, prefix: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = 'method' if prefix else 'function'
+                found.append((prefix + child.name, child.lineno, kind))
+                visit(child, prefix + child.name + '.')
+            elif isinstance(child, ast.ClassDef):
+                found.append((prefix + child.name, child.lineno, 'class'))
+                visit(child, prefix + child.name + '.')
+            elif not prefix and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        found.append((target.id, child.lineno, 'variable'))
+
+    visit(tree, '')
+    return found
+
+def _regex_symbols(text: str, patterns) -> list[tuple[str, int, str]]:
+    found = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        for pattern, kind in patterns:
+            match = pattern.match(line)
+            if not match:
+                continue
+            if kind == 'method' and match.lastindex == 2:
+                # Go receiver methods are recorded as Type.Method
+                found.append((f"{match.group(1)}.{match.group(2)}", lineno, kind))
+            elif match.group(1) not in _JS_KEYWORDS:
+                found.append((match.group(1), lineno, kind))
+            break
+    return found
+
+def _markup_symbols(text: str, patterns) -> list[tuple[str, int, str]]:
+    found = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        for pattern, kind in patterns:
+            for match in pattern.finditer(line):
+                found.append((match.group(1), lineno, kind))
+    return found
+
+# The last extraction: the shared scan hands the summary cache and the symbol
+# index the same text one after the other, so the file is parsed once
+_last_extracted = (None, None, [])
+
+def extract_symbols(rel_path: str, text: str) -> list[tuple[str, int, str]]:
+    """
+    Extracts (name, line, kind) definitions from a file based on its extension.
+    Nested Python definitions are qualified ('Class.method').
+    """
+    global _last_extracted
+    last_path, last_text, last_symbols = _last_extracted
+    if rel_path == last_path and text == last_text:
+        return list(last_symbols)
+    found = _extract_symbols(rel_path, text)
+    _last_extracted = (rel_path, text, found)
+    return list(found)
+
+def _extract_symbols(rel_path: str, text: str) -> list[tuple[str, int, str]]:
+    ext = os.path.splitext(rel_path)[1].lower()
+    if ext in _PYTHON_EXTENSIONS:
+        return _python_symbols(text)
+    if ext in _JS_EXTENSIONS:
+        return _regex_symbols(text, _JS_PATTERNS)
+    if ext == '.go':
+        return _regex_symbols(text, _GO_PATTERNS)
+    if ext in _HTML_EXTENSIONS:
+        return _markup_symbols(text, [(_HTML_ID_PATTERN, 'html-id')])
+    if ext in _CSS_EXTENSIONS:
+        return _markup_symbols(text, [(_CSS_CLASS_PATTERN, 'css-class'), (_CSS_ID_PATTERN, 'css-id')])
+    return []
+
+class SymbolIndex(ScannedIndex):
+    """
+    Maps symbol names to their definition sites.
+
+    'files' holds path -> (size, mtime, symbols) and 'names' holds
+    lowercase short name -> set of paths, so a lookup only touches the files
+    that define something with that name.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.files = {}
+        self.names = {}
+
+    @staticmethod
+    def _short(name: str) -> str:
+        return name.rsplit('.', 1)[-1].lower()
+
+    def _unlink(self, rel_path: str):
+        entry = self.files.pop(rel_path, None)
+        if not entry:
+            return
+        for name, _, _ in entry[2]:
+            paths = self.names.get(self._short(name))
+            if paths is not None:
+                paths.discard(rel_path)
+                if not paths:
+                    del self.names[self._short(name)]
+
+    @staticmethod
+    def _indexable(rel_path: str, stat: os.stat_result) -> bool:
+        return stat.st_size <= MAX_SYMBOL_FILE_BYTES and os.path.splitext(rel_path)[1].lower() in SUPPORTED_EXTENSIONS
+
+    def read_limit(self, rel_path: str, stat: os.stat_result) -> int | None:
+        with self.lock:
+            entry = self.files.get(rel_path)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+                return None
+        return MAX_SYMBOL_FILE_BYTES if self._indexable(rel_path, stat) else 0
+
+    def index_content(self, rel_path: str, stat: os.stat_result, data: bytes) -> bool:
+        symbols = []
+        if self._indexable(rel_path, stat):
+            # Same text a universal-newline read would give
+            text = data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+            symbols = extract_symbols(rel_path, text)
+
+        with self.lock:
+            self._unlink(rel_path)
+            self.files[rel_path] = (stat.st_size, stat.st_mtime, symbols)
+            for name, _, _ in symbols:
+                self.names.setdefault(self._short(name), set()).add(rel_path)
+        return True
+
+    def remove_path(self, rel_path: str):
+        """Removes a file, or every file below a directory, from the index."""
+        prefix = rel_path.rstrip('/') + '/'
+        with self.lock:
+            for path in [p for p in self.files if p == rel_path or p.startswith(prefix)]:
+                self._unlink(path)
+
+    def on_workspace_change(self, rel_path: str, kind: str):
+        """Change listener registered with the workspace module."""
+        if kind == 'delete':
+            self.remove_path(rel_path)
+        elif os.path.isdir(os.path.join(workspace.PROJECT_ROOT, rel_path)):
+            for file_path in workspace.iter_files(rel_path):
+                self.update_file(file_path)
+        else:
+            self.update_file(rel_path)
+
+    def indexed_paths(self) -> list[str]:
+        with self.lock:
+            return list(self.files)
+
+    def find(self, name: str, limit: int = MAX_RESULTS) -> list[tuple[str, int, str, str]]:
+        """
+        Finds definitions of 'name'. Accepts short ('save') or qualified
+        ('Store.save') names; exact-case matches rank first.
+
+        Returns:
+            A list of (path, line, kind, qualified_name) tuples.
+        """
+        name = name.strip().lstrip('.#')
+        if not name:
+            return []
+        short = self._short(name)
+        qualified = '.' in name
+        results = []
+        with self.lock:
+            for rel_path in sorted(self.names.get(short, ())):
+                for symbol, line, kind in self.files[rel_path][2]:
+                    if qualified:
+                        matched = symbol.lower() == name.lower() or symbol.lower().endswith('.' + name.lower())
+                    else:
+                        matched = self._short(symbol) == short
+                    if matched:
+                        exact = symbol == name or symbol.endswith('.' + name)
+                        results.append((0 if exact else 1, rel_path, line, kind, symbol))
+        results.sort()
+        return [(path, line, kind, symbol) for _, path, line, kind, symbol in results[:limit]]
+
+# Session-wide index instance, created lazily
+_index = None
+
+def get_index() -> SymbolIndex:
+    """Returns the shared symbol index, registered for workspace changes."""
+    global _index
+    if _index is None:
+        _index = SymbolIndex()
+        workspace.add_change_listener(_index.on_workspace_change)
+    return _index
@@ -1,12 +1,18 @@
 # paicode/ui.py
 
-from rich.console import Console
+import os
+import sys
+import json
+from contextlib import nullcontext
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.syntax import Syntax
 from rich.theme import Theme
 from rich.rule import Rule
 from rich.box import ROUNDED
 from rich.text import Text
+from pygments.lexers import get_lexer_for_filename
+from pygments.util import ClassNotFound
 
 # Define a custom theme for consistency
 custom_theme = Theme({
@@ -14,44 +20,345 @@ custom_theme = Theme({
     "success": "bold green",
     "warning": "yellow",
     "error": "bold red",
-    "action": "bold bright_blue", 
-    "plan": "default", 
+    "action": "bold bright_blue",
+    "plan": "default",
     "path": "underline italic bright_blue"
 })
 
 # Create a single console instance to be used across the application
 console = Console(theme=custom_theme)
 
+# Lines of file content shown per READ (the model still gets the whole output)
+CODE_PREVIEW_LINES = 20
+# Previews above this size are shown as plain text, and long lines are clipped
+HIGHLIGHT_MAX_CHARS = 8 * 1024
+MAX_PREVIEW_LINE_CHARS = 400
+
+# Lexers by file extension (or name, for files without one); None = plain text
+_lexers = {}
+
+# Output backend: 'rich' (panels and colors), 'plain' (one line per message,
+# no markup parsing) or 'json' (one NDJSON event per message). 'auto' uses
+# rich on a terminal and plain when stdout is piped; the --plain, --json and
+# --quiet flags override PAI_OUTPUT. Quiet output leaves out progress
+# messages (banners, acknowledgments, spinners, token counts).
+OUTPUT_MODE = os.getenv("PAI_OUTPUT", "auto").strip().lower()
+QUIET = os.getenv("PAI_QUIET", "0") == "1"
+
+PANEL_WIDTH = 80
+
+# True while the input prompt stays on screen as requests run in the
+# background (see set_prompt_active)
+PROMPT_ACTIVE = False
+
+# Prefixes of the one-line messages, shared by every backend
+_MESSAGE_PREFIXES = {
+    "success": "✓ ",
+    "error": "✗ ",
+    "warning": "! ",
+    "info": "i ",
+    "action": "-> ",
+}
+
+# Rich styles of report lines (see report())
+_REPORT_STYLES = {
+    "bold": "bold bright_white",
+    "warning": "bold yellow",
+    "ai_output": "bright_cyan",
+    "success": "bold green",
+    "error": "bold red",
+    "normal": "bright_white",
+}
+
+class RichBackend:
+    """Panels and colors on the shared Rich console."""
+
+    name = "rich"
+
+    def message(self, kind: str, text: str):
+        # Messages may carry Rich markup, as before the backends existed
+        console.print(f"[{kind}]{_MESSAGE_PREFIXES[kind]}{text}[/{kind}]")
+
+    def text(self, text: str, style: str = None):
+        console.print(Text(text, style=style or ""))
+
+    def panel(self, text: str, title: str, style: str, center: bool):
+        console.print(Panel(
+            Text(text, style=style, justify="center" if center else "left"),
+            title=f"[bold]{title}[/bold]",
+            box=ROUNDED,
+            border_style="grey50",
+            padding=(1, 2),
+            width=PANEL_WIDTH,
+        ))
+
+    def report(self, title: str, items: list):
+        renderables = []
+        for item in items:
+            if not item:
+                renderables.append(Text(""))
+            elif item[0] == "code":
+                _, filename, content, first_line = item
+                renderables.append(code_panel(filename, content, first_line))
+            else:
+                renderables.append(Text(item[1], style=_REPORT_STYLES.get(item[0], "bright_white")))
+        console.print(Panel(
+            Group(*renderables),
+            title=f"[bold]{title}[/bold]",
+            box=ROUNDED,
+            border_style="grey50",
+            padding=(1, 2),
+            width=PANEL_WIDTH,
+        ))
+
+    def status(self, text: str):
+        return console.status(f"[bold yellow]{text}", spinner="dots")
+
+class PlainBackend:
+    """
+    Line-oriented text for pipes and CI logs: every message is written as is
+    (no markup parsing, no layout) in one write call.
+    """
+
+    name = "plain"
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def _write(self, text: str):
+        (self.stream or sys.stdout).write(text + "\n")
+
+    def message(self, kind: str, text: str):
+        self._write(_MESSAGE_PREFIXES[kind] + text)
+
+    def text(self, text: str, style: str = None):
+        self._write(text)
+
+    def panel(self, text: str, title: str, style: str, center: bool):
+        text = text.strip()
+        if "\n" in text:
+            self._write(f"[{title}]\n{text}")
+        else:
+            self._write(f"[{title}] {text}")
+
+    def report(self, title: str, items: list):
+        out = [f"[{title}]"]
+        for item in items:
+            if not item:
+                continue
+            if item[0] == "code":
+                _, filename, content, first_line = item
+                preview, remaining = preview_lines(content)
+                out.append(f"--- {filename}")
+                out.extend(f"{number:>5} | {line}" for number, line in enumerate(preview.split("\n"), first_line))
+                if remaining:
+                    out.append(f"      ... ({remaining} more lines)")
+            else:
+                out.append(item[1])
+        self._write("\n".join(out))
+
+    def status(self, text: str):
+        self._write(f"... {text}")
+        return nullcontext()
+
+class JsonBackend(PlainBackend):
+    """One JSON object per line ({"event": ..., ...}) for tools reading the output."""
+
+    name = "json"
+
+    def _event(self, event: str, **fields):
+        self._write(json.dumps({"event": event, **fields}, ensure_ascii=False))
+
+    def message(self, kind: str, text: str):
+        self._event("message", level=kind, text=text)
+
+    def text(self, text: str, style: str = None):
+        self._event("text", text=text)
+
+    def panel(self, text: str, title: str, style: str, center: bool):
+        self._event("panel", title=title, text=text.strip())
+
+    def report(self, title: str, items: list):
+        lines = []
+        for item in items:
+            if not item:
+                continue
+            if item[0] == "code":
+                _, filename, content, first_line = item
+                preview, remaining = preview_lines(content)
+                lines.append({"file": filename, "first_line": first_line, "preview": preview,
+                              "more_lines": remaining})
+            else:
+                lines.append({"style": item[0], "text": item[1]})
+        self._event("report", title=title, lines=lines)
+
+    def status(self, text: str):
+        self._event("status", text=text)
+        return nullcontext()
+
+_BACKENDS = {"rich": RichBackend, "plain": PlainBackend, "json": JsonBackend}
+
+_backend = None
+
+def set_output_mode(mode: str = None, quiet: bool = None):
+    """
+    Selects the output backend ('rich', 'plain', 'json' or 'auto') and quiet
+    mode; arguments left as None keep their current setting.
+    """
+    global OUTPUT_MODE, QUIET, _backend
+    if mode is not None:
+        OUTPUT_MODE = mode.strip().lower()
+        _backend = None
+    if quiet is not None:
+        QUIET = quiet
+
+def set_prompt_active(active: bool):
+    """
+    Marks the input prompt as staying on screen while output is printed
+    above it. The rich backend then shows progress as one line instead of a
+    spinner, which would redraw over the prompt.
+    """
+    global PROMPT_ACTIVE
+    PROMPT_ACTIVE = active
+
+def get_backend():
+    """The active output backend, resolved on first use."""
+    global _backend
+    if _backend is None:
+        mode = OUTPUT_MODE
+        if mode not in _BACKENDS:
+            mode = "rich" if sys.stdout.isatty() else "plain"
+        _backend = _BACKENDS[mode]()
+    return _backend
+
 def print_success(message: str):
     """Displays a success message with a checkmark icon."""
-    console.print(f"[success]✓ {message}[/success]")
+    get_backend().message("success", message)
 
 def print_error(message: str):
     """Displays an error message with a cross icon."""
-    console.print(f"[error]✗ {message}[/error]")
+    get_backend().message("error", message)
 
 def print_warning(message: str):
     """Displays a warning message."""
-    console.print(f"[warning]! {message}[/warning]")
+    get_backend().message("warning", message)
 
 def print_info(message: str):
     """Displays an informational message."""
-    console.print(f"[info]i {message}[/info]")
-    
+    if not QUIET:
+        get_backend().message("info", message)
+
 def print_action(message: str):
     """Displays an action being performed by the agent."""
-    console.print(f"[action]-> {message}[/action]")
+    if not QUIET:
+        get_backend().message("action", message)
+
+def print_text(text: str, style: str = None):
+    """Displays text as is (never parsed as markup)."""
+    get_backend().text(text, style)
+
+def print_hint(text: str):
+    """Displays a dim hint; left out in quiet mode."""
+    if not QUIET:
+        get_backend().text(text, "dim")
+
+def panel(text: str, title: str, style: str = "bright_white", center: bool = False, progress: bool = False):
+    """
+    Displays a titled message (an 80-column panel with the rich backend).
+    Progress panels (banners, acknowledgments) are left out in quiet mode.
+    """
+    if progress and QUIET:
+        return
+    get_backend().panel(text, title, style, center)
+
+def report(title: str, items: list):
+    """
+    Displays a titled block of lines. Items are (style, text) pairs with a
+    style from 'bold', 'normal', 'warning', 'ai_output', 'success' and
+    'error'; ("code", filename, content, first_line) for a file preview; or
+    "" for a blank line.
+    """
+    get_backend().report(title, items)
+
+def status(text: str):
+    """Context manager showing progress (a spinner with the rich backend)."""
+    if QUIET:
+        return nullcontext()
+    backend = get_backend()
+    if PROMPT_ACTIVE and backend.name == "rich":
+        backend.text(f"... {text}", "dim")
+        return nullcontext()
+    return backend.status(text)
 
 def display_panel(content: str, title: str, language: str = None):
     """Displays content within a panel, with optional syntax highlighting."""
+    backend = get_backend()
+    if backend.name != "rich":
+        backend.panel(content, title, "", False)
+        return
     if language:
         # Use Syntax for code highlighting
         display_content = Syntax(content, language, theme="monokai", line_numbers=True)
     else:
         display_content = content
-    
+
     console.print(Panel(display_content, title=f"[bold grey50]{title}[/bold grey50]", border_style="grey50", expand=False))
 
+def lexer_for(filename: str):
+    """
+    Pygments lexer for a file name, looked up once per extension: resolving
+    a name scans every registered lexer, which is too slow to do per READ.
+    """
+    base = filename.replace('\\', '/').rsplit('/', 1)[-1]
+    dot = base.rfind('.')
+    key = base[dot:].lower() if dot > 0 else base
+    if key not in _lexers:
+        try:
+            _lexers[key] = get_lexer_for_filename(base)
+        except ClassNotFound:
+            _lexers[key] = None
+    return _lexers[key]
+
+def preview_lines(content, max_lines: int = CODE_PREVIEW_LINES) -> tuple[str, int]:
+    """
+    The first 'max_lines' lines of 'content' (a str or a blobs.Blob; long
+    lines clipped) and the number of lines left out. Only the preview is
+    split (or decoded), not the content.
+    """
+    if not isinstance(content, str):
+        head, remaining = content.head_lines(max_lines)
+    else:
+        end = 0
+        for _ in range(max_lines):
+            end = content.find('\n', end) + 1
+            if not end:
+                end = len(content)
+                break
+        head = content[:end].rstrip('\n')
+        remaining = content.count('\n', end) + (1 if end < len(content) and not content.endswith('\n') else 0)
+    lines = [line if len(line) <= MAX_PREVIEW_LINE_CHARS else line[:MAX_PREVIEW_LINE_CHARS] + " …"
+             for line in head.split('\n')]
+    return '\n'.join(lines), remaining
+
+def code_panel(filename: str, content, first_line: int = 1) -> Panel:
+    """
+    Panel previewing file content. Only the displayed lines are highlighted,
+    so the cost does not depend on the file size.
+    """
+    preview, remaining = preview_lines(content)
+    lexer = lexer_for(filename) if len(preview) <= HIGHLIGHT_MAX_CHARS else None
+    if lexer is not None:
+        body = Syntax(preview, lexer, theme="monokai", line_numbers=True, start_line=first_line)
+    else:
+        body = Text(preview)
+    if remaining:
+        body = Group(body, Text(f"... ({remaining} more lines)", style="dim"))
+    return Panel(body, title=f"📄 {filename}", border_style="grey50", expand=False)
+
 def print_rule(title: str):
     """Displays a horizontal rule with a title."""
+    backend = get_backend()
+    if backend.name != "rich":
+        backend.text(f"== {title} ==")
+        return
     console.print(Rule(f"[bold]{title}[/bold]", style="grey50"))
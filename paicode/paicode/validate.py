@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import atexit
+import threading
+import multiprocessing
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+try:
+    import tomllib
+    TOML_AVAILABLE = True
+except ImportError:
+    TOML_AVAILABLE = False
+
+"""
+validate.py
+-----------
+This module checks files right after WRITE/MODIFY generated them, so broken
+output is caught (and repaired by the agent) in the same phase instead of
+surfacing as a follow-up request:
+
+- Python: compiled without writing bytecode (what py_compile checks),
+- JSON, YAML (with PyYAML installed) and TOML (Python 3.11+): parsed,
+- HTML: tags balanced (void elements and optional end tags allowed).
+
+The files of one phase are checked concurrently on a process pool (parsing
+is CPU-bound and holds the GIL); workers read the files themselves, so only
+paths and error messages cross process boundaries. A single file is checked
+in-process, where the pool would cost more than the check. Files without a
+validator are not checked.
+"""
+
+ENABLED = os.getenv("PAI_VALIDATE", "1") != "0"
+# Worker processes; 0 checks every file in-process
+MAX_WORKERS = int(os.getenv("PAI_VALIDATE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Files larger than this are not parsed
+MAX_VALIDATE_BYTES = 2 * 1024 * 1024
+# Seconds to wait for the checks of one phase
+TIMEOUT = 30
+
+class _HTMLBalance(HTMLParser):
+    """Records the first unbalanced tag of a document."""
+
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+            "param", "source", "track", "wbr", "!doctype"}
+    # Elements whose end tag may be left out
+    OPTIONAL_END = {"p", "li", "dt", "dd", "tr", "td", "th", "thead", "tbody", "tfoot",
+                    "option", "optgroup", "colgroup", "caption", "rt", "rp", "html", "head", "body"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.error = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self.VOID:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if self.error or tag in self.VOID:
+            return
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            self.error = f"line {self.getpos()[0]}: </{tag}> has no matching <{tag}>"
+            return
+        while self.stack:
+            open_tag, line = self.stack.pop()
+            if open_tag == tag:
+                return
+            if open_tag not in self.OPTIONAL_END:
+                self.error = f"line {line}: <{open_tag}> is closed by </{tag}> at line {self.getpos()[0]}"
+                return
+
+def _check_python(text: str, path: str) -> str | None:
+    try:
+        compile(text, path, 'exec', dont_inherit=True)
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+    except ValueError as e:
+        return str(e)
+    return None
+
+def _check_json(text: str, path: str) -> str | None:
+    try:
+        json.loads(text)
+    except json.JSONDecodeError as e:
+        return f"line {e.lineno}, column {e.colno}: {e.msg}"
+    return None
+
+def _check_yaml(text: str, path: str) -> str | None:
+    try:
+        for _ in yaml.safe_load_all(text):
+            pass
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        problem = getattr(e, 'problem', None) or str(e)
+        return f"line {mark.line + 1}: {problem}" if mark else problem
+    return None
+
+def _check_toml(text: str, path: str) -> str | None:
+    try:
+        tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        return str(e)
+    return None
+
+def _check_html(text: str, path: str) -> str | None:
+    parser = _HTMLBalance()
+    parser.feed(text)
+    parser.close()
+    if parser.error:
+        return parser.error
+    unclosed = [(tag, line) for tag, line in parser.stack if tag not in parser.OPTIONAL_END]
+    if unclosed:
+        tag, line = unclosed[-1]
+        return f"line {line}: <{tag}> is never closed"
+    return None
+
+# Extension -> (validator name, check); a check returns an error or None
+VALIDATORS = {
+    ".py": ("python", _check_python),
+    ".pyw": ("python", _check_python),
+    ".json": ("json", _check_json),
+    ".html": ("html", _check_html),
+    ".htm": ("html", _check_html),
+}
+if YAML_AVAILABLE:
+    VALIDATORS[".yaml"] = VALIDATORS[".yml"] = ("yaml", _check_yaml)
+if TOML_AVAILABLE:
+    VALIDATORS[".toml"] = ("toml", _check_toml)
+
+def validator_for(path: str) -> str | None:
+    """Name of the validator for a file, or None if it is not checked."""
+    entry = VALIDATORS.get(os.path.splitext(path)[1].lower())
+    return entry[0] if entry else None
+
+def _validate_file(full_path: str) -> tuple[str | None, float]:
+    """(error or None, seconds spent) for one file; runs in a worker process."""
+    started = time.perf_counter()
+    _, check = VALIDATORS[os.path.splitext(full_path)[1].lower()]
+    try:
+        with open(full_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except UnicodeDecodeError as e:
+        return f"not valid UTF-8 ({e.reason} at byte {e.start})", time.perf_counter() - started
+    except OSError as e:
+        return f"cannot be read: {e}", time.perf_counter() - started
+    error = check(text, full_path)
+    return error, time.perf_counter() - started
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared validation pool, started on first use. Workers come
+    from a fork server where available: forking the agent itself would copy
+    its threads' locks into the workers.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=context)
+        return _pool
+
+def shutdown():
+    """Stops the pool's worker processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+atexit.register(shutdown)
+
+def _size(full_path: str) -> int:
+    try:
+        return os.path.getsize(full_path)
+    except OSError:
+        return 0  # reported as unreadable by the check
+
+def validate_files(paths: list[str], root: str) -> list[dict]:
+    """
+    Checks the files (relative to 'root') that have a validator and are at
+    most MAX_VALIDATE_BYTES.
+
+    Returns:
+        One dict per checked file, in input order: 'path', 'validator',
+        'error' (None if valid) and 'seconds' (time spent in the check).
+    """
+    checked = [(path, validator_for(path)) for path in dict.fromkeys(paths)]
+    checked = [(path, name) for path, name in checked if name and _size(os.path.join(root, path)) <= MAX_VALIDATE_BYTES]
+    if not ENABLED or not checked:
+        return []
+    full_paths = [os.path.join(root, path) for path, _ in checked]
+    if len(checked) > 1 and MAX_WORKERS > 1:
+        try:
+            outcomes = list(get_pool().map(_validate_file, full_paths, timeout=TIMEOUT))
+        except Exception:
+            # A broken or timed-out pool must not cost the phase its results
+            shutdown()
+            outcomes = [_validate_file(full_path) for full_path in full_paths]
+    else:
+        outcomes = [_validate_file(full_path) for full_path in full_paths]
+    return [{"path": path, "validator": name, "error": error, "seconds": seconds}
+            for (path, name), (error, seconds) in zip(checked, outcomes)]
+
+def latency_summary(results: list[dict]) -> str:
+    """'python 2 files 3.1 ms, json 1 file 0.4 ms': files and time per validator."""
+    totals = {}
+    for result in results:
+        count, seconds = totals.get(result["validator"], (0, 0.0))
+        totals[result["validator"]] = (count + 1, seconds + result["seconds"])
+    return ", ".join(f"{name} {count} file{'s' if count != 1 else ''} {seconds * 1000:.1f} ms"
+                     for name, (count, seconds) in totals.items())
@@ -2,7 +2,10 @@ import os
 import shutil
 import difflib
 import tempfile
-from . import ui
+from . import ui, reader
+from .fsindex import WorkspaceIndex, walk
+from .ignore import IgnoreMatcher
+from .policy import PathPolicy
 
 """
 workspace.py
@@ -22,6 +25,9 @@ runtime (workspace scope), ensuring controlled manipulation of project files.
 
 PROJECT_ROOT = os.path.abspath(os.getcwd())
 
+# Local cache directory for derived workspace data (summaries, indexes)
+CACHE_DIR = os.path.join(PROJECT_ROOT, ".pai_cache")
+
 # List of sensitive files and directories to be blocked
 SENSITIVE_PATTERNS = {
     '.env', 
@@ -29,114 +35,205 @@ SENSITIVE_PATTERNS = {
     'venv', 
     '__pycache__', 
     '.pai_history',  # Pai cannot access this directly - only for LLM context
+    '.pai_cache',  # Derived data maintained by Pai itself
     '.idea', 
     '.vscode'
 }
 
+# Callbacks notified after successful workspace mutations: fn(path, kind)
+# where kind is 'write' (created/changed) or 'delete' (file or directory gone).
+_change_listeners = []
+
+def add_change_listener(callback):
+    """Registers a callback for workspace changes made through this module."""
+    if callback not in _change_listeners:
+        _change_listeners.append(callback)
+
+def remove_change_listener(callback):
+    """Unregisters a previously added change callback."""
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+def _notify_change(path: str, kind: str):
+    """Informs listeners about a change; listener errors never break an operation."""
+    rel_path = os.path.normpath(path.strip()).replace('\\', '/')
+    for callback in list(_change_listeners):
+        try:
+            callback(rel_path, kind)
+        except Exception:
+            pass
+
+# Extra gitignore-style rules for the path policy (comma-separated)
+DENY_PATTERNS = [p.strip() for p in os.getenv("PAI_DENY_PATTERNS", "").split(",") if p.strip()]
+ALLOW_PATTERNS = [p.strip() for p in os.getenv("PAI_ALLOW_PATTERNS", "").split(",") if p.strip()]
+
+# Compiled path policy, created lazily
+_policy = None
+
+def get_policy() -> PathPolicy:
+    """Returns the shared path policy, registered for workspace changes."""
+    global _policy
+    if _policy is None:
+        _policy = PathPolicy(PROJECT_ROOT, sorted(SENSITIVE_PATTERNS) + DENY_PATTERNS, ALLOW_PATTERNS)
+        add_change_listener(_policy.on_workspace_change)
+    return _policy
+
 def _is_path_safe(path: str) -> bool:
     """
     Ensures the target path is within the project directory and not sensitive.
+    Nothing is printed here; callers report denials with _denied_error().
+    """
+    return get_policy().is_allowed(path)
+
+def path_denial(path: str) -> str | None:
+    """Why the policy rejects 'path', or None if it is allowed."""
+    allowed, reason = get_policy().check(path)
+    return None if allowed else (reason or "not secure")
+
+def _denied_error(path: str) -> str:
+    """Error message for a path rejected by the policy, including the reason."""
+    return f"Error: Access to path '{path}' is denied ({path_denial(path) or 'not secure'})."
+
+# Set PAI_INDEX_PERSIST=0 to keep the workspace index in memory only
+INDEX_PERSIST = os.getenv("PAI_INDEX_PERSIST", "1") != "0"
+
+# Entries per page returned by tree_directory and list_path
+MAX_LIST_ENTRIES = int(os.getenv("PAI_LIST_MAX_ENTRIES", "2000"))
+
+# 'full' describes the whole workspace in the planning prompt; 'lazy' only its
+# top levels, with subtrees expanded on demand (TREE/LIST_PATH with a depth).
+# 'auto' picks lazy once the workspace has LAZY_MIN_ENTRIES entries.
+WORKSPACE_MODE = os.getenv("PAI_WORKSPACE_MODE", "auto").strip().lower()
+LAZY_MIN_ENTRIES = int(os.getenv("PAI_LAZY_MIN_ENTRIES", "50000"))
+
+# .gitignore/.paiignore rules shared by every listing, created lazily
+_ignore_matcher = None
+
+# Shared structure index behind tree_directory and list_path, created lazily
+_workspace_index = None
+
+# Result of the workspace size probe behind is_lazy_workspace()
+_lazy_workspace = None
+
+def get_ignore_matcher() -> IgnoreMatcher:
+    """Returns the shared ignore-rule matcher for the project root."""
+    global _ignore_matcher
+    if _ignore_matcher is None:
+        _ignore_matcher = IgnoreMatcher(PROJECT_ROOT)
+    return _ignore_matcher
+
+def _walk_policy() -> PathPolicy | None:
+    """
+    The policy walkers filter with: only needed when PAI_DENY_PATTERNS or
+    PAI_ALLOW_PATTERNS add rules, since the sensitive names are excluded by
+    name already.
+    """
+    return get_policy() if DENY_PATTERNS or ALLOW_PATTERNS else None
+
+def get_workspace_index() -> WorkspaceIndex:
+    """Returns the shared workspace index, registered for workspace changes."""
+    global _workspace_index
+    if _workspace_index is None:
+        cache_path = os.path.join(CACHE_DIR, "workspace_index.json") if INDEX_PERSIST else None
+        _workspace_index = WorkspaceIndex(PROJECT_ROOT, SENSITIVE_PATTERNS, cache_path, get_ignore_matcher(),
+                                          _walk_policy())
+        add_change_listener(_workspace_index.on_workspace_change)
+    return _workspace_index
+
+def is_lazy_workspace() -> bool:
+    """
+    Whether the planning prompt gets only the top levels of the workspace.
+    In 'auto' mode the first call counts entries with a walk that stops at
+    LAZY_MIN_ENTRIES, so the probe stays cheap on huge trees.
+    """
+    global _lazy_workspace
+    if WORKSPACE_MODE in ("lazy", "full"):
+        return WORKSPACE_MODE == "lazy"
+    if _lazy_workspace is None:
+        entries = sum(1 for _ in walk(PROJECT_ROOT, '.', SENSITIVE_PATTERNS, get_ignore_matcher(),
+                                      max_entries=LAZY_MIN_ENTRIES, policy=_walk_policy()))
+        _lazy_workspace = entries >= LAZY_MIN_ENTRIES
+    return _lazy_workspace
+
+def _page_footer(command: str, path: str, max_depth: int | None, page: int, pages: int | None = None) -> str:
+    """'Page 2/7 - next: TREE::src::2::3' style footer for paged listings."""
+    depth = max_depth if max_depth is not None else 0
+    count = f"{page}/{pages}" if pages else str(page)
+    footer = f"Page {count}"
+    if pages is None or page < pages:
+        footer += f" - next: {command}::{path}::{depth}::{page + 1}"
+    return footer
+
+def tree_directory(path: str = '.', max_depth: int = None, page: int = 1) -> str:
+    """
+    Creates a string representation of the directory structure recursively,
+    down to 'max_depth' levels if given. Large trees are split into pages of
+    MAX_LIST_ENTRIES entries.
     """
-    if not path or not isinstance(path, str):
-        return False
-        
-    try:
-        # 1. Normalize the path for consistency and strip whitespace
-        norm_path = os.path.normpath(path.strip())
-        
-        # 2. Reject empty paths after normalization, but allow '.' for current directory
-        if not norm_path or norm_path == '..':
-            return False
-        
-        # 3. Check if the path tries to escape the root directory
-        full_path = os.path.realpath(os.path.join(PROJECT_ROOT, norm_path))
-        if not full_path.startswith(os.path.realpath(PROJECT_ROOT)):
-            ui.print_error(f"Operation cancelled. Path '{path}' is outside the project directory.")
-            return False
-
-        # 4. Block access to sensitive files and directories
-        path_parts = norm_path.replace('\\', '/').split('/')
-        if any(part in SENSITIVE_PATTERNS for part in path_parts if part):
-            ui.print_error(f"Access to the sensitive path '{path}' is denied.")
-            return False
-
-    except Exception as e:
-        ui.print_error(f"Error during path validation: {e}")
-        return False
-
-    return True
-
-def tree_directory(path: str = '.') -> str:
-    """Creates a string representation of the directory structure recursively."""
     if not _is_path_safe(path):
-        return f"Error: Cannot access path '{path}'."
+        return _denied_error(path)
 
     full_path = os.path.join(PROJECT_ROOT, path)
     if not os.path.isdir(full_path):
         return f"Error: '{path}' is not a valid directory."
 
-    tree_lines = [f"{os.path.basename(full_path)}/"]
-
-    def build_tree(directory, prefix=""):
-        try:
-            items = sorted([item for item in os.listdir(directory) if item not in SENSITIVE_PATTERNS])
-        except FileNotFoundError:
-            return
-
-        pointers = ['├── '] * (len(items) - 1) + ['└── ']
-        
-        for pointer, item in zip(pointers, items):
-            tree_lines.append(f"{prefix}{pointer}{item}")
-            item_path = os.path.join(directory, item)
-            if os.path.isdir(item_path):
-                extension = '│   ' if pointer == '├── ' else '    '
-                build_tree(item_path, prefix=prefix + extension)
-
-    build_tree(full_path)
+    page = max(1, page)
+    result = get_workspace_index().tree_lines(path, max_depth, MAX_LIST_ENTRIES, (page - 1) * MAX_LIST_ENTRIES)
+    if result is None:
+        return f"Error: '{path}' is not a valid directory."
+    tree_lines, more = result
+    if more:
+        tree_lines.append("... " + _page_footer("TREE", path, max_depth, page))
+    elif page > 1:
+        tree_lines.append(f"Page {page} (last)")
     return "\n".join(tree_lines)
 
-def list_path(path: str = '.') -> str | None:
+def list_path(path: str = '.', max_depth: int = None, page: int = 1) -> str | None:
     """
     Lists all files and subdirectories recursively for a given path in a simple,
-    machine-readable, newline-separated format.
+    machine-readable, newline-separated format. Ignored paths (.gitignore,
+    .paiignore) are left out. 'max_depth' limits the levels listed, and long
+    listings are split into pages of MAX_LIST_ENTRIES paths.
     """
     if not _is_path_safe(path):
-        return f"Error: Cannot access path '{path}'."
+        return _denied_error(path)
 
     full_path = os.path.join(PROJECT_ROOT, path)
     if not os.path.isdir(full_path):
         return f"Error: '{path}' is not a valid directory."
 
-    path_list = []
-    for root, dirs, files in os.walk(full_path, topdown=True):
-        # Filter out sensitive directories from being traversed
-        dirs[:] = [d for d in dirs if d not in SENSITIVE_PATTERNS]
-        
-        # Process files
-        for name in files:
-            if name not in SENSITIVE_PATTERNS:
-                # Get relative path from the initial 'path'
-                rel_dir = os.path.relpath(root, PROJECT_ROOT)
-                path_list.append(os.path.join(rel_dir, name).replace('\\', '/'))
-        
-        # Process directories
-        for name in dirs:
-            rel_dir = os.path.relpath(root, PROJECT_ROOT)
-            path_list.append(os.path.join(rel_dir, name).replace('\\', '/') + '/')
-
-    return "\n".join(sorted(path_list))
-    
+    page = max(1, page)
+    result = get_workspace_index().list_paths(path, max_depth, MAX_LIST_ENTRIES, (page - 1) * MAX_LIST_ENTRIES)
+    if result is None:
+        return f"Error: '{path}' is not a valid directory."
+    path_list, total = result
+    pages = max(1, -(-total // MAX_LIST_ENTRIES))
+    if pages > 1:
+        path_list.append(f"... {_page_footer('LIST_PATH', path, max_depth, min(page, pages), pages)} ({total} entries)")
+    return "\n".join(path_list)
+
+def iter_files(path: str = '.'):
+    """
+    Yields the relative paths of all non-sensitive, non-ignored files below
+    'path' that the path policy allows. Used by the background indexers
+    (summaries, search, symbols, grep); no Rich output on the hot path.
+    """
+    for rel_path, is_dir in walk(PROJECT_ROOT, path, SENSITIVE_PATTERNS, get_ignore_matcher(), policy=_walk_policy()):
+        if not is_dir:
+            yield rel_path
 
 def delete_item(path: str) -> str:
     """Deletes a file or directory and returns a status message."""
-    if not _is_path_safe(path): return f"Error: Access to path '{path}' is denied or path is not secure."
+    if not _is_path_safe(path): return _denied_error(path)
     try:
         full_path = os.path.join(PROJECT_ROOT, path)
         if os.path.isfile(full_path):
             os.remove(full_path)
+            _notify_change(path, 'delete')
             return f"Success: File deleted: {path}"
         elif os.path.isdir(full_path):
             shutil.rmtree(full_path)
+            _notify_change(path, 'delete')
             return f"Success: Directory deleted: {path}"
         else:
             return f"Warning: Item not found, nothing deleted: {path}"
@@ -145,34 +242,44 @@ def delete_item(path: str) -> str:
 
 def move_item(source: str, destination: str) -> str:
     """Moves an item and returns a status message."""
-    if not _is_path_safe(source) or not _is_path_safe(destination):
-        return "Error: Source or destination path is not secure or is denied."
+    for path in (source, destination):
+        if not _is_path_safe(path):
+            return _denied_error(path)
     try:
         full_source = os.path.join(PROJECT_ROOT, source)
         full_destination = os.path.join(PROJECT_ROOT, destination)
+        # shutil.move puts the source inside an existing destination directory
+        into_directory = os.path.isdir(full_destination)
         shutil.move(full_source, full_destination)
+        _notify_change(source, 'delete')
+        if into_directory:
+            _notify_change(os.path.join(destination, os.path.basename(os.path.normpath(source))), 'write')
+        else:
+            _notify_change(destination, 'write')
         return f"Success: Item moved from '{source}' to '{destination}'"
     except (FileNotFoundError, shutil.Error) as e:
         return f"Error: Failed to move '{source}': {e}"
 
 def create_file(file_path: str) -> str:
     """Creates an empty file and returns a status message."""
-    if not _is_path_safe(file_path): return f"Error: Access to path '{file_path}' is denied or path is not secure."
+    if not _is_path_safe(file_path): return _denied_error(file_path)
     try:
         full_path = os.path.join(PROJECT_ROOT, file_path)
         dir_name = os.path.dirname(full_path)
         if dir_name: os.makedirs(dir_name, exist_ok=True)
         with open(full_path, 'w') as f: pass
+        _notify_change(file_path, 'write')
         return f"Success: New empty file created: {file_path}"
     except IOError as e:
         return f"Error: Failed to create file: {e}"
 
 def create_directory(dir_path: str) -> str:
     """Creates a directory and returns a status message."""
-    if not _is_path_safe(dir_path): return f"Error: Access to path '{dir_path}' is denied or path is not secure."
+    if not _is_path_safe(dir_path): return _denied_error(dir_path)
     try:
         full_path = os.path.join(PROJECT_ROOT, dir_path)
         os.makedirs(full_path, exist_ok=True)
+        _notify_change(dir_path, 'write')
         return f"Success: Directory created: {dir_path}"
     except OSError as e:
         return f"Error: Failed to create directory: {e}"
@@ -191,15 +298,32 @@ def read_file(file_path: str) -> str | None:
         ui.print_error(f"Failed to read file: {e}")
         return None
 
+def read_file_view(file_path: str, start: int = None, end: int = None, as_bytes: bool = False) -> dict | None:
+    """
+    Reads a file (or lines start-end of it) for display and prompts, capped
+    in size and with binary detection. See reader.read_text for the fields.
+    Returns None on failure, like read_file.
+    """
+    if not _is_path_safe(file_path): return None
+    try:
+        full_path = os.path.join(PROJECT_ROOT, file_path)
+        if not os.path.isfile(full_path):
+            return None
+        return reader.read_text(full_path, start, end, as_bytes=as_bytes)
+    except (OSError, ValueError) as e:
+        ui.print_error(f"Failed to read file: {e}")
+        return None
+
 def write_to_file(file_path: str, content: str) -> str:
     """Writes to a file and returns a status message."""
-    if not _is_path_safe(file_path): return f"Error: Access to path '{file_path}' is denied or path is not secure."
+    if not _is_path_safe(file_path): return _denied_error(file_path)
     try:
         full_path = os.path.join(PROJECT_ROOT, file_path)
         dir_name = os.path.dirname(full_path)
         if dir_name: os.makedirs(dir_name, exist_ok=True)
         with open(full_path, 'w') as f:
             f.write(content)
+        _notify_change(file_path, 'write')
         return f"Success: New file written: {file_path}"
     except IOError as e:
         return f"Error: Failed to write to file: {e}"
@@ -226,7 +350,7 @@ def apply_modification_with_patch(file_path: str, original_content: str, new_con
         - str: A message describing the result of the operation.
     """
     if not _is_path_safe(file_path):
-        return False, f"Error: Access to path '{file_path}' is denied or path is not secure."
+        return False, _denied_error(file_path)
 
     # Normalize line endings to reduce false-positive diffs
     original_norm = original_content.replace('\r\n', '\n').replace('\r', '\n')
@@ -302,6 +426,7 @@ def apply_modification_with_patch(file_path: str, original_content: str, new_con
             tmp.write(new_norm)
             tmp_name = tmp.name
         os.replace(tmp_name, full_path)
+        _notify_change(file_path, 'write')
         return True, f"Success: File modified: {file_path} ({changed_lines_count} lines changed; +{add_count}/-{del_count})"
     except IOError as e:
         return False, f"Error: Failed to write modification to file: {e}"
\ No newline at end of file
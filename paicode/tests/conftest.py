@@ -0,0 +1,22 @@
+import pytest
+from paicode import workspace
+
+@pytest.fixture
+def workspace_dir(tmp_path, monkeypatch):
+    """
+    Points the workspace module at an empty project directory, with fresh
+    shared policy, ignore matcher and structure index. Deny and allow rules
+    are set by monkeypatching workspace.DENY_PATTERNS / ALLOW_PATTERNS before
+    the first use of the policy.
+    """
+    monkeypatch.setattr(workspace, "PROJECT_ROOT", str(tmp_path))
+    monkeypatch.setattr(workspace, "CACHE_DIR", str(tmp_path / ".pai_cache"))
+    monkeypatch.setattr(workspace, "INDEX_PERSIST", False)
+    monkeypatch.setattr(workspace, "DENY_PATTERNS", [])
+    monkeypatch.setattr(workspace, "ALLOW_PATTERNS", [])
+    monkeypatch.setattr(workspace, "_policy", None)
+    monkeypatch.setattr(workspace, "_ignore_matcher", None)
+    monkeypatch.setattr(workspace, "_workspace_index", None)
+    monkeypatch.setattr(workspace, "_lazy_workspace", None)
+    monkeypatch.setattr(workspace, "_change_listeners", [])
+    return tmp_path
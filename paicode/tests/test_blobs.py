@@ -0,0 +1,12 @@
+from paicode import blobs
+
+def test_output_length_is_in_bytes():
+    blob = blobs.BlobStore().put("naïve café\n" * 3)
+    output = blobs.Output("SYNTAX_HIGHLIGHT:données/menu.txt:", blob)
+    assert len(output) == len(str(output).encode('utf-8')) == sum(len(part) for part in output.parts())
+
+def test_output_head_decodes_characters():
+    blob = blobs.BlobStore().put("ééééé")
+    output = blobs.Output("é:", blob)
+    assert output.head(4) == "é:éé"
+    assert blobs.head_text(output, 100) == str(output)
@@ -0,0 +1,53 @@
+import re
+import pytest
+from paicode.context import ContextManager, PROMPT_BUDGETS, PHASE_CARRY_BYTES, estimate_tokens, render_phase_results
+
+@pytest.fixture
+def long_session():
+    """A session well past MAX_RECORDS, with long requests, notes and knowledge."""
+    context = ContextManager()
+    context.set_system_knowledge("Workflow knowledge. " * 500)
+    for i in range(150):
+        context.add_interaction(f"request {i}: " + "change the module and its tests " * 20, i % 3 != 0, "task")
+        context.add_note(f"note {i}: " + "a fact about the workspace " * 20, source="test")
+    return context
+
+@pytest.mark.parametrize("prompt_type", sorted(PROMPT_BUDGETS))
+def test_rendered_context_stays_within_budget(long_session, prompt_type):
+    rendered = long_session.render(prompt_type)
+    assert rendered
+    assert estimate_tokens(rendered) <= PROMPT_BUDGETS[prompt_type]["tokens"]
+
+def test_rendered_context_keeps_newest_interactions(long_session):
+    rendered = long_session.render("planning")
+    assert "request 149:" in rendered
+    assert "request 0:" not in rendered
+
+def _phase(reads: int, listings: int, failures: int) -> list[dict]:
+    results = [{"command": "READ", "target": f"src/module_{i}.py", "success": True,
+                "output": f"SYNTAX_HIGHLIGHT:src/module_{i}.py:" + "".join(f"line {n} of module {i}\n" for n in range(3000))}
+               for i in range(reads)]
+    results += [{"command": "LIST_PATH", "target": f"dir_{i}", "success": True, "output": "entry.py\n" * 300}
+                for i in range(listings)]
+    results += [{"command": "MODIFY", "target": f"broken_{i}.py", "success": False,
+                 "output": "Error: " + "the region did not match\n" * 40} for i in range(failures)]
+    return results
+
+@pytest.mark.parametrize("reads, listings, failures", [(1, 0, 0), (4, 2, 1), (2, 30, 10), (0, 200, 0)])
+def test_phase_results_stay_within_budget(reads, listings, failures):
+    phases = [_phase(reads, listings, failures) for _ in range(3)]
+    rendered = render_phase_results(phases)
+    sections = re.split(r"\n\n(?=PHASE \d+:\n)", rendered)
+    assert [section.split("\n", 1)[0] for section in sections] == ["PHASE 1:", "PHASE 2:", "PHASE 3:"]
+    for section in sections:
+        assert len(section.encode('utf-8')) <= PHASE_CARRY_BYTES
+
+def test_phase_results_keep_file_excerpts():
+    rendered = render_phase_results([_phase(2, 1, 1)])
+    assert "--- src/module_0.py (3001 lines)\nline 0 of module 0" in rendered
+    assert "line 2999 of module 1" in rendered
+    assert "- MODIFY broken_0.py [FAILED]: Error:" in rendered
+
+def test_phase_results_count_left_out_results():
+    rendered = render_phase_results([_phase(0, 400, 0)])
+    assert rendered.endswith("more results omitted for budget)")
@@ -0,0 +1,58 @@
+import os
+import pytest
+from paicode import agent, grep
+
+def _touch_later(path, seconds=5):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+def test_files_edited_outside_pai_are_reindexed(workspace_dir, monkeypatch):
+    monkeypatch.setattr(grep, "REVALIDATE_SECONDS", 0)
+    (workspace_dir / "app.py").write_text("def handler():\n    return 1\n")
+    (workspace_dir / "util.py").write_text("def helper():\n    return 2\n")
+    index = grep.GrepIndex()
+    assert index.grep("handler")["total"] == 1
+    assert index.grep("external_marker")["total"] == 0
+
+    # Same size as before, so only the mtime tells the edit apart
+    (workspace_dir / "util.py").write_text("def extern():\n    return 2\n")
+    _touch_later(workspace_dir / "util.py")
+    (workspace_dir / "app.py").unlink()
+    (workspace_dir / "pkg").mkdir()
+    (workspace_dir / "pkg" / "new.py").write_text("from util import extern\n")
+    result = index.grep("extern")
+    assert [match[:2] for match in result["matches"]] == [("pkg/new.py", 1), ("util.py", 1)]
+    assert index.grep("handler")["total"] == 0
+
+def test_revalidation_is_throttled(workspace_dir, monkeypatch):
+    monkeypatch.setattr(grep, "REVALIDATE_SECONDS", 3600)
+    (workspace_dir / "app.py").write_text("def handler():\n    return 1\n")
+    index = grep.GrepIndex()
+    assert index.grep("handler")["total"] == 1
+    (workspace_dir / "app.py").write_text("def renamed():\n    return 1\n")
+    _touch_later(workspace_dir / "app.py")
+    assert index.grep("renamed")["total"] == 0
+    assert index.revalidate() == 1
+    assert index.grep("renamed")["total"] == 1
+
+@pytest.mark.parametrize("args, expected", [
+    ("std::vector", ("std::vector", "", 1)),
+    ("std::vector::*.cpp", ("std::vector", "*.cpp", 1)),
+    ("std::vector::*.cpp::2", ("std::vector", "*.cpp", 2)),
+    ("Foo::bar::src/", ("Foo::bar", "src/", 1)),
+    ("handler::app.py", ("handler", "app.py", 1)),
+    ("handler::::3", ("handler", "", 3)),
+    (r"Vec::new\(.*", (r"Vec::new\(.*", "", 1)),
+    ("ns::vec.*", ("ns::vec.*", "", 1)),
+])
+def test_grep_arguments_split_from_the_end(args, expected):
+    assert agent.split_grep_args(args) == expected
+
+def test_grep_command_keeps_double_colons_in_the_pattern(workspace_dir):
+    (workspace_dir / "main.cpp").write_text("#include <vector>\nstd::vector<int> values;\n")
+    (workspace_dir / "vector").mkdir()
+    (workspace_dir / "vector" / "notes.txt").write_text("std containers\n")
+    success, output = agent.execute_single_command("GREP", "std", "vector::*.cpp")
+    assert success
+    assert "main.cpp:2" in output
+    assert "notes.txt" not in output
@@ -0,0 +1,51 @@
+import sqlite3
+import pytest
+from paicode import historydb
+
+def _interaction(request_id: int, request: str, target: str) -> list[tuple]:
+    return [
+        (request_id * 10.0, "USER_INPUT", {"user_request": request, "request_id": request_id}),
+        (request_id * 10.0 + 1, "PLANNING_PHASE", {"request_id": request_id, "planning_data": {
+            "analysis": {"user_intent": f"edit {target}"},
+            "execution_plan": {"steps": [{"action": "MODIFY", "target": target, "purpose": "change"}]}}}),
+        (request_id * 10.0 + 2, "EXECUTION_PHASE", {"request_id": request_id, "commands": [
+            {"command": "MODIFY", "target": target, "success": True, "output": "Success: modified"}]}),
+        (request_id * 10.0 + 3, "FINAL_STATUS", {"status": "done", "success": True, "request_id": request_id}),
+    ]
+
+@pytest.fixture
+def db(tmp_path):
+    db = historydb.HistoryDB(str(tmp_path))
+    db.add_events("s1", _interaction(1, "rename the invoice totals helper", "billing.py")
+                  + _interaction(2, "add retries to the mail sender", "mail.py"))
+    yield db
+    db.close()
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_request_matches_once(db, fts):
+    db._connect()
+    db.fts = db.fts and fts  # False: the LIKE fallback
+    hits = db.search("invoice totals")
+    assert [(hit["type"], hit["request"]) for hit in hits] == [("USER_INPUT", "rename the invoice totals helper")]
+
+def test_other_events_carry_their_request(db):
+    hits = db.search("mail.py", event_type="EXECUTION_PHASE")
+    assert [hit["request"] for hit in hits] == ["add retries to the mail sender"]
+    assert db.event(hits[0]["id"])["request"] == "add retries to the mail sender"
+    assert db.interaction("s1", "add retries to the mail sender")["commands"] == ["OK MODIFY mail.py"]
+
+def test_store_with_older_schema_is_rebuilt(tmp_path):
+    conn = sqlite3.connect(tmp_path / historydb.DB_FILE_NAME)
+    conn.executescript("""
+        CREATE TABLE sessions (id TEXT PRIMARY KEY, started REAL, working_dir TEXT);
+        CREATE TABLE events (id INTEGER PRIMARY KEY, session TEXT NOT NULL, ts REAL NOT NULL,
+            type TEXT NOT NULL, request TEXT, plan TEXT, commands TEXT, outputs TEXT, success INTEGER);
+        INSERT INTO sessions VALUES ('old', 0, '');
+        PRAGMA user_version=1;
+    """)
+    conn.close()
+    db = historydb.HistoryDB(str(tmp_path))
+    assert db.known_sessions() == set()  # re-imported from the logs
+    db.add_events("s1", _interaction(1, "rename the invoice totals helper", "billing.py"))
+    assert db.interaction("s1", "rename the invoice totals helper")["success"] is True
+    db.close()
@@ -0,0 +1,119 @@
+import time
+import threading
+import pytest
+from paicode import llm
+from paicode.llm import CRITICAL, NORMAL, LOW
+
+@pytest.fixture
+def make_scheduler(monkeypatch):
+    """CallScheduler factory with short waits; rate 0 leaves the rate unlimited."""
+    monkeypatch.setattr(llm, "LOW_MAX_WAIT", 0.2)
+    monkeypatch.setattr(llm, "BACKOFF_SECONDS", 0.3)
+
+    def make(max_concurrent=1, rate_per_minute=0):
+        return llm.CallScheduler(max_concurrent=max_concurrent, rate_per_minute=rate_per_minute)
+    return make
+
+def _start(scheduler, priority, results, name=None, hold=0.02):
+    """Acquires on a thread; records (name, granted) and releases after 'hold'."""
+    def run():
+        granted = scheduler.acquire(priority)
+        results.append((name, granted))
+        if granted:
+            time.sleep(hold)
+            scheduler.release(priority)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def _wait_queued(scheduler, name, count):
+    deadline = time.monotonic() + 2
+    while scheduler.stats()["classes"][name]["queued"] < count:
+        assert time.monotonic() < deadline, f"{name} call never queued"
+        time.sleep(0.005)
+
+def test_low_is_dropped_after_max_wait_behind_normal(make_scheduler):
+    scheduler = make_scheduler()
+    assert scheduler.acquire(NORMAL)
+    started = time.monotonic()
+    assert scheduler.acquire(LOW) is False
+    assert time.monotonic() - started >= llm.LOW_MAX_WAIT - 0.01
+    scheduler.release(NORMAL)
+    assert scheduler.stats()["classes"]["low"]["dropped"] == 1
+    assert scheduler.stats()["classes"]["low"]["queued"] == 0
+
+def test_critical_starts_while_low_calls_run(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1)
+    assert scheduler.acquire(LOW)
+    results = []
+    _start(scheduler, CRITICAL, results, "critical").join(1)
+    assert results == [("critical", True)]
+    # A normal call still counts the running low call against the limit
+    normal = _start(scheduler, NORMAL, results, "normal")
+    normal.join(0.1)
+    assert normal.is_alive()
+    scheduler.release(LOW)
+    normal.join(1)
+    assert results[-1] == ("normal", True)
+
+def test_backoff_drops_low_and_holds_normal(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=2)
+    assert scheduler.acquire(NORMAL)
+    scheduler.release(NORMAL, rate_limited=True)
+    assert scheduler.backoff_remaining() > 0
+
+    started = time.monotonic()
+    assert scheduler.acquire(LOW) is False
+    assert time.monotonic() - started < 0.05  # dropped at once, not after LOW_MAX_WAIT
+
+    assert scheduler.acquire(NORMAL)
+    assert time.monotonic() - started >= 0.25
+    scheduler.release(NORMAL)
+    # A later success resets the backoff to its base
+    assert scheduler.backoff == llm.BACKOFF_SECONDS
+
+def test_waiting_calls_start_by_priority_then_arrival(make_scheduler, monkeypatch):
+    monkeypatch.setattr(llm, "LOW_MAX_WAIT", 5.0)
+    scheduler = make_scheduler(max_concurrent=1)
+    assert scheduler.acquire(NORMAL)
+    results = []
+    threads = []
+    for name, priority, queued_name in [("low", LOW, "low"), ("normal-1", NORMAL, "normal"),
+                                        ("critical", CRITICAL, "critical"), ("normal-2", NORMAL, "normal")]:
+        before = scheduler.stats()["classes"][queued_name]["queued"]
+        threads.append(_start(scheduler, priority, results, name))
+        _wait_queued(scheduler, queued_name, before + 1)
+    scheduler.release(NORMAL)
+    for thread in threads:
+        thread.join(2)
+    assert results == [("critical", True), ("normal-1", True), ("normal-2", True), ("low", True)]
+
+def test_stats_count_calls_drops_and_rate_limits(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1)
+    assert scheduler.acquire(NORMAL)
+    assert scheduler.acquire(LOW) is False  # waits LOW_MAX_WAIT behind the normal call
+    scheduler.release(NORMAL, rate_limited=True)
+    assert scheduler.stats()["backoff"] > 0
+    assert scheduler.acquire(CRITICAL)  # waits the backoff out
+    assert scheduler.stats()["classes"]["critical"]["running"] == 1
+    scheduler.release(CRITICAL)
+
+    stats = scheduler.stats()
+    assert stats["rate_budget"] is None
+    assert stats["backoff"] == 0
+    classes = stats["classes"]
+    assert (classes["normal"]["calls"], classes["normal"]["rate_limited"], classes["normal"]["running"]) == (1, 1, 0)
+    assert (classes["low"]["calls"], classes["low"]["dropped"], classes["low"]["queued"]) == (0, 1, 0)
+    assert (classes["critical"]["calls"], classes["critical"]["dropped"], classes["critical"]["running"]) == (1, 0, 0)
+    assert classes["normal"]["wait_max"] < 0.05
+    assert classes["critical"]["wait_max"] >= 0.25
+    assert classes["critical"]["wait_avg"] == classes["critical"]["wait_max"]
+
+def test_rate_budget_is_spent_per_call(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=4, rate_per_minute=8)
+    for _ in range(6):
+        assert scheduler.acquire(NORMAL)
+        scheduler.release(NORMAL)
+    # 2 tokens left, below 1 + 25% of 8: low calls leave the reserve alone
+    assert scheduler.stats()["rate_budget"] == pytest.approx(2, abs=0.1)
+    assert scheduler.acquire(LOW) is False
@@ -0,0 +1,60 @@
+from paicode import workspace, manifest, summaries, search, symbols, grep
+
+def _make_tree(root):
+    (root / "src").mkdir()
+    (root / "src" / "app.py").write_text("def start_server():\n    return 'ok'\n")
+    (root / "secrets").mkdir()
+    (root / "secrets" / "keys.py").write_text(
+        '"""Production signing keys."""\n\ndef load_signing_key():\n    return "hunter2"\n')
+
+def test_denied_paths_stay_out_of_every_listing_and_index(workspace_dir, monkeypatch):
+    monkeypatch.setattr(workspace, "DENY_PATTERNS", ["secrets/"])
+    _make_tree(workspace_dir)
+
+    files = list(workspace.iter_files())
+    assert files == ["src/app.py"]
+
+    index = workspace.get_workspace_index()
+    assert "secrets" not in manifest.build_manifest(index)
+    assert "secrets" not in workspace.tree_directory('.')
+    assert "secrets" not in workspace.list_path('.')
+
+    cache = summaries.SummaryCache(str(workspace_dir / "summaries.json"))
+    cache.refresh()
+    rendered = cache.render_for_prompt()
+    assert "src/app.py" in rendered
+    assert "secrets" not in rendered and "signing" not in rendered.lower()
+
+    search_index = search.SearchIndex()
+    search_index.refresh()
+    assert all(not path.startswith("secrets/") for path, _ in search_index.search("signing key load"))
+
+    symbol_index = symbols.SymbolIndex()
+    symbol_index.refresh()
+    assert symbol_index.find("load_signing_key") == []
+    assert symbol_index.find("start_server")
+
+    grep_index = grep.GrepIndex()
+    grep_index.refresh()
+    assert "secrets/" not in grep.format_results("hunter2", "", grep_index.grep("hunter2"))
+
+    # Direct access is denied as before
+    assert workspace.path_denial("secrets/keys.py")
+
+def test_allow_rule_reopens_a_denied_pattern(workspace_dir, monkeypatch):
+    monkeypatch.setattr(workspace, "DENY_PATTERNS", ["*.py"])
+    monkeypatch.setattr(workspace, "ALLOW_PATTERNS", ["src/*.py"])
+    _make_tree(workspace_dir)
+    assert list(workspace.iter_files()) == ["src/app.py"]
+
+def test_summaries_loaded_from_disk_drop_newly_denied_files(workspace_dir, monkeypatch):
+    _make_tree(workspace_dir)
+    cache_file = str(workspace_dir / "summaries.json")
+    cache = summaries.SummaryCache(cache_file)
+    cache.refresh()
+    assert "secrets/keys.py" in cache.files
+
+    monkeypatch.setattr(workspace, "DENY_PATTERNS", ["secrets/"])
+    monkeypatch.setattr(workspace, "_policy", None)
+    reloaded = summaries.SummaryCache(cache_file)
+    assert "secrets/keys.py" not in reloaded.files
@@ -0,0 +1,45 @@
+from paicode import preflight
+
+def _skipped(commands):
+    checked, issues = preflight.check(commands)
+    return [commands[position] for position, (level, _) in sorted(issues.items()) if level == "skipped"]
+
+def _make_tree(root):
+    (root / "src" / "pkg" / "sub").mkdir(parents=True)
+    (root / "src" / "pkg" / "a.py").write_text("a = 1\n")
+    (root / "src" / "pkg" / "sub" / "b.py").write_text("b = 2\n")
+
+def test_moved_directory_keeps_its_files(workspace_dir):
+    _make_tree(workspace_dir)
+    assert _skipped([
+        "MV::src/pkg::lib",
+        "READ::lib/a.py",
+        "MODIFY::lib/sub/b.py::rename b",
+        "READ::src/pkg/a.py",
+        "WRITE::lib/a.py::new content",
+    ]) == ["READ::src/pkg/a.py"]
+    checked, issues = preflight.check(["MV::src/pkg::lib", "WRITE::lib/a.py::new content"])
+    assert checked[1] == "MODIFY::lib/a.py::new content"
+
+def test_moves_into_directories_and_chains(workspace_dir):
+    _make_tree(workspace_dir)
+    (workspace_dir / "vendor").mkdir()
+    assert _skipped([
+        "MV::src/pkg::vendor",
+        "READ::vendor/pkg/sub/b.py",
+        "MV::vendor/pkg::third_party",
+        "READ::third_party/a.py",
+        "READ::vendor/pkg/a.py",
+    ]) == ["READ::vendor/pkg/a.py"]
+
+def test_moved_directory_takes_simulated_changes_along(workspace_dir):
+    _make_tree(workspace_dir)
+    assert _skipped([
+        "WRITE::src/pkg/new.py::a new module",
+        "RM::src/pkg/a.py",
+        "MV::src/pkg::lib",
+        "READ::lib/new.py",
+        "READ::lib/a.py",
+        "MKDIR::src/pkg",
+        "READ::src/pkg/sub/b.py",
+    ]) == ["READ::lib/a.py", "READ::src/pkg/sub/b.py"]
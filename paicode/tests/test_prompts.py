@@ -0,0 +1,21 @@
+import pytest
+from paicode import prompts
+from paicode.context import estimate_tokens
+
+def test_every_template_has_a_budget():
+    assert set(prompts.TEMPLATE_BUDGETS) == set(prompts.TEMPLATES)
+
+def test_templates_fit_their_budgets():
+    assert prompts.over_budget() == {}
+
+@pytest.mark.parametrize("name", sorted(prompts.TEMPLATES))
+def test_rendered_templates_fit_their_budgets(name):
+    template = prompts.TEMPLATES[name]
+    fields = {field: "x" for field in template.get_identifiers()}
+    rendered = prompts.render(name, **fields)
+    # Short fields add at most a token each on top of the fixed text
+    assert estimate_tokens(rendered) <= prompts.TEMPLATE_BUDGETS[name] + len(fields)
+
+def test_render_reports_missing_fields():
+    with pytest.raises(KeyError):
+        prompts.render("phase")
@@ -0,0 +1,29 @@
+import pytest
+from paicode import reader
+
+CONTENT = "def a():\n    return 1\n\n\ndef b():\n\n    return 2\n\n\n"
+
+RANGES = [(1, 3), (1, 4), (2, 4), (3, 3), (3, 4), (5, 9), (6, 6), (7, 20), (1, None), (8, None), (10, 12)]
+
+def _read_both(path, monkeypatch, start, end):
+    small = reader.read_text(str(path), start, end)
+    with monkeypatch.context() as patch:
+        patch.setattr(reader, "MMAP_THRESHOLD", 0)  # every file is mapped
+        mapped = reader.read_text(str(path), start, end)
+    return small, mapped
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_mapped_and_small_reads_agree(tmp_path, monkeypatch, start, end):
+    path = tmp_path / "module.py"
+    path.write_text(CONTENT)
+    small, mapped = _read_both(path, monkeypatch, start, end)
+    assert mapped == small
+    lines = CONTENT.split("\n")[:-1]
+    last = len(lines) if end is None else min(end, len(lines))
+    assert small["text"] == "\n".join(lines[start - 1:last])
+
+def test_range_ending_in_blank_lines_keeps_them(tmp_path, monkeypatch):
+    path = tmp_path / "module.py"
+    path.write_text(CONTENT)
+    small, mapped = _read_both(path, monkeypatch, 2, 4)
+    assert small["text"] == mapped["text"] == "    return 1\n\n"
@@ -0,0 +1,29 @@
+import pytest
+from paicode import agent, regions
+
+TEXT = "\n".join(f"line {n}" for n in range(1, 201))
+
+@pytest.mark.parametrize("description, expected", [
+    ("120::fix it", ((120, 120), "fix it")),
+    ("120-180::fix it", ((120, 180), "fix it")),
+    ("120-::fix it", ((120, None), "fix it")),
+    ("fix the loop", (None, "fix the loop")),
+    ("fix::the loop", (None, "fix::the loop")),
+])
+def test_split_line_range(description, expected):
+    assert agent.split_line_range(description) == expected
+
+def test_split_line_range_rejects_empty_ranges():
+    with pytest.raises(ValueError):
+        agent.split_line_range("180-120::fix it")
+
+@pytest.mark.parametrize("line_range, expected", [
+    ((120, 120), [(120, 120)]),
+    ((120, 180), [(120, 180)]),
+    ((150, None), [(150, 200)]),
+    ((20, None), []),  # most of the file: sent whole
+    ((1, 200), [(1, 200)]),  # asked for explicitly
+    ((250, None), []),
+])
+def test_explicit_ranges(line_range, expected):
+    assert regions.find_regions("module.py", TEXT, "fix it", line_range) == expected
@@ -0,0 +1,29 @@
+from paicode import agent, llm, regions, validate
+
+def _broken_module(workspace_dir, broken_line: int, total: int = 750):
+    lines = [f"value_{n} = {n}" for n in range(1, total + 1)]
+    lines[broken_line - 1] = "broken = max(1, 2"
+    (workspace_dir / "module.py").write_text("\n".join(lines) + "\n")
+    [validation] = validate.validate_files(["module.py"], str(workspace_dir))
+    return validation
+
+def _repair_prompt(validation, monkeypatch) -> str:
+    prompts = []
+    monkeypatch.setattr(llm, "generate_text", lambda prompt, *args, **kwargs: prompts.append(prompt))
+    assert agent.repair_invalid_file(validation) == validation["error"]
+    return prompts[0]
+
+def test_repair_sends_the_lines_around_the_error(workspace_dir, monkeypatch):
+    validation = _broken_module(workspace_dir, 301)
+    assert validation["error"].startswith("line 301:")
+    prompt = _repair_prompt(validation, monkeypatch)
+    assert "broken = max(1, 2" in prompt
+    assert f"value_{301 - regions.CONTEXT_LINES} = " in prompt
+    assert "value_59 = " not in prompt
+    assert "value_700 = " not in prompt
+
+def test_repair_without_a_line_sends_the_whole_file(workspace_dir, monkeypatch):
+    validation = _broken_module(workspace_dir, 301)
+    validation["error"] = "not valid UTF-8 (invalid start byte at byte 12)"
+    prompt = _repair_prompt(validation, monkeypatch)
+    assert "value_1 = " in prompt and "value_750 = " in prompt
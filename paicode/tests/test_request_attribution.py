@@ -0,0 +1,48 @@
+import json
+from paicode import history, historydb
+
+# A task (#1) is running when a conversation request (#2) is entered and
+# answered; the task's later events must stay attributed to the task.
+EVENTS = [
+    (1.0, "USER_INPUT", {"user_request": "add a login page", "request_id": 1}),
+    (2.0, "PLANNING_PHASE", {"request_id": 1, "planning_data": {
+        "analysis": {"user_intent": "create the login page"},
+        "execution_plan": {"steps": [{"action": "WRITE", "target": "login.html", "purpose": "page"}]}}}),
+    (3.0, "USER_INPUT", {"user_request": "what is a JWT?", "request_id": 2}),
+    (4.0, "FINAL_STATUS", {"status": "Conversation completed", "success": True, "request_id": 2}),
+    (5.0, "EXECUTION_PHASE", {"request_id": 1, "commands": [
+        {"command": "WRITE", "target": "login.html", "success": False, "output": "Error: disk full"}]}),
+    (6.0, "FINAL_STATUS", {"status": "Task failed", "success": False, "request_id": 1}),
+]
+
+def test_history_db_attributes_events_by_request_id(tmp_path):
+    db = historydb.HistoryDB(str(tmp_path))
+    db.add_events("s1", EVENTS[:3])  # split like the writer thread's batches
+    db.add_events("s1", EVENTS[3:])
+    task = db.interaction("s1", "add a login page")
+    assert task["intent"] == "create the login page"
+    assert task["commands"] == ["FAILED WRITE login.html"]
+    assert task["success"] is False
+    reply = db.interaction("s1", "what is a JWT?")
+    assert reply["commands"] == [] and reply["success"] is True
+    db.close()
+
+def test_history_digest_attributes_events_by_request_id(tmp_path):
+    path = tmp_path / "session_s1.jsonl"
+    path.write_text("".join(json.dumps({"ts": ts, "type": t, "data": d}) + "\n" for ts, t, d in EVENTS))
+    digest = history.compact_history(str(tmp_path))
+    assert [f["request"] for f in digest["unresolved_failures"]] == ["add a login page"]
+    decisions = {d["request"]: (d["intent"], d["result"]) for d in digest["decisions"]}
+    assert decisions == {
+        "add a login page": ("create the login page", "failed"),
+        "what is a JWT?": ("", "success"),
+    }
+
+def test_events_without_request_id_follow_the_last_request(tmp_path):
+    db = historydb.HistoryDB(str(tmp_path))
+    db.add_events("s1", [
+        (1.0, "USER_INPUT", {"user_request": "fix the build"}),
+        (2.0, "FINAL_STATUS", {"status": "done", "success": True}),
+    ])
+    assert db.interaction("s1", "fix the build")["success"] is True
+    db.close()
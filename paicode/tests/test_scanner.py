@@ -0,0 +1,53 @@
+from paicode import scanner, summaries, search, symbols, grep
+
+def _indexes(workspace_dir):
+    return [summaries.SummaryCache(str(workspace_dir / ".pai_cache" / "summaries.json")),
+            search.SearchIndex(), symbols.SymbolIndex(), grep.GrepIndex()]
+
+def _count_reads(monkeypatch):
+    reads = []
+    read_head = scanner.read_head
+
+    def counting_read_head(full_path, limit):
+        reads.append(full_path)
+        return read_head(full_path, limit)
+
+    monkeypatch.setattr(scanner, "read_head", counting_read_head)
+    return reads
+
+def test_one_scan_reads_each_file_once_for_all_indexes(workspace_dir, monkeypatch):
+    (workspace_dir / "billing.py").write_text('"""Invoice totals."""\n\ndef invoice_total(lines):\n    return sum(lines)\n')
+    (workspace_dir / "mail.js").write_text("export function sendMail(to) {\n  return to;\n}\n")
+    cache, search_index, symbol_index, grep_index = _indexes(workspace_dir)
+    reads = _count_reads(monkeypatch)
+
+    changed = scanner.scan([cache, search_index, symbol_index, grep_index])
+    assert sorted(reads) == sorted(str(workspace_dir / name) for name in ("billing.py", "mail.js"))
+    assert set(changed.values()) == {2}
+    assert cache.files["billing.py"]["summary"] == "Invoice totals."
+    assert search_index.search("invoice")[0][0] == "billing.py"
+    assert [hit[0] for hit in symbol_index.find("sendMail")] == ["mail.js"]
+    assert [match[:2] for match in grep_index.grep("sum\\(")["matches"]] == [("billing.py", 4)]
+
+    # Nothing changed: no file is read again
+    assert set(scanner.scan([cache, search_index, symbol_index, grep_index]).values()) == {0}
+    assert len(reads) == 2
+
+def test_scan_drops_deleted_files_everywhere(workspace_dir):
+    (workspace_dir / "old.py").write_text("def legacy():\n    pass\n")
+    indexes = _indexes(workspace_dir)
+    scanner.start_background_scan(indexes).join()
+    (workspace_dir / "old.py").unlink()
+    scanner.scan(indexes)
+    assert all(index.indexed_paths() == [] for index in indexes)
+
+def test_rescan_picks_up_files_created_outside_pai(workspace_dir):
+    (workspace_dir / "a.py").write_text("def alpha():\n    pass\n")
+    cache, search_index, symbol_index, grep_index = indexes = _indexes(workspace_dir)
+    scanner.scan(indexes)
+    (workspace_dir / "b.py").write_text("def bravo_handler():\n    return 'bravo'\n")
+    scanner.start_background_scan(indexes).join()
+    assert "b.py" in cache.files
+    assert search_index.search("bravo")[0][0] == "b.py"
+    assert [hit[0] for hit in symbol_index.find("bravo_handler")] == ["b.py"]
+    assert grep_index.grep("bravo_handler")["total"] == 1
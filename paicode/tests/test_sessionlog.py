@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+from paicode import sessionlog
+
+def _idle_part(directory, session):
+    path = directory / f"{session}.001.jsonl"
+    path.write_text('{"ts":1,"type":"USER_INPUT","data":{}}\n')
+    old = time.time() - sessionlog.COMPRESS_IDLE_SECONDS - 60
+    os.utime(path, (old, old))
+    return path
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_idle_parts_of_running_sessions_are_not_compressed(tmp_path):
+    running = _idle_part(tmp_path, "session_running")
+    (tmp_path / "session_running.lock").write_text(str(os.getpid()))
+    crashed = _idle_part(tmp_path, "session_crashed")
+    (tmp_path / "session_crashed.lock").write_text(str(_dead_pid()))
+    closed = _idle_part(tmp_path, "session_closed")
+
+    log = sessionlog.SessionLog(str(tmp_path / "session_new"))
+    log.log("USER_INPUT", {"user_request": "hello"})
+    assert log.flush()
+    assert (tmp_path / "session_new.lock").read_text() == str(os.getpid())
+    log.close()
+
+    assert running.exists()
+    assert not crashed.exists() and (tmp_path / "session_crashed.001.jsonl.gz").exists()
+    assert not closed.exists() and (tmp_path / "session_closed.001.jsonl.gz").exists()
+    assert not (tmp_path / "session_new.lock").exists()
+    assert [r["data"] for r in sessionlog.iter_records(str(tmp_path / "session_new"))] == [{"user_request": "hello"}]
@@ -0,0 +1,59 @@
+import pytest
+from paicode import validate
+
+@pytest.mark.parametrize("html", [
+    "<!doctype html>\n<div>a<br>b<img src='x.png'><br/></div>\n",
+    "<ul>\n<li>one\n<li>two\n</ul>\n<p>first\n<p>second\n",
+    "<html><head><title>t</title><body><table><tr><td>1<td>2</table>\n",
+])
+def test_html_allows_void_elements_and_optional_end_tags(html):
+    assert validate._check_html(html, "page.html") is None
+
+@pytest.mark.parametrize("html, error", [
+    ("<div>\n<span>text</div>\n", "line 2: <span> is closed by </div> at line 2"),
+    ("<div>ok</div>\n</section>\n", "line 2: </section> has no matching <section>"),
+    ("<body>\n<div>\n<p>text\n", "line 2: <div> is never closed"),
+])
+def test_html_reports_the_first_unbalanced_tag(html, error):
+    assert validate._check_html(html, "page.html") == error
+
+def test_validate_files_skips_unchecked_and_oversized_files(workspace_dir, monkeypatch):
+    monkeypatch.setattr(validate, "MAX_WORKERS", 0)
+    monkeypatch.setattr(validate, "MAX_VALIDATE_BYTES", 100)
+    (workspace_dir / "notes.txt").write_text("not checked {")
+    (workspace_dir / "big.json").write_text("[" + "1, " * 100 + "")
+    (workspace_dir / "small.json").write_text("[1, 2]")
+    results = validate.validate_files(["notes.txt", "big.json", "small.json"], str(workspace_dir))
+    assert [(r["path"], r["validator"], r["error"]) for r in results] == [("small.json", "json", None)]
+
+def _mixed_files(workspace_dir) -> list[str]:
+    (workspace_dir / "b.py").write_text("def f(:\n    pass\n")
+    (workspace_dir / "a.json").write_text('{"a": 1}')
+    (workspace_dir / "c.html").write_text("<div>\n")
+    return ["b.py", "a.json", "b.py", "c.html"]
+
+def _summary(results) -> list[tuple]:
+    return [(r["path"], r["validator"], r["error"] is None) for r in results]
+
+EXPECTED = [("b.py", "python", False), ("a.json", "json", True), ("c.html", "html", False)]
+
+def test_validate_files_keeps_input_order(workspace_dir, monkeypatch):
+    monkeypatch.setattr(validate, "MAX_WORKERS", 2)
+    results = validate.validate_files(_mixed_files(workspace_dir), str(workspace_dir))
+    assert _summary(results) == EXPECTED
+    assert results[0]["error"].startswith("line 1:")
+    assert results[2]["error"] == "line 1: <div> is never closed"
+    assert all(r["seconds"] >= 0 for r in results)
+
+def test_validate_files_falls_back_in_process_when_the_pool_fails(workspace_dir, monkeypatch):
+    class BrokenPool:
+        def map(self, *args, **kwargs):
+            raise RuntimeError("worker died")
+
+    shutdowns = []
+    monkeypatch.setattr(validate, "MAX_WORKERS", 2)
+    monkeypatch.setattr(validate, "get_pool", BrokenPool)
+    monkeypatch.setattr(validate, "shutdown", lambda: shutdowns.append(True))
+    results = validate.validate_files(_mixed_files(workspace_dir), str(workspace_dir))
+    assert _summary(results) == EXPECTED
+    assert shutdowns == [True]